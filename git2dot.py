@@ -84,19 +84,118 @@ or tag ids are included in the graph. This gives you more detail
 controlled that the git options allowed in the --range command. It
 is very useful for determining where branches occurred.
 
+Use --choose-ref and --exclude-ref to choose refs by glob or
+regular expression, for example --choose-ref 'release/*'.
+
+The --ancestors-of, --descendants-of and --between options
+select the commits by ancestry in the parsed graph, for example
+--between v1.0 v2.0 shows everything that went into v2.0 since
+v1.0 including the side branches that were merged, the same commits
+as git log v1.0..v2.0.
+
+The --contains-node and --contains-filter options color or
+filter the commits by which branches and tags contain them, for
+example --contains-filter '=release' only shows the commits that are
+on release but not on any of the other tracked refs.
+
 You can choose to keep the git output to re-use multiple times with
 different display options or to share by specifying the -k (--keep)
 option.
+The kept output can be compressed with --keep-compress gz|bz2|xz and
+compressed files are read directly by -i.
+
+If the history is too large to fit in memory, use the --store option
+to keep the commit graph in an on disk SQLite database. The store
+can be re-used by later runs, it is reloaded when the commits, the
+refs or the options that change the git output change.
+
+If you do not need --squash, --choose-branch, --choose-tag or
+--align-by-date, use the --stream option to write the dot file while
+the git output is being read. That keeps the memory use roughly
+constant for very large repositories.
+
+Use the -z (--null) option to read NUL framed records from git.
+It is faster to parse and it allows the label fields to contain "|"
+characters, for example commit subjects.
+
+The default git command only asks for the commit body when -D or -k
+need it. The other fields, including the decorations and the dates,
+are used by every graph so they are always requested.
+
+Use the --jsonl and --graphml options to export the graph, after
+pruning and squashing, for other tools.
+
+To compare a repository before and after a merge or a rebase, keep the
+output from before (-k) and pass it to --diff later. Only the
+added, removed and rewritten commits and their neighbors are shown.
+
+To look at the commits around a single commit in a large repository use
+--around COMMIT --radius N. Only the commits within N edges are read
+from git.
+
+For large graphs use --svg-strip, --svg-compress and --html-lazy
+to make the SVG smaller and to load it asynchronously in the HTML page.
+For very large graphs use --html-canvas instead of --html, it only
+draws what is in view.
+
+Use --layout-cache DIR to re-use the dot layout when only the colors,
+styles, labels or font names change.
+
+The PNG, SVG, HTML and export files are generated concurrently, use
+-j N to limit how many run at once.
+
+The render engine and the dot settings are chosen from the size of the
+graph and a render that takes too long is retried with a cheaper
+strategy, see --render-policy, --render-sizes and --render-timeout.
+
+Use --path PATH to only graph the commits that change a part of a large
+repository, the parents are rewritten so the graph stays connected.
+
+For an overview of a long history use --rollup day|week|month, it
+replaces the commits of each first-parent lane in each time bucket by a
+single node that shows the number of commits and has all of their
+branches and tags. Use --rollup-recent N to keep the commits of the
+N most recent buckets.
+
+Use --stats to see how big the graph will be before it is generated.
+It reports the node and edge counts, the size of the DOT file and an
+estimate of the render time that is based on the earlier renders that
+were recorded with --render-log FILE.
+
+For cron jobs use --skip-unchanged, it stops right away when the refs,
+the options and the output files are the same as in the last run.
+
+The -i option can be repeated and it accepts glob patterns so that the
+keep files from several mirrors or date ranges can be merged into one
+graph.
 '''
 import argparse
+import binascii
+import calendar
+import collections
 import copy
 import datetime
-import dateutil.parser
-import inspect
+import fnmatch
+import glob
+import heapq
+import itertools
+import json
+import math
+import mmap
 import os
 import re
+import shlex
+import signal
+import struct
 import subprocess
 import sys
+import threading
+import time
+import zlib
+
+# The modules that are only needed by some of the options (dateutil,
+# hashlib, multiprocessing, sqlite3, tempfile and xml.sax.saxutils)
+# are imported where they are used to keep the startup fast.
 
 
 VERSION = '0.8.3'
@@ -104,6 +203,25 @@ DEFAULT_GITCMD = 'git log --format="|Record:|%h|%p|%d|%ci%n%b"' # --gitcmd
 DEFAULT_RANGE = '--all --topo-order'  # --range
 
 
+class Record:
+    r'''
+    The data parsed from the git output for a single commit.
+    Records are what the readers produce and what the graph builders
+    (Node and GraphStore) consume.
+    '''
+
+    def __init__(self, cid, pids, branches, tags, dts):
+        self.m_cid = cid
+        self.m_parents = pids
+        self.m_branches = branches
+        self.m_tags = tags
+        self.m_dts = dts
+        self.m_vars = {}  # user defined variable values
+        self.m_extra = []  # label data
+        self.m_gen = None  # generation number, if known
+        self.m_stub = False  # marks a cut in the graph (--around)
+
+
 class Node:
     r'''
     Each node represents a commit.
@@ -115,6 +233,8 @@ class Node:
     m_map = {}
     m_list_bydate = []
     m_vars_usage = {}  # nodes that have var values
+    m_contains_refs = []  # the refs for each containment bit
+    m_refs = {}  # ref index, key=branch or tag, val=cid
 
     def __init__(self, cid, pids=[], branches=[], tags=[], dts=None):
         self.m_cid = cid
@@ -128,9 +248,14 @@ class Node:
         self.m_vars = {}  # user defined variable values
 
         self.m_choose = True  # used by the --choose-* options only
+        self.m_contains = 0  # containment bitset, see containment()
+        self.m_diff = None  # added, removed or rewritten (--diff)
+        self.m_stub = False  # marks a cut in the graph (--around)
+        self.m_rollup = 0  # number of commits in a rollup node (--rollup)
 
         self.m_extra = []
         self.m_dts = dts  # date/time stamp, used for invisible constraints.
+        self.m_gen = None  # generation number (see Node.generations)
 
         # For squashing.
         self.m_chain_head = None
@@ -140,7 +265,29 @@ class Node:
         Node.m_list.append(self)
         Node.m_map[cid] = self
 
+    @staticmethod
+    def load(rec):
+        '''
+        Create the node for a parsed record.
+        '''
+        nd = Node(rec.m_cid, rec.m_parents, rec.m_branches, rec.m_tags, rec.m_dts)
+        nd.m_vars = rec.m_vars
+        nd.m_extra = rec.m_extra
+        nd.m_gen = rec.m_gen
+        nd.m_stub = rec.m_stub
+        for ref in rec.m_branches + rec.m_tags:
+            Node.m_refs[ref] = nd.m_cid
+
+        # keep track of which nodes have variables defined.
+        for var in rec.m_vars:
+            if var not in Node.m_vars_usage:
+                Node.m_vars_usage[var] = []
+            Node.m_vars_usage[var] += [nd.m_cid] * len(rec.m_vars[var])
+        return nd
+
     def is_squashable(self):
+        if self.m_stub or self.m_rollup > 0:
+            return False
         if len(self.m_branches) > 0 or len(self.m_tags) > 0 or len(self.m_parents) > 1 or len(self.m_children) > 1:
             return False
         return True
@@ -249,25 +396,611 @@ class Node:
                 self.m_children = self.m_children[:i] + self.m_children[i+1:]
 
 
+class StoreNode(Node):
+    r'''
+    A read-only view of a commit row in a GraphStore.
+    It presents the Node interface to gendot() but it is not
+    registered in the Node lists and maps so only the rows that are
+    currently being written are held in memory.
+    '''
+
+    def __init__(self, cid, pids=[], branches=[], tags=[], dts=None, nchildren=0):
+        self.m_cid = cid
+        self.m_parents = pids
+        self.m_branches = branches
+        self.m_tags = tags
+        self.m_dts = dts
+        self.m_vars = {}
+        self.m_extra = []
+        self.m_num_children = nchildren
+        self.m_contains = 0
+        self.m_diff = None
+        self.m_stub = False
+        self.m_rollup = 0
+        self.m_chain_head = None
+        self.m_chain_tail = None
+        self.m_chain_size = -1
+
+    def is_merge_node(self):
+        return self.m_num_children > 1
+
+
+class GraphStore:
+    r'''
+    SQLite backed commit graph for histories that do not fit in
+    memory (--store).
+
+    It holds the same data as the Node lists and maps but on disk so
+    that parsing, pruning, squashing and the DOT generation run with
+    bounded memory.
+
+    The ingested commits are never changed by the pruning and
+    squashing operations, they only update the keep flags and the
+    chain columns. That allows a store to be re-opened by later runs
+    with different display options.
+    '''
+
+    SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS commits (
+    idx INTEGER PRIMARY KEY,
+    cid TEXT NOT NULL,
+    dts TEXT,
+    ts REAL,
+    branches TEXT,
+    tags TEXT,
+    vars TEXT,
+    extra TEXT,
+    keep INTEGER DEFAULT 1,
+    nparents INTEGER DEFAULT 0,
+    nchildren INTEGER DEFAULT 0,
+    chain_head TEXT,
+    chain_tail TEXT,
+    chain_size INTEGER DEFAULT -1);
+CREATE UNIQUE INDEX IF NOT EXISTS commits_cid ON commits (cid);
+CREATE INDEX IF NOT EXISTS commits_ts ON commits (ts);
+CREATE TABLE IF NOT EXISTS parents (
+    cid TEXT NOT NULL,
+    pid TEXT NOT NULL,
+    pos INTEGER,
+    keep INTEGER DEFAULT 1);
+CREATE INDEX IF NOT EXISTS parents_cid ON parents (cid);
+CREATE INDEX IF NOT EXISTS parents_pid ON parents (pid);
+CREATE TABLE IF NOT EXISTS refs (name TEXT NOT NULL, cid TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS refs_name ON refs (name);
+'''
+
+    # A commit that can be squashed, see Node.is_squashable().
+    SQUASHABLE = "({0}.branches = '[]' AND {0}.tags = '[]' AND {0}.nparents <= 1 AND {0}.nchildren <= 1)"
+
+    BATCH = 10000  # rows per insert or update
+
+    def __init__(self, path):
+        import sqlite3
+        self.m_path = path
+        self.m_db = sqlite3.connect(path)
+        self.m_db.execute('PRAGMA synchronous = OFF')
+        self.m_db.executescript(GraphStore.SCHEMA)
+
+    def close(self):
+        self.m_db.commit()
+        self.m_db.close()
+
+    def get_meta(self, key):
+        row = self.m_db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def is_complete(self):
+        '''
+        Was the store completely loaded by an earlier run?
+        '''
+        return self.get_meta('complete') == '1'
+
+    def num_commits(self):
+        return self.m_db.execute('SELECT COUNT(*) FROM commits WHERE keep = 1').fetchone()[0]
+
+    def ingest(self, opts, recs, identity):
+        '''
+        Load the records into the store in batches.
+        The identity of the input is recorded so that later runs
+        can tell whether the store can be re-used.
+        '''
+        db = self.m_db
+        for table in ['meta', 'commits', 'parents', 'refs']:
+            db.execute('DELETE FROM {}'.format(table))
+
+        commits = []
+        parents = []
+        refs = []
+
+        def flush():
+            db.executemany('INSERT OR IGNORE INTO commits (cid, dts, ts, branches, tags, vars, extra) VALUES (?, ?, ?, ?, ?, ?, ?)', commits)
+            db.executemany('INSERT INTO parents (cid, pid, pos) VALUES (?, ?, ?)', parents)
+            db.executemany('INSERT INTO refs (name, cid) VALUES (?, ?)', refs)
+            del commits[:]
+            del parents[:]
+            del refs[:]
+
+        num = 0
+        for rec in recs:
+            num += 1
+            commits.append((rec.m_cid,
+                            rec.m_dts.isoformat(' '),
+                            calendar.timegm(rec.m_dts.utctimetuple()),
+                            json.dumps(rec.m_branches),
+                            json.dumps(rec.m_tags),
+                            json.dumps(rec.m_vars),
+                            json.dumps(rec.m_extra)))
+            for i, pid in enumerate(rec.m_parents):
+                parents.append((rec.m_cid, pid, i))
+            for ref in rec.m_branches + rec.m_tags:
+                refs.append((ref, rec.m_cid))
+            if len(commits) >= GraphStore.BATCH:
+                flush()
+        flush()
+
+        db.execute("INSERT INTO meta (key, value) VALUES ('identity', ?)", (identity,))
+        db.execute("INSERT INTO meta (key, value) VALUES ('complete', '1')")
+        db.commit()
+        infov(opts, 'stored {:,} commits in {}'.format(num, self.m_path))
+
+    def prepare(self):
+        '''
+        Undo the pruning and squashing of an earlier run.
+        '''
+        db = self.m_db
+        db.execute('UPDATE commits SET keep = 1, nparents = 0, nchildren = 0, chain_head = NULL, chain_tail = NULL, chain_size = -1')
+        db.execute('UPDATE parents SET keep = 1')
+
+    def prune_by_date(self, opts):
+        '''
+        Drop the parent references to commits that are not in the
+        store, see prune_by_date().
+        '''
+        if opts.since != '' or opts.until != '' or opts.range != '':
+            infov(opts, 'pruning parents')
+            db = self.m_db
+            numt = db.execute('SELECT COUNT(*) FROM parents').fetchone()[0]
+            cur = db.execute('UPDATE parents SET keep = 0 WHERE NOT EXISTS (SELECT 1 FROM commits c WHERE c.cid = parents.pid)')
+            infov(opts, 'pruned {:,} parent node references out of {:,}'.format(cur.rowcount, numt))
+
+    def prune_by_choice(self, opts):
+        '''
+        Only keep the commits reachable from the --choose-branch and
+        --choose-tag refs, see prune_by_choice(). Tags match with or
+        without the "tag: " prefix like find_ref().
+        '''
+        if len(opts.choose_branch) == 0 and len(opts.choose_tag) == 0:
+            return
+
+        infov(opts, 'pruning graph based on choices')
+        db = self.m_db
+        db.execute('CREATE TEMP TABLE IF NOT EXISTS choices (name TEXT PRIMARY KEY)')
+        db.execute('CREATE TEMP TABLE IF NOT EXISTS chosen (cid TEXT PRIMARY KEY)')
+        db.execute('DELETE FROM choices')
+        db.execute('DELETE FROM chosen')
+        for opt, names in [('--choose-branch', opts.choose_branch), ('--choose-tag', opts.choose_tag)]:
+            for name in sorted(names):
+                db.execute('INSERT OR IGNORE INTO choices (name) VALUES (?)', (name,))
+                if db.execute('SELECT 1 FROM refs WHERE name IN (?, ?)', (name, 'tag: ' + name)).fetchone() is None:
+                    warn('{} not found: "{}"'.format(opt, name))
+
+        # Walk back through the parent links from the chosen refs.
+        db.execute('''INSERT INTO chosen (cid)
+WITH RECURSIVE reach(cid) AS (
+    SELECT r.cid FROM refs r JOIN choices n ON r.name IN (n.name, 'tag: ' || n.name)
+    UNION
+    SELECT p.pid FROM parents p JOIN reach ON p.cid = reach.cid WHERE p.keep = 1)
+SELECT cid FROM reach''')
+
+        keeping = db.execute('SELECT COUNT(*) FROM chosen').fetchone()[0]
+        pruning = self.num_commits() - keeping
+        infov(opts, 'keeping {:,}'.format(keeping))
+        infov(opts, 'pruning {:,}'.format(pruning))
+        if pruning == 0:
+            warn('nothing to prune')
+            return
+
+        db.execute('UPDATE commits SET keep = 0 WHERE cid NOT IN (SELECT cid FROM chosen)')
+        db.execute('UPDATE parents SET keep = 0 WHERE cid NOT IN (SELECT cid FROM chosen) OR pid NOT IN (SELECT cid FROM chosen)')
+        infov(opts, 'remaining {:,}'.format(self.num_commits()))
+
+    def ref_names(self):
+        '''
+        Get the names of the branches and tags.
+        '''
+        return [row[0] for row in self.m_db.execute('SELECT DISTINCT name FROM refs')]
+
+    def update_children(self):
+        '''
+        Count the parents and children of each commit.
+        Returns the number of edges.
+        '''
+        db = self.m_db
+        db.execute('''UPDATE commits SET
+    nparents = (SELECT COUNT(*) FROM parents p WHERE p.cid = commits.cid AND p.keep = 1),
+    nchildren = (SELECT COUNT(*) FROM parents p WHERE p.pid = commits.cid AND p.keep = 1)
+WHERE keep = 1''')
+        return db.execute('SELECT COUNT(*) FROM parents WHERE keep = 1').fetchone()[0]
+
+    def first_child(self, cid):
+        '''
+        Get the first child of a commit and whether it is squashable.
+        '''
+        sql = '''SELECT c.cid, {} FROM parents p JOIN commits c ON c.cid = p.cid
+WHERE p.pid = ? AND p.keep = 1 ORDER BY c.idx LIMIT 1'''.format(GraphStore.SQUASHABLE.format('c'))
+        return self.m_db.execute(sql, (cid,)).fetchone()
+
+    def squash(self):
+        '''
+        Squash chains of single commits, see Node.squash().
+        Each chain is walked twice: once to find the tail and the size
+        and once to update it so that the chains are never held in
+        memory.
+        '''
+        db = self.m_db
+        db.execute('DROP TABLE IF EXISTS heads')
+        db.execute('''CREATE TEMP TABLE heads AS SELECT c.cid AS cid FROM commits c
+WHERE c.keep = 1 AND {0} AND NOT EXISTS (
+    SELECT 1 FROM parents p JOIN commits pc ON pc.cid = p.pid
+    WHERE p.cid = c.cid AND p.keep = 1 AND {1})
+ORDER BY c.idx'''.format(GraphStore.SQUASHABLE.format('c'), GraphStore.SQUASHABLE.format('pc')))
+
+        last = 0
+        while True:
+            rows = db.execute('SELECT rowid, cid FROM heads WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                              (last, GraphStore.BATCH)).fetchall()
+            if len(rows) == 0:
+                break
+            last = rows[-1][0]
+            for _, head in rows:
+                # Find the tail.
+                tail = head
+                size = 1
+                row = self.first_child(head)
+                while row is not None and row[1]:
+                    tail = row[0]
+                    size += 1
+                    row = self.first_child(tail)
+                if size < 2:
+                    continue
+
+                # Update the chain.
+                update = []
+                cid = head
+                while cid is not None:
+                    update.append((head, tail, size, cid))
+                    if len(update) >= GraphStore.BATCH:
+                        db.executemany('UPDATE commits SET chain_head = ?, chain_tail = ?, chain_size = ? WHERE cid = ?', update)
+                        del update[:]
+                    if cid == tail:
+                        break
+                    cid = self.first_child(cid)[0]
+                db.executemany('UPDATE commits SET chain_head = ?, chain_tail = ?, chain_size = ? WHERE cid = ?', update)
+        db.commit()
+
+    def node(self, row):
+        '''
+        Create the StoreNode for a commits row.
+        '''
+        cid, dts, branches, tags, nvars, extra, nchildren, head, tail, size = row
+        pids = [r[0] for r in self.m_db.execute('SELECT pid FROM parents WHERE cid = ? AND keep = 1 ORDER BY pos', (cid,))]
+        nd = StoreNode(cid, pids, json.loads(branches), json.loads(tags), parse_date(dts), nchildren)
+        nd.m_vars = json.loads(nvars)
+        nd.m_extra = json.loads(extra)
+        if head is not None:
+            nd.m_chain_head = StoreNode(head)
+            nd.m_chain_tail = StoreNode(tail)
+            nd.m_chain_size = size
+        return nd
+
+    def nodes(self, order='idx'):
+        '''
+        Generate the kept commits as StoreNodes.
+        '''
+        cur = self.m_db.cursor()
+        cur.execute('''SELECT cid, dts, branches, tags, vars, extra, nchildren, chain_head, chain_tail, chain_size
+FROM commits WHERE keep = 1 ORDER BY {}'''.format(order))
+        for row in cur:
+            yield self.node(row)
+
+    def nodes_bydate(self):
+        '''
+        Generate the kept commits in commit date order.
+        '''
+        return self.nodes('ts, idx')
+
+
+class CommitGraph:
+    r'''
+    Reader for the commit-graph files that git keeps in objects/info
+    (--commit-graph).
+
+    The files are memory mapped and only the entries that are visited
+    are decoded. A chain of split commit-graph files is treated as a
+    single graph with the base layers first, which is how git numbers
+    the commit positions.
+    '''
+
+    NO_PARENT = 0x70000000
+    EXTRA_EDGES = 0x80000000  # parent2 is an index into the EDGE chunk
+    LAST_EDGE = 0x80000000
+
+    class Layer:
+        r'''
+        A single commit-graph file.
+        '''
+
+        def __init__(self, mm, first, num, hashlen, chunks):
+            self.m_mm = mm
+            self.m_first = first  # position of the first commit
+            self.m_num = num
+            self.m_hashlen = hashlen
+            self.m_oidf = chunks[b'OIDF']
+            self.m_oidl = chunks[b'OIDL']
+            self.m_cdat = chunks[b'CDAT']
+            self.m_edge = chunks.get(b'EDGE')
+
+    def __init__(self, common):
+        self.m_layers = []
+        self.m_num = 0
+        self.m_files = []
+        info = os.path.join(common, 'objects', 'info')
+        chain = os.path.join(info, 'commit-graphs', 'commit-graph-chain')
+        paths = []
+        if os.path.isfile(chain):
+            with open(chain, 'r') as ifp:
+                for line in ifp:
+                    if line.strip():
+                        paths.append(os.path.join(info, 'commit-graphs', 'graph-{}.graph'.format(line.strip())))
+        elif os.path.isfile(os.path.join(info, 'commit-graph')):
+            paths.append(os.path.join(info, 'commit-graph'))
+        for path in paths:
+            self.add_layer(path)
+
+    def add_layer(self, path):
+        with open(path, 'rb') as ifp:
+            mm = mmap.mmap(ifp.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:4] != b'CGPH':
+            raise ValueError('{} is not a commit-graph file'.format(path))
+        version, hashver, nchunks = struct.unpack('>BBB', mm[4:7])
+        if version != 1 or hashver not in (1, 2):
+            raise ValueError('{} has an unsupported version'.format(path))
+        chunks = {}
+        for i in range(nchunks):
+            off = 8 + 12 * i
+            cid, coff = struct.unpack('>4sQ', mm[off:off + 12])
+            chunks[cid] = coff
+        oidf = chunks[b'OIDF']
+        num = struct.unpack('>I', mm[oidf + 1020:oidf + 1024])[0]
+        self.m_layers.append(CommitGraph.Layer(mm, self.m_num, num, 20 if hashver == 1 else 32, chunks))
+        self.m_num += num
+        self.m_files.append(path)
+
+    def layer(self, pos):
+        for layer in reversed(self.m_layers):
+            if pos >= layer.m_first:
+                return layer
+
+    def lookup(self, sha):
+        '''
+        Get the position of a commit or None if it is not in the graph.
+        '''
+        key = binascii.unhexlify(sha)
+        for layer in self.m_layers:
+            mm = layer.m_mm
+            hl = layer.m_hashlen
+            if len(key) != hl:
+                continue
+            byte = bytearray(key)[0]
+            lo = 0
+            if byte > 0:
+                lo = struct.unpack('>I', mm[layer.m_oidf + 4 * (byte - 1):layer.m_oidf + 4 * byte])[0]
+            hi = struct.unpack('>I', mm[layer.m_oidf + 4 * byte:layer.m_oidf + 4 * (byte + 1)])[0]
+            while lo < hi:
+                mid = (lo + hi) // 2
+                off = layer.m_oidl + mid * hl
+                oid = mm[off:off + hl]
+                if oid == key:
+                    return layer.m_first + mid
+                if oid < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        return None
+
+    def sha(self, pos):
+        layer = self.layer(pos)
+        off = layer.m_oidl + (pos - layer.m_first) * layer.m_hashlen
+        return binascii.hexlify(layer.m_mm[off:off + layer.m_hashlen]).decode('ascii')
+
+    def commit(self, pos):
+        '''
+        Get the parent positions, the generation number and the commit
+        time of a commit.
+        '''
+        layer = self.layer(pos)
+        mm = layer.m_mm
+        off = layer.m_cdat + (pos - layer.m_first) * (layer.m_hashlen + 16) + layer.m_hashlen
+        p1, p2, w1, w2 = struct.unpack('>IIII', mm[off:off + 16])
+        gen = w1 >> 2
+        ts = ((w1 & 3) << 32) | w2
+        parents = []
+        if p1 != CommitGraph.NO_PARENT:
+            parents.append(p1)
+        if p2 != CommitGraph.NO_PARENT:
+            if p2 & CommitGraph.EXTRA_EDGES:
+                # Octopus merge, the rest of the parents are in the
+                # edge list.
+                i = p2 & 0x7fffffff
+                while True:
+                    off = layer.m_edge + 4 * i
+                    val = struct.unpack('>I', mm[off:off + 4])[0]
+                    parents.append(val & 0x7fffffff)
+                    if val & CommitGraph.LAST_EDGE:
+                        break
+                    i += 1
+            else:
+                parents.append(p2)
+        return parents, gen, ts
+
+    def abbrev(self, minimum):
+        '''
+        Get the length of the abbreviated commit ids. It is at least
+        minimum and long enough that no two commits in the graph have
+        the same abbreviation, the ids are compared to their neighbors
+        in sort order (OIDL), merged over the layers.
+        '''
+        def oids(layer):
+            mm = layer.m_mm
+            hl = layer.m_hashlen
+            for i in range(layer.m_num):
+                off = layer.m_oidl + i * hl
+                yield mm[off:off + hl]
+
+        length = minimum
+        last = None
+        for oid in heapq.merge(*[oids(layer) for layer in self.m_layers]):
+            if last is not None:
+                # The number of leading hex digits that are the same.
+                i = 0
+                while i < len(oid) and oid[i:i + 1] == last[i:i + 1]:
+                    i += 1
+                same = 2 * i
+                if i < len(oid) and (bytearray(oid[i:i + 1])[0] >> 4) == (bytearray(last[i:i + 1])[0] >> 4):
+                    same += 1
+                length = max(length, same + 1)
+            last = oid
+        return length
+
+
+class ReachIndex:
+    r'''
+    Reachability index over the parsed commit graph.
+
+    It answers "is commit v an ancestor of commit u" in near constant
+    time using two labels for each commit:
+
+       1. the generation number, an ancestor always has a smaller
+          generation number than its descendants.
+       2. the post order intervals from a depth first walk of the
+          parent links. The walk tree interval [pre, post] proves that
+          v is reachable and the [low, post] interval, where low is the
+          smallest post order number that can be reached, proves that
+          it is not.
+
+    Only the queries that none of the labels can answer do a walk and
+    that walk is pruned by the same labels. The index is built once
+    and can answer any number of queries.
+    '''
+
+    def __init__(self, nodes):
+        num = len(nodes)
+        pos = dict((nd.m_cid, i) for i, nd in enumerate(nodes))
+        self.m_pos = pos
+        self.m_parents = [[pos[p] for p in nd.m_parents if p in pos] for nd in nodes]
+        self.m_pre = [0] * num
+        self.m_post = [0] * num
+        self.m_low = [0] * num
+        self.m_gen = [0] * num
+
+        # Iterative depth first walk from the commits that are not
+        # parents of anything (the tips).
+        is_parent = [False] * num
+        for ps in self.m_parents:
+            for p in ps:
+                is_parent[p] = True
+        starts = [i for i in range(num) if not is_parent[i]]
+
+        visited = [False] * num
+        counter = 0
+        for start in starts + list(range(num)):
+            if visited[start]:
+                continue
+            visited[start] = True
+            self.m_pre[start] = counter
+            counter += 1
+            stack = [(start, 0)]
+            while len(stack) > 0:
+                i, j = stack[-1]
+                ps = self.m_parents[i]
+                if j < len(ps):
+                    stack[-1] = (i, j + 1)
+                    p = ps[j]
+                    if not visited[p]:
+                        visited[p] = True
+                        self.m_pre[p] = counter
+                        counter += 1
+                        stack.append((p, 0))
+                    continue
+                # All of the parents are done.
+                stack.pop()
+                self.m_post[i] = counter
+                counter += 1
+                low = self.m_post[i]
+                gen = 0
+                for p in ps:
+                    low = min(low, self.m_low[p])
+                    gen = max(gen, self.m_gen[p])
+                self.m_low[i] = low
+                self.m_gen[i] = gen + 1
+
+        # Use the generation numbers from the commit-graph if all of
+        # the nodes have them.
+        if num > 0 and all(nd.m_gen is not None and nd.m_gen > 0 for nd in nodes):
+            self.m_gen = [nd.m_gen for nd in nodes]
+
+    def reaches(self, u, v):
+        '''
+        Is v an ancestor of u (or u itself)?
+        The arguments are positions in the node list.
+        '''
+        if u == v:
+            return True
+        if self.m_gen[v] >= self.m_gen[u]:
+            return False
+        if self.m_pre[u] <= self.m_pre[v] and self.m_post[v] <= self.m_post[u]:
+            return True  # v is below u in the walk tree
+        if self.m_low[v] < self.m_low[u] or self.m_post[v] > self.m_post[u]:
+            return False
+
+        # The labels cannot decide, walk the parents that might lead
+        # to v.
+        stack = [u]
+        seen = set()
+        while len(stack) > 0:
+            w = stack.pop()
+            for p in self.m_parents[w]:
+                if p == v:
+                    return True
+                if p in seen or self.m_gen[p] <= self.m_gen[v]:
+                    continue
+                if self.m_low[v] < self.m_low[p] or self.m_post[v] > self.m_post[p]:
+                    continue
+                seen.add(p)
+                stack.append(p)
+        return False
+
+
 def info(msg, lev=1):
     ''' Print an informational message with the source line number. '''
-    print('// INFO:{} {}'.format(inspect.stack()[lev][2], msg))
+    print('// INFO:{} {}'.format(sys._getframe(lev).f_lineno, msg))
 
 
 def infov(opts, msg, lev=1):
     ''' Print an informational message with the source line number. '''
     if opts.verbose > 0:
-        print('// INFO:{} {}'.format(inspect.stack()[lev][2], msg))
+        print('// INFO:{} {}'.format(sys._getframe(lev).f_lineno, msg))
 
 
 def warn(msg, lev=1):
     ''' Print a warning  message with the source line number. '''
-    print('// WARNING:{} {}'.format(inspect.stack()[lev][2], msg))
+    print('// WARNING:{} {}'.format(sys._getframe(lev).f_lineno, msg))
 
 
 def err(msg, lev=1):
     ''' Print an error message and exit. '''
-    sys.stderr.write('// ERROR:{} {}\n'.format(inspect.stack()[lev][2], msg))
+    sys.stderr.write('// ERROR:{} {}\n'.format(sys._getframe(lev).f_lineno, msg))
     sys.exit(1)
 
 
@@ -325,6 +1058,50 @@ def runcmd_short(cmd, show_output=True):
     return status, output
 
 
+def runcmd_timeout(cmd, timeout, show_output=True):
+    '''
+    Execute a shell command with no inputs and kill it if it runs for
+    more than timeout seconds (None means no limit).
+    Capture output and exit status and report whether it timed out.
+    The command is run in its own session (and process group) so that
+    anything that it started is killed with it. The session is created
+    by start_new_session rather than a preexec_fn because the renders
+    run on threads.
+    '''
+    group = hasattr(os, 'killpg')
+    proc = subprocess.Popen(shlex.split(cmd),
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT,
+                            start_new_session=group)
+    expired = []
+
+    def kill():
+        expired.append(True)
+        try:
+            if group:
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+        except OSError:
+            pass  # it already finished
+
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, kill)
+        timer.daemon = True
+        timer.start()
+    try:
+        output = proc.communicate()[0].decode('utf-8', 'ignore')
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+    if show_output:
+        sys.stdout.write(output)
+
+    return proc.returncode, output, len(expired) > 0
+
+
 def runcmd(cmd, show_output=True):
     '''
     Wrapper for run commands.
@@ -332,327 +1109,1991 @@ def runcmd(cmd, show_output=True):
     return runcmd_long(cmd, show_output)
 
 
-def read(opts):
+def gitcmd(opts):
     '''
-    Read the input data.
-    The input can come from two general sources: the output of a git
-    command or a file that contains the output from a git comment
-    (-i).
+    Build the git command that generates the input data.
+    The user options are only applied to the default command.
     '''
-    # Run the git command.
-    infov(opts, 'reading git repo data')
-    out = ''
-    if opts.input != '':
-        # The user specified a file that contains the input data
-        # via the -i option.
-        try:
-            with open(opts.input, 'r') as ifp:
-                out = ifp.read()
-        except IOError as e:
-            err('input read failed: {}'.format(e))
-    else:
-        # The user chose to run a git command.
-        cmd = opts.gitcmd
-        if cmd.replace('%%', '%') == DEFAULT_GITCMD:
-            cmd = cmd.replace('%%', '%')
+    cmd = opts.gitcmd
+    if cmd.replace('%%', '%') == DEFAULT_GITCMD:
+        cmd = cmd.replace('%%', '%')
+        if opts.cnode_label != '' and not opts.null:
+            x = cmd.rindex('"')
+            cmd = cmd[:x] + '%n{}|{}'.format(opts.cnode_label_recid, opts.cnode_label) + cmd[x:]
+
+        if opts.since != '':
+            cmd += ' --since="{}"'.format(opts.since)
+        if opts.until != '':
+            cmd += ' --until="{}"'.format(opts.until)
+        if opts.range != '':
+            cmd += ' {}'.format(opts.range)
+        if opts.read_refs:
+            # Report the full commit id instead of the decoration,
+            # it is used to look up the refs.
+            cmd = cmd.replace('%d', '%H', 1)
+        if opts.define_var is None and not opts.keep:
+            # The commit body is only scanned for variables (-D) so
+            # don't ask git for it. It is kept for -k so that the
+            # output can be re-used with -D.
+            cmd = cmd.replace('%n%b', '', 1)
+        if opts.null:
+            # NUL framed records with separator characters that
+            # cannot appear in the data, see records_nul().
+            x = cmd.index('"')
+            y = cmd.index('"', x + 1)
+            flds = cmd[x + 1:y].split('|')[2:]
+            body = ''
+            if flds[-1].endswith('%n%b'):
+                flds[-1] = flds[-1][:-len('%n%b')]
+                body = '%b'
             if opts.cnode_label != '':
-                x = cmd.rindex('"')
-                cmd = cmd[:x] + '%n{}|{}'.format(opts.cnode_label_recid, opts.cnode_label) + cmd[x:]
-
-            if opts.since != '':
-                cmd += ' --since="{}"'.format(opts.since)
-            if opts.until != '':
-                cmd += ' --until="{}"'.format(opts.until)
-            if opts.range != '':
-                cmd += ' {}'.format(opts.range)
+                labels = '%x1f'.join(opts.cnode_label.split('|'))
+            else:
+                labels = ''
+            fmt = '%x00' + '%x1e'.join(flds + [labels, body])
+            cmd = cmd[:x + 1] + fmt + cmd[y:]
+        if len(opts.path) > 0:
+            # Only report the commits that touch the paths. The
+            # parents are rewritten to the nearest ancestors that
+            # touch them so the graph stays connected.
+            cmd += ' --parents -- {}'.format(' '.join('"{}"'.format(p) for p in opts.path))
+    else:
+        # If the user specified a custom command then we
+        # do not allow the user options to affect it.
+        if opts.cnode_label != '':
+            warn('-l <label> ignored when -g is specified')
+        if opts.since != '':
+            warn('--since ignored when -g is specified')
+        if opts.until != '':
+            warn('--until ignored when -g is specified')
+        if opts.range != DEFAULT_RANGE:
+            warn('--range ignored when -g is specified')
+        if opts.read_refs:
+            warn('--read-refs ignored when -g is specified')
+            opts.read_refs = False
+        if opts.null:
+            warn('-z ignored when -g is specified')
+        if len(opts.path) > 0:
+            warn('--path ignored when -g is specified')
+    return cmd
+
+
+def git_dirs():
+    '''
+    Find the git directory and the common directory (they are
+    different for worktrees) without running git.
+    '''
+    gitdir = os.environ.get('GIT_DIR', '')
+    path = os.getcwd()
+    while gitdir == '':
+        dotgit = os.path.join(path, '.git')
+        if os.path.isdir(dotgit):
+            gitdir = dotgit
+        elif os.path.isfile(dotgit):
+            # A worktree or submodule: "gitdir: <path>".
+            with open(dotgit, 'r') as ifp:
+                gitdir = os.path.join(path, ifp.read().strip().split(': ', 1)[1])
+        elif os.path.isfile(os.path.join(path, 'HEAD')) and os.path.isdir(os.path.join(path, 'objects')):
+            gitdir = path  # bare repository
         else:
-            # If the user specified a custom command then we
-            # do not allow the user options to affect it.
-            if opts.cnode_label != '':
-                warn('-l <label> ignored when -g is specified')
-            if opts.since != '':
-                warn('--since ignored when -g is specified')
-            if opts.until != '':
-                warn('--until ignored when -g is specified')
-            if opts.range != DEFAULT_RANGE:
-                warn('--range ignored when -g is specified')
+            parent = os.path.dirname(path)
+            if parent == path:
+                err('not a git repository: {}'.format(os.getcwd()))
+            path = parent
 
-        infov(opts, 'running command: {}'.format(cmd))
-        st, out = runcmd(cmd, show_output=opts.verbose > 1)
-        if st:
-            err('Command failed: {}\n{}'.format(cmd, out))
-        infov(opts, 'read {:,} bytes'.format(len(out)))
+    common = gitdir
+    try:
+        with open(os.path.join(gitdir, 'commondir'), 'r') as ifp:
+            common = os.path.join(gitdir, ifp.read().strip())
+    except IOError:
+        pass
+    return gitdir, common
 
-    if opts.keep is True:
-        # The user decided to keep the generated output for
-        # re-use.
-        ofn = opts.DOT_FILE[0] + '.keep'
-        infov(opts, 'writing command output to {}'.format(ofn))
-        try:
-            with open(ofn, 'w') as ofp:
-                ofp.write(out)
-        except IOError as e:
-            err('unable to write to {}: {}'.format(ofn, e))
 
-    return out.splitlines()
+def read_loose_object(common, sha):
+    '''
+    Read the type and contents of a loose object.
+    Returns None if the object is not loose (it is in a pack).
+    '''
+    path = os.path.join(common, 'objects', sha[:2], sha[2:])
+    try:
+        with open(path, 'rb') as ifp:
+            data = zlib.decompress(ifp.read())
+    except (IOError, OSError, zlib.error):
+        return None
+    hdr, _, body = data.partition(b'\0')
+    return hdr.split(b' ')[0].decode('ascii'), body
 
 
-def prune_by_date(opts):
+def peel(common, refs):
     '''
-    Prune by date is --since, --until or --range were specified.
+    Peel the annotated tags to the commits that they refer to.
+    The loose tag objects are read directly. The ones in packs are
+    peeled by a single git cat-file command that reads them from
+    stdin so that any number of tags can be peeled.
     '''
-    if opts.since != '' or opts.until != '' or opts.range != '':
-        infov(opts, 'pruning parents')
-        nump = 0
-        numt = 0
-        for i, nd in enumerate(Node.m_list):
-            np = []
-            for cid in nd.m_parents:
-                numt += 1
-                if cid in Node.m_map:
-                    np.append(cid)
-                else:
-                    nump += 1
-            if len(np) < len(nd.m_parents):  # pruned
-                Node.m_list[i].m_parents = np
-                Node.m_map[nd.m_cid].m_parents = np
-        infov(opts, 'pruned {:,} parent node references out of {:,}'.format(nump, numt))
+    packed = []
+    for name, sha in refs.items():
+        seen = 0
+        while seen < 16:  # tags of tags are allowed but rare
+            seen += 1
+            obj = read_loose_object(common, sha)
+            if obj is None:
+                packed.append(name)
+                break
+            if obj[0] != 'tag':
+                break
+            sha = obj[1].split(b'\n')[0].split(b' ')[1].decode('ascii')
+        refs[name] = sha
+
+    if len(packed) > 0:
+        text = ''.join('{}^{{}}\n'.format(refs[name]) for name in packed)
+        try:
+            proc = subprocess.Popen(['git', 'cat-file', '--batch-check'],
+                                    stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT)
+            out = proc.communicate(text.encode('ascii'))[0].decode('utf-8', 'ignore')
+        except OSError as e:
+            err('unable to peel the tags: {}'.format(e))
+        if proc.returncode:
+            err('unable to peel the tags: {}'.format(out))
+        for name, line in zip(packed, out.splitlines()):
+            flds = line.split()
+            if len(flds) == 3:
+                refs[name] = flds[0]
+            else:
+                warn('unable to peel {}: {}'.format(name, line))
 
 
-def prune_by_choice(opts):
+def read_refs(opts):
     '''
-    Prune by --choose-branch and --choose-tag if they were specified.
+    Read the branches and tags directly from the refs directory and
+    packed-refs file (--read-refs).
+
+    Returns a map of full commit ids to the decoration text that git
+    would have reported for %d. The decorations are in the same order
+    as git reports them: HEAD first and then the refs in reverse name
+    order.
     '''
-    if len(opts.choose_branch) > 0 or len(opts.choose_tag) > 0:
-        # The algorithm is as follows:
-        #     1. for each branch and tag find the associated node.
-        #
-        #     2. mark all nodes for deletion (m_choose=False)
-        #
-        #     3. walk back through graph and tag all nodes accessible
-        #        from the parent link as keepers (m_choose=True).
-        #        any node found that already has m_choose=True can be
-        #        skipped because it was already processed by another
-        #        traversal.
-        #
-        #     4. delete all nodes marked for deletion.
-        #        iterate over all nodes, collect the delete ids in a cache
-        #        reverse iterate over the cache and remove them
-        #        make sure that they are removed from the list and the map
-        #        just prior to delete a node, remove it from child list
-        #        of its parents and from the parent list of its children.
-        #        make sure that all m_idx settings are correctly updated.
-        infov(opts, 'pruning graph based on choices')
-        bs = {}
-        ts = {}
-
-        # initialize
-        for b in opts.choose_branch:
-            bs[b] = []
-        for t in opts.choose_tag:
-            ts[t] = []
-
-        for idx in range(len(Node.m_list)):
-            Node.m_list[idx].m_choose = False  # step 2
-
-            # Step 1.
-            nd =  Node.m_list[idx]
-            for b in opts.choose_branch:
-                if b in nd.m_branches:
-                    bs[b].append(idx)
-
-            for t in opts.choose_tag:
-                if t in nd.m_tags:
-                    ts[t].append(idx)
-
-        # Warn if any were not found.
-        for b, a in sorted(bs.items()):
-            if len(a) == 0:
-                warn('--choose-branch not found: "{}"'.format(b))
-        for t, a in sorted(ts.items()):
-            if len(a) == 0:
-                warn('--choose-branch not found: "{}"'.format(t))
-
-        # At this point all of the branches and tags have been found.
-        def get_parents(idx, parents):
-            # Can't use recursion because large graphs may have very
-            # long chains.
-            # Use a breadth first expansion instead.
-            # This works because git commits are always a DAG.
-            stack = []
-            stack.append(idx)
-            while len(stack) > 0:
-                idx = stack.pop()
-                if idx in parents:
-                    continue  # already processed
-
-                nd =  Node.m_list[idx]
-                Node.m_list[idx].m_choose = True
-                parents[idx] = nd.m_cid
-                for pcid in nd.m_parents:
-                    pidx = Node.m_map[pcid].m_idx
-                    stack.append(pidx)
-
-        parents = {}  # key=idx, val=cid
-        for b, a in sorted(bs.items()):
-            if len(a) > 0:
-                for idx in a:
-                    get_parents(idx, parents)
-        for t, a in sorted(ts.items()):
-            if len(a) > 0:
-                for idx in a:
-                    get_parents(idx, parents)
-
-        pruning = len(Node.m_list) - len(parents)
-        infov(opts, 'keeping {:,}'.format(len(parents)))
-        infov(opts, 'pruning {:,}'.format(pruning))
-        if pruning == 0:
-            warn('nothing to prune')
-            return
+    gitdir, common = git_dirs()
+    infov(opts, 'reading refs from {}'.format(common))
+    refs = {}  # key=refname, val=sha
+    peeled = {}  # key=refname, val=commit sha for annotated tags
+    symbolic = {}  # key=refname, val=target refname
 
-        # We now have all of the nodes that we want to keep.
-        # We need to delete the others.
-        todel = []
-        for nd in Node.m_list[::-1]:
-            if nd.m_choose == False:
-                cid = nd.m_cid
-                idx = nd.m_idx
-
-                # Update the parents child lists.
-                # The parent list is composed of cids.
-                # Note that the child lists stored nodes.
-                for pcid in nd.m_parents:
-                    if pcid in Node.m_map:  # might have been deleted already
-                        pnd =  Node.m_map[pcid]
-                        if pnd.m_choose == True:  # ignore pruned nodes (e.g. False)
-                            pnd.rm_child(cid)
-
-                # Update the child parent lists.
-                # The child list is composed of nodes.
-                # Note that the parent lists store cids.
-                for cnd in nd.m_children:
-                    if cnd.m_choose == True:  # ignore pruned nodes (e.g. False)
-                        cnd.rm_parent(cid)
-
-                # Actual deletion.
-                Node.m_list = Node.m_list[:idx] + Node.m_list[idx+1:]
-                del Node.m_map[cid]
+    # Packed refs first, the loose refs override them.
+    try:
+        with open(os.path.join(common, 'packed-refs'), 'r') as ifp:
+            last = None
+            traits = []
+            for line in ifp:
+                line = line.strip()
+                if line.startswith('# pack-refs with:'):
+                    traits = line.split(':', 1)[1].split()
+                if len(line) == 0 or line[0] == '#':
+                    continue
+                if line[0] == '^':
+                    peeled[last] = line[1:]
+                    continue
+                sha, last = line.split(' ', 1)
+                refs[last] = sha
+                if 'peeled' in traits or 'fully-peeled' in traits:
+                    # The tags are peeled when they are packed, a
+                    # tag without a ^ line is not annotated.
+                    peeled[last] = sha
+    except IOError:
+        pass  # there are no packed refs
+
+    top = os.path.join(common, 'refs')
+    for root, _, files in os.walk(top):
+        for fn in files:
+            path = os.path.join(root, fn)
+            name = 'refs/' + os.path.relpath(path, top).replace(os.sep, '/')
+            try:
+                with open(path, 'r') as ifp:
+                    val = ifp.read().strip()
+            except IOError:
+                continue
+            if val.startswith('ref: '):
+                symbolic[name] = val[5:]
+            else:
+                refs[name] = val
+                peeled.pop(name, None)
+
+    # Peel the tags that were not peeled in packed-refs.
+    tags = dict((k, v) for k, v in refs.items() if k.startswith('refs/tags/') and k not in peeled)
+    peel(common, tags)
+    refs.update(tags)
+    refs.update(peeled)
+    for name, target in symbolic.items():
+        if target in refs:
+            refs[name] = refs[target]
+
+    # HEAD.
+    head = None
+    try:
+        with open(os.path.join(gitdir, 'HEAD'), 'r') as ifp:
+            head = ifp.read().strip()
+    except IOError:
+        pass
 
-        for i, nd in enumerate(Node.m_list):
-            Node.m_list[i].m_idx = i
-            Node.m_map[nd.m_cid].m_idx = i
+    # Only the refs that git log decorates by default are reported,
+    # not for example refs/notes/commits.
+    index = {}  # key=sha, val=list of decorations
+    for name in sorted(refs, reverse=True):
+        if name.startswith('refs/heads/'):
+            ref = name[len('refs/heads/'):]
+        elif name.startswith('refs/remotes/'):
+            ref = name[len('refs/remotes/'):]
+        elif name.startswith('refs/tags/'):
+            ref = 'tag: ' + name[len('refs/tags/'):]
+        elif name == 'refs/stash':
+            ref = name
+        else:
+            continue
+        if head == 'ref: ' + name:
+            index.setdefault(refs[name], []).insert(0, 'HEAD -> ' + ref)
+        else:
+            index.setdefault(refs[name], []).append(ref)
+    if head is not None and not head.startswith('ref: '):
+        index.setdefault(head, []).insert(0, 'HEAD')
 
-        infov(opts, 'remaining {:,}'.format(len(Node.m_list)))
+    infov(opts, 'found {:,} refs on {:,} commits'.format(len(refs), len(index)))
+    return dict((k, ' ({})'.format(', '.join(v))) for k, v in index.items())
 
 
-def parse(opts):
+def update_file(sha, path, content):
     '''
-    Parse the node data.
+    Add a file to the hash, by content or by size and modification
+    time.
     '''
-    infov(opts, 'loading nodes (commit data)')
-    nd = None
-    lines = read(opts)
+    sha.update('{}\n'.format(path).encode('utf-8'))
+    if content:
+        try:
+            with open(path, 'rb') as ifp:
+                sha.update(ifp.read())
+        except IOError:
+            pass
+    elif os.path.exists(path):
+        st = os.stat(path)
+        sha.update('{} {}\n'.format(st.st_size, st.st_mtime).encode('utf-8'))
 
-    infov(opts, 'parsing read data')
-    for line in lines:
-        line = line.strip()
-        if line.find(u'|Record:|') >= 0:
-            flds = line.split('|')
-            assert flds[1] == 'Record:'
-            cid = flds[2]  # Commit id.
-            pids = flds[3].split()  # parent ids
-            tags = []
-            branches = []
-            refs = flds[4].strip()
-            try:
-                dts = dateutil.parser.parse(flds[5])
-            except:
-                err('unrecognized date format: {}\n\tline: {}'.format(flds[5], line))
-            if len(refs):
-                # branches and tags
-                if refs[0] == '(' and refs[-1] == ')':
-                    refs = refs[1:-1]
-                for fld in refs.split(','):
-                    fld = fld.strip()
-                    if 'tag: ' in fld:
-                        tags.append(fld)
-                    else:
-                        ref = fld
-                        if ' -> ' in fld:
-                            ref = fld.split(' -> ')[1]
-                        branches.append(ref)
-            nd = Node(cid, pids, branches, tags, dts)
 
-        if opts.define_var is not None:
-            # The user defined one or more variables.
-            # Scan each line to see if the variable
-            # specification exists.
-            for p in opts.define_var:
-                var = p[0]
-                reg = p[1]
-                m = re.search(reg, line)
-                if m:
-                    # A variable was found.
-                    val = m.group(1)
-
-                    # Set the value on the node.
-                    idx = nd.m_idx
-                    if var not in Node.m_list[idx].m_vars:
-                        Node.m_list[idx].m_vars[var] = []
-                    Node.m_list[idx].m_vars[var].append(val)
-
-                    # keep track of which nodes have this defined.
-                    if var not in Node.m_vars_usage:
-                        Node.m_vars_usage[var] = []
-                    Node.m_vars_usage[var].append(nd.m_cid)
+def update_inputs(opts, sha):
+    '''
+    Add the inputs to the hash: the -i files or HEAD and the refs.
+    '''
+    if len(opts.input) > 0:
+        for fn in opts.input:
+            update_file(sha, fn, False)
+    else:
+        gitdir, common = git_dirs()
+        update_file(sha, os.path.join(gitdir, 'HEAD'), True)
+        update_file(sha, os.path.join(common, 'packed-refs'), True)
+        for root, dirs, files in os.walk(os.path.join(common, 'refs')):
+            dirs.sort()
+            for fn in sorted(files):
+                update_file(sha, os.path.join(root, fn), True)
 
-        if opts.cnode_label_recid in line:
-            # Add the additional commit node label data into the node.
-            th = opts.cnode_label_maxwidth
-            flds = line.split('|')
-            idx = nd.m_idx
 
-            def setval(idx, th, val):
-                if th > 0:
-                    val = val[:th]
-                val = val.replace('"', '\\"')
-                Node.m_list[idx].m_extra.append(val)
-
-            # Update the field values.
-            for fld in flds[1:]: # skip the record field
-                # We have the list of fields but these are not, necessarily
-                # the same as the variables.
-                # Example: @CHID@
-                # Example: FOO@CHID@BAR
-                # Example: @CHID@ + %s | next field |
-                # Get the values for each variable and substitute them.
-                found = False
-                if opts.define_var is not None:
-                    for p in opts.define_var:
-                        var = p[0]
-                        if var in fld:
-                            found = True
-                            # The value is defined on this node.
-                            # If it isn't we just ignore it.
-                            if var in Node.m_list[idx].m_vars:
-                                vals = Node.m_list[idx].m_vars[var]
-                                if len(vals) == 1:
-                                    fld = fld.replace(var, vals[0])
-                                    setval(idx, th, fld)
-                                else:
-                                    # This is hard because there may be
-                                    # multiple variables that are vectors
-                                    # of different sizes, punt for now.
-                                    fld = fld.replace(var, '{}'.format(vals))
-                                    setval(idx, th, fld)
-                if not found:
-                    setval(idx, th, fld)
+def input_identity(opts):
+    '''
+    Identify the commit data that a run reads for --store: the git
+    command, the options that change the records and the inputs.
+    '''
+    import hashlib
+    sha = hashlib.sha1()
+    sha.update('version={}\n'.format(VERSION).encode('utf-8'))
+    cmd = opts.gitcmd
+    if cmd.replace('%%', '%') == DEFAULT_GITCMD:
+        cmd = gitcmd(opts)  # a custom command is used as is
+    sha.update('gitcmd={}\n'.format(cmd).encode('utf-8'))
+    sha.update('cnode_label={!r}\n'.format(opts.cnode_label).encode('utf-8'))
+    sha.update('define_var={!r}\n'.format(opts.define_var).encode('utf-8'))
+    update_inputs(opts, sha)
+    return sha.hexdigest()
+
+
+def fingerprint(opts):
+    '''
+    Compute the fingerprint of the inputs for --skip-unchanged.
+    It covers the options, HEAD and the refs, or the -i input file
+    instead of the refs. It is cheap because git is not run and the
+    refs files are hashed as they are, without parsing them.
+    '''
+    import hashlib
+    sha = hashlib.sha1()
+    sha.update('version={}\n'.format(VERSION).encode('utf-8'))
+    ignore = ['jobs', 'render_log', 'skip_unchanged', 'verbose']  # do not change the output
+    for key in sorted(vars(opts)):
+        if key not in ignore:
+            sha.update('{}={!r}\n'.format(key, getattr(opts, key)).encode('utf-8'))
 
-    if len(Node.m_list) == 0:
-        err('no records found')
+    update_inputs(opts, sha)
+    if opts.diff is not None:
+        update_file(sha, opts.diff, False)
+    return sha.hexdigest()
 
-    prune_by_date(opts)
-    prune_by_choice(opts)
+
+def write_fingerprint(opts):
+    '''
+    Append the fingerprint to the summary data at the end of the DOT
+    file (--skip-unchanged). It is only written when all of the
+    outputs were created so that a failed run is not skipped by the
+    next one.
+    '''
+    try:
+        with open(opts.DOT_FILE[0], 'a') as ofp:
+            ofp.write('// summary:fingerprint {}\n'.format(opts.fingerprint))
+    except IOError as e:
+        err('unable to write to {}: {}'.format(opts.DOT_FILE[0], e))
+
+
+def outputs(opts):
+    '''
+    Get the files that a run creates.
+    '''
+    dot = opts.DOT_FILE[0]
+    files = [dot]
+    if opts.png:
+        files.append(dot + '.png')
+    if opts.svg:
+        files.append(dot + '.svg')
+        if opts.svg_compress == 'svgz':
+            files.append(dot + '.svgz')
+        elif opts.svg_compress == 'gz':
+            files.append(dot + '.svg.gz')
+    for fn in [opts.html, opts.html_canvas, opts.jsonl, opts.graphml]:
+        if fn:
+            files.append(fn)
+    return files
+
+
+def is_unchanged(opts):
+    '''
+    Check whether the fingerprint in the summary data of the existing
+    DOT file is the same as the current one (--skip-unchanged) and
+    that all of the outputs exist.
+    Only the end of the DOT file is read.
+    '''
+    path = opts.DOT_FILE[0]
+    try:
+        with open(path, 'rb') as ifp:
+            ifp.seek(0, os.SEEK_END)
+            ifp.seek(max(0, ifp.tell() - 16384))
+            tail = ifp.read().decode('utf-8', 'ignore')
+    except IOError:
+        return False
+    m = re.search(r'^// summary:fingerprint (\w+)\s*$', tail, re.MULTILINE)
+    if m is None or m.group(1) != opts.fingerprint:
+        infov(opts, 'the fingerprint changed')
+        return False
+    for fn in outputs(opts):
+        if not os.path.exists(fn):
+            infov(opts, 'the fingerprint is unchanged but {} does not exist'.format(fn))
+            return False
+    return True
+
+
+def decorate(opts, lines):
+    '''
+    Replace the full commit ids that are reported instead of the git
+    decoration (%d) with the decorations from the refs (--read-refs).
+    '''
+    index = opts.ref_index
+    for line in lines:
+        if line.startswith('\x00'):
+            flds = line.split('\x1e', 3)
+            flds[2] = index.get(flds[2], '')
+            line = '\x1e'.join(flds)
+        elif line.find('|Record:|') >= 0:
+            flds = line.split('|', 5)
+            flds[4] = index.get(flds[4].strip(), '')
+            line = '|'.join(flds)
+        yield line
+
+
+def read_git(opts, cmd):
+    '''
+    Read the output of the git command, adding the decorations from
+    the refs if --read-refs was specified.
+    '''
+    lines = read_cmd(opts, cmd)
+    if opts.read_refs:
+        if getattr(opts, 'ref_index', None) is None:
+            opts.ref_index = read_refs(opts)
+        lines = decorate(opts, lines)
+    return lines
+
+
+COMPRESSION = {
+    # key=extension, val=(magic number, stdlib module, parallel compressors)
+    '.gz': (b'\x1f\x8b', 'gzip', [['pigz', '-c']]),
+    '.bz2': (b'BZh', 'bz2', [['lbzip2', '-c'], ['pbzip2', '-c']]),
+    '.xz': (b'\xfd7zXZ\x00', 'lzma', [['xz', '-T0', '-c']]),
+}
+
+
+def compression(path, magic=None):
+    '''
+    Get the compression extension for a file from the magic number
+    if it is available, otherwise from the file name.
+    Returns '' if the file is not compressed.
+    '''
+    for ext, info in COMPRESSION.items():
+        if magic is not None:
+            if magic.startswith(info[0]):
+                return ext
+        elif path.endswith(ext):
+            return ext
+    return ''
+
+
+def compression_module(ext):
+    '''
+    Import the stdlib module for a compression extension.
+    '''
+    name = COMPRESSION[ext][1]
+    try:
+        return __import__(name)
+    except ImportError:
+        err('{} files are not supported by this python, the {} module is missing'.format(ext, name))
+
+
+def which(prog):
+    '''
+    Find a program in the PATH.
+    '''
+    for dirname in os.environ.get('PATH', '').split(os.pathsep):
+        path = os.path.join(dirname, prog)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+class PipeWriter:
+    r'''
+    Write text to a file through an external compressor so that the
+    compression can use multiple threads (pigz, xz -T0, ...).
+    '''
+
+    def __init__(self, cmd, path):
+        self.m_cmd = cmd
+        self.m_ofp = open(path, 'wb')
+        self.m_proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=self.m_ofp)
+
+    def write(self, text):
+        self.m_proc.stdin.write(text.encode('utf-8'))
+
+    def close(self):
+        self.m_proc.stdin.close()
+        st = self.m_proc.wait()
+        self.m_ofp.close()
+        if st:
+            err('command failed with status {}: {}'.format(st, ' '.join(self.m_cmd)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def open_input(path):
+    '''
+    Open a text file for reading. Compressed files are detected by
+    their magic number and decompressed as they are read.
+    '''
+    with open(path, 'rb') as ifp:
+        magic = ifp.read(8)
+    ext = compression(path, magic)
+    if ext == '':
+        return open(path, 'r')
+    return compression_module(ext).open(path, 'rt')
+
+
+def open_output(path):
+    '''
+    Open a text file for writing. The file is compressed if the name
+    has a compression extension. A parallel compressor is used if
+    one is installed.
+    '''
+    ext = compression(path)
+    if ext == '':
+        return open(path, 'w')
+    for cmd in COMPRESSION[ext][2]:
+        if which(cmd[0]) is not None:
+            return PipeWriter(cmd, path)
+    return compression_module(ext).open(path, 'wt')
+
+
+def keep_file(opts):
+    '''
+    Get the name of the keep file (-k).
+    '''
+    ofn = opts.DOT_FILE[0] + '.keep'
+    if opts.keep_compress != '':
+        ofn += '.' + opts.keep_compress
+    return ofn
+
+
+def read_file(opts, path):
+    '''
+    Read the lines of an input file (-i) one at a time.
+    Compressed files are decompressed as they are read.
+    '''
+    try:
+        with open_input(path) as ifp:
+            for line in ifp:
+                yield line
+    except (IOError, EOFError) as e:
+        err('input read failed: {}'.format(e))
+
+
+def read_cmd(opts, cmd):
+    '''
+    Run a command and return its output one line at a time as it is
+    generated so that the caller can process it while the command is
+    still running.
+    '''
+    infov(opts, 'running command: {}'.format(cmd))
+    proc = subprocess.Popen(cmd,
+                            shell=True,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT)
+    last = collections.deque(maxlen=32)  # context for error reports
+    nbytes = 0
+    for line in iter(proc.stdout.readline, b''):
+        nbytes += len(line)
+        line = line.decode('utf-8', 'ignore')
+        last.append(line)
+        if opts.verbose > 1:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+        yield line
+    proc.stdout.close()
+    st = proc.wait()
+    if st:
+        err('Command failed: {}\n{}'.format(cmd, ''.join(last)))
+    infov(opts, 'read {:,} bytes'.format(nbytes))
+
+
+def read_keep(opts, lines, ofn=None):
+    '''
+    Copy the lines to the keep file (-k) as they are read.
+    '''
+    if ofn is None:
+        ofn = keep_file(opts)
+    if any(os.path.abspath(fn) == os.path.abspath(ofn) for fn in opts.input):
+        # Writing would truncate the file that is being read.
+        infov(opts, 'input is the keep file, not re-writing {}'.format(ofn))
+        for line in lines:
+            yield line
+        return
+
+    infov(opts, 'writing command output to {}'.format(ofn))
+    try:
+        with open_output(ofn) as ofp:
+            for line in lines:
+                ofp.write(line)
+                yield line
+    except IOError as e:
+        err('unable to write to {}: {}'.format(ofn, e))
+
+
+def read(opts):
+    '''
+    Read the input data.
+    The input can come from two general sources: the output of a git
+    command or a file that contains the output from a git comment
+    (-i).
+
+    The lines are returned as an iterator so that they can be parsed
+    as they arrive rather than after everything has been read.
+    '''
+    # Run the git command.
+    infov(opts, 'reading git repo data')
+    if len(opts.input) > 0:
+        # The user specified a file that contains the input data
+        # via the -i option.
+        lines = read_file(opts, opts.input[0])
+    else:
+        # The user chose to run a git command.
+        lines = read_git(opts, gitcmd(opts))
+
+    if opts.keep is True:
+        # The user decided to keep the generated output for
+        # re-use.
+        lines = read_keep(opts, lines)
+
+    return lines
+
+
+def shard_cmds(opts):
+    '''
+    Create the git commands for the shards (--shards).
+    Each command is returned with the revisions that it reads from
+    stdin or None.
+
+    Date shards split the time between the oldest and the newest
+    commit into windows of the same length. The dates come from a
+    quick rev-list probe that only reports the root commits and the
+    newest commit. Each shard filters the commits by date with
+    --since-as-filter (git 2.37 or later) instead of --since so that
+    git does not stop at the first older commit, that would lose the
+    ancestors of a commit with a skewed date. Every shard still walks
+    the whole history but only formats its own commits, so the
+    speedup comes from formatting and parsing the output concurrently,
+    the walk itself is not split.
+
+    Ref shards split the refs into groups and exclude the refs of the
+    earlier groups so that each commit is only reported by one shard.
+    The refs are passed on stdin because there can be too many of
+    them for the command line.
+    '''
+    num = opts.shards
+    if len(opts.path) > 0:
+        err('--shards cannot be used with --path')
+    if opts.shard_by == 'refs':
+        if '--all' not in opts.range.split():
+            err('--shard-by refs requires --all in --range')
+        st, out = runcmd_short('git for-each-ref --format="%(refname)"', show_output=False)
+        out = out.decode('utf-8', 'ignore')
+        if st:
+            err('git for-each-ref failed: {}'.format(out))
+        refs = out.split() + ['HEAD']
+        groups = [refs[i::num] for i in range(num) if len(refs[i::num]) > 0]
+        # The refs replace --all, the rest of the command is unchanged.
+        sopts = copy.copy(opts)
+        sopts.range = ' '.join(x for x in opts.range.split() if x != '--all')
+        base = gitcmd(sopts) + ' --stdin'
+        cmds = []
+        for i, group in enumerate(groups):
+            excl = ['^' + r for g in groups[:i] for r in g]
+            cmds.append((base, group + excl))
+        return cmds
+
+    # Find the oldest and newest commit dates.
+    cmd = gitcmd(opts)
+    probe = 'git rev-list --format=%ct --no-commit-header'
+    if opts.since != '':
+        probe += ' --since="{}"'.format(opts.since)
+    if opts.until != '':
+        probe += ' --until="{}"'.format(opts.until)
+    probe += ' ' + ' '.join(x for x in opts.range.split() if x != '--topo-order')
+    tss = []
+    for extra in ['--max-parents=0', '--max-count=1']:
+        tss += [int(x) for x in read_cmd(opts, '{} {}'.format(probe, extra)) if x.strip().isdigit()]
+    if len(tss) == 0:
+        err('no records found')
+    oldest = min(tss)
+    newest = max(tss)
+
+    # The first window has no lower bound and the last one has no
+    # upper bound so that the commits with skewed dates are read. The
+    # windows override the --since and --until of the command except
+    # at the ends.
+    size = max(1, (newest - oldest + num) // num)
+    cmds = []
+    for i in range(num):
+        since = oldest + i * size
+        sub = cmd
+        if i > 0:
+            sub += ' --since-as-filter=@{}'.format(since)
+        if i + 1 < num:
+            sub += ' --until=@{}'.format(since + size - 1)
+        cmds.append((sub, None))
+    return cmds
+
+
+def topo_order(recs):
+    '''
+    Order the records so that children always appear before their
+    parents, the same as git log --topo-order. Ties are broken by
+    putting the newest commit first.
+    '''
+    num_children = {}
+    for rec in recs.values():
+        for pid in rec.m_parents:
+            if pid in recs:
+                num_children[pid] = num_children.get(pid, 0) + 1
+
+    def key(rec):
+        return (-calendar.timegm(rec.m_dts.utctimetuple()), rec.m_cid)
+
+    ready = [(key(rec), rec.m_cid) for rec in recs.values() if rec.m_cid not in num_children]
+    heapq.heapify(ready)
+    ordered = []
+    while len(ready) > 0:
+        _, cid = heapq.heappop(ready)
+        rec = recs[cid]
+        ordered.append(rec)
+        for pid in rec.m_parents:
+            if pid in num_children:
+                num_children[pid] -= 1
+                if num_children[pid] == 0:
+                    heapq.heappush(ready, (key(recs[pid]), pid))
+    return ordered
+
+
+def keep_chunks(lines):
+    '''
+    Split the raw git output into the text of each record.
+    Returns (cid, text) pairs, anything before the first record is
+    ignored, just like records() does.
+    '''
+    cid = None
+    text = []
+    for line in lines:
+        if line.startswith('\x00'):
+            start = line[1:].split('\x1e', 1)[0]
+        elif line.strip().startswith('|Record:|'):
+            start = line.strip().split('|')[2]
+        else:
+            start = None
+        if start is not None:
+            if cid is not None:
+                yield cid, ''.join(text)
+            cid = start
+            text = []
+        if cid is not None:
+            text.append(line)
+    if cid is not None:
+        yield cid, ''.join(text)
+
+
+def read_shards(opts):
+    '''
+    Read and parse the shards concurrently (--shards).
+    Each shard is parsed as its git command produces the output. The
+    records are merged by commit id and then put back in topological
+    order.
+    '''
+    if len(opts.input) > 0:
+        err('--shards cannot be used with -i')
+    if opts.gitcmd.replace('%%', '%') != DEFAULT_GITCMD:
+        err('--shards cannot be used with -g')
+
+    import tempfile
+    cmds = shard_cmds(opts)
+    if opts.read_refs:
+        opts.ref_index = read_refs(opts)  # once, before the threads start
+    infov(opts, 'reading {} shards by {}'.format(len(cmds), opts.shard_by))
+    merged = {}  # key=cid, val=record
+    lock = threading.Lock()
+    failed = []
+    parts = []
+
+    def ingest(i, cmd, revs):
+        try:
+            if revs is not None:
+                with tempfile.NamedTemporaryFile('w', suffix='.revs', delete=False) as ofp:
+                    ofp.write('\n'.join(revs) + '\n')
+                cmd = '{} < "{}"'.format(cmd, ofp.name)
+            try:
+                lines = read_git(opts, cmd)
+                if opts.keep is True:
+                    part = '{}.keep.{}'.format(opts.DOT_FILE[0], i)
+                    parts.append((i, part))
+                    lines = read_keep(opts, lines, part)
+                for rec in records(opts, lines):
+                    with lock:
+                        if rec.m_cid not in merged:
+                            merged[rec.m_cid] = rec
+            finally:
+                if revs is not None:
+                    os.remove(ofp.name)
+        except SystemExit:
+            failed.append(cmd)  # err() already reported it
+        except Exception as e:
+            warn('shard {} failed: {}: {}'.format(i, type(e).__name__, e))
+            failed.append(cmd)
+
+    threads = [threading.Thread(target=ingest, args=(i, cmd, revs)) for i, (cmd, revs) in enumerate(cmds)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if len(failed) > 0:
+        err('{} of the {} shards failed'.format(len(failed), len(cmds)))
+
+    infov(opts, 'merged {:,} commits'.format(len(merged)))
+    ordered = topo_order(merged)
+    if opts.keep is True:
+        # The parts are not in topological order when they are simply
+        # concatenated (a ref group can fork from a commit of a later
+        # group) so the records are written in the merged order.
+        ofn = keep_file(opts)
+        try:
+            chunks = {}  # key=cid, val=record text
+            for _, part in parts:
+                with open(part, 'r') as ifp:
+                    for cid, text in keep_chunks(ifp):
+                        chunks.setdefault(cid, text)
+                os.remove(part)
+            with open_output(ofn) as ofp:
+                for rec in ordered:
+                    ofp.write(chunks[rec.m_cid])
+        except (IOError, OSError) as e:
+            err('unable to write to {}: {}'.format(ofn, e))
+    return ordered
+
+
+def read_inputs(opts):
+    '''
+    Read and parse several input files one after the other (-i), for
+    example the keep files from mirrors or from date sharded runs.
+    Parsing is bound by the interpreter so threads would not help.
+
+    The records are merged by commit id. A file is a snapshot, the
+    newer snapshot (the one with the newest commit, or the later one
+    on the command line if they are the same) wins when the files
+    disagree, so each branch and tag is only reported for the commit
+    that it refers to in the newest snapshot that has it. The merged
+    records are put back in topological order.
+    '''
+    if opts.keep:
+        err('-k cannot be used with more than one -i file')
+    infov(opts, 'reading {} input files'.format(len(opts.input)))
+    snapshots = []
+    failed = []
+    for fn in opts.input:
+        try:
+            snapshots.append(list(records(opts, read_file(opts, fn))))
+        except SystemExit:
+            failed.append(fn)  # err() already reported it
+        except Exception as e:
+            warn('reading {} failed: {}: {}'.format(fn, type(e).__name__, e))
+            failed.append(fn)
+    if len(failed) > 0:
+        err('{} of the {} input files failed'.format(len(failed), len(opts.input)))
+
+    # Oldest snapshot first so that the newer ones override it.
+    def newest(i):
+        recs = snapshots[i]
+        return (max(calendar.timegm(rec.m_dts.utctimetuple()) for rec in recs) if len(recs) > 0 else 0, i)
+    order = sorted(range(len(snapshots)), key=newest)
+
+    merged = {}  # key=cid, val=record
+    owners = {}  # key=ref, val=cid
+    num = 0
+    for i in order:
+        for rec in snapshots[i]:
+            num += 1
+            merged[rec.m_cid] = rec
+            for ref in rec.m_branches + rec.m_tags:
+                owners[ref] = rec.m_cid
+
+    for rec in merged.values():
+        rec.m_branches = [ref for ref in rec.m_branches if owners[ref] == rec.m_cid]
+        rec.m_tags = [ref for ref in rec.m_tags if owners[ref] == rec.m_cid]
+    for i in reversed(order):
+        for rec in snapshots[i]:
+            # Keep the refs that a newer snapshot of the same commit
+            # does not have, for example the branches of another
+            # mirror.
+            mrec = merged[rec.m_cid]
+            if mrec is not rec:
+                mrec.m_branches += [ref for ref in rec.m_branches if owners[ref] == rec.m_cid and ref not in mrec.m_branches]
+                mrec.m_tags += [ref for ref in rec.m_tags if owners[ref] == rec.m_cid and ref not in mrec.m_tags]
+
+    infov(opts, 'merged {:,} records into {:,} commits'.format(num, len(merged)))
+    return topo_order(merged)
+
+
+def read_commit_graph(opts):
+    '''
+    Build the records from the commit-graph files (--commit-graph).
+
+    The commits are found by walking the graph from the refs so that
+    only reachable commits are reported, just like git log --all.
+    Refs that are not covered by the graph (commits made since it was
+    written) are read using git log.
+
+    Returns None if the commit-graph cannot be used for this run.
+    '''
+    reason = ''
+    spec = re.sub(r'%(h|H|ct|%)', '', opts.cnode_label)
+    if len(opts.input) > 0:
+        reason = '-i was specified'
+    elif opts.gitcmd.replace('%%', '%') != DEFAULT_GITCMD:
+        reason = '-g was specified'
+    elif opts.since != '' or opts.until != '' or opts.range != DEFAULT_RANGE:
+        reason = '--since, --until or --range was specified'
+    elif len(opts.path) > 0:
+        reason = '--path was specified'
+    elif opts.define_var is not None:
+        reason = '-D needs the commit messages'
+    elif '%' in spec:
+        reason = '-l needs data that is not in the commit-graph'
+    if reason != '':
+        infov(opts, 'not using the commit-graph: {}'.format(reason))
+        return None
+
+    _, common = git_dirs()
+    try:
+        graph = CommitGraph(common)
+    except (IOError, ValueError, KeyError, struct.error) as e:
+        warn('not using the commit-graph: {}'.format(e))
+        return None
+    if graph.m_num == 0:
+        infov(opts, 'not using the commit-graph: none found')
+        return None
+    infov(opts, 'reading {:,} commits from {}'.format(graph.m_num, ', '.join(graph.m_files)))
+
+    index = read_refs(opts)
+    abbrev = graph.abbrev(max(7, (int(math.log(graph.m_num, 2)) + 2) // 2))
+    th = opts.cnode_label_maxwidth
+
+    def labels(sha, ts):
+        extra = []
+        if opts.cnode_label != '':
+            for fld in opts.cnode_label.split('|'):
+                fld = re.sub(r'%(h|H|ct|%)',
+                             lambda m: {'h': sha[:abbrev], 'H': sha, 'ct': str(ts), '%': '%'}[m.group(1)],
+                             fld)
+                if th > 0:
+                    fld = fld[:th]
+                extra.append(fld.replace('"', '\\"'))
+        return extra
+
+    recs = {}
+    stack = []
+    covered = []
+    uncovered = []
+    for sha in index:
+        pos = graph.lookup(sha)
+        if pos is None:
+            uncovered.append(sha)
+        else:
+            covered.append(sha)
+            stack.append(pos)
+
+    if len(uncovered) > 0:
+        # Get the newer commits from git, the revisions are passed on
+        # stdin because there may be a lot of them.
+        infov(opts, '{:,} refs are not in the commit-graph'.format(len(uncovered)))
+        import tempfile
+        with tempfile.NamedTemporaryFile('w', suffix='.revs', delete=False) as ofp:
+            ofp.write('\n'.join(uncovered) + '\n')
+            for sha in covered:
+                ofp.write('^{}\n'.format(sha))
+        try:
+            cmd = 'git log --format="|Record:|%H|%P|%d|%ci%n" --stdin < "{}"'.format(ofp.name)
+            for rec in records(opts, read_cmd(opts, cmd)):
+                sha = rec.m_cid
+                rec.m_extra = labels(sha, calendar.timegm(rec.m_dts.utctimetuple()))
+                rec.m_cid = sha[:abbrev]
+                for pid in rec.m_parents:
+                    pos = graph.lookup(pid)
+                    if pos is not None:
+                        stack.append(pos)
+                rec.m_parents = [pid[:abbrev] for pid in rec.m_parents]
+                recs[rec.m_cid] = rec
+        finally:
+            os.remove(ofp.name)
+
+    visited = set()
+    while len(stack) > 0:
+        pos = stack.pop()
+        if pos in visited:
+            continue
+        visited.add(pos)
+        sha = graph.sha(pos)
+        parents, gen, ts = graph.commit(pos)
+        branches, tags = parse_refs(index.get(sha, ''))
+        dts = datetime.datetime.fromtimestamp(ts, timezone(0))
+        rec = Record(sha[:abbrev], [graph.sha(p)[:abbrev] for p in parents], branches, tags, dts)
+        rec.m_gen = gen
+        rec.m_extra = labels(sha, ts)
+        recs[rec.m_cid] = rec
+        stack.extend(parents)
+
+    infov(opts, 'found {:,} commits in the commit-graph'.format(len(visited)))
+    return topo_order(recs)
+
+
+def read_around(opts):
+    '''
+    Build the records for the commits within --radius edges of the
+    --around commits.
+
+    The ancestors are read from git one level at a time so only the
+    commits that are needed are read. Git cannot look up children so
+    the descendants are found from the parent links reported by git
+    rev-list, which is much cheaper than reading the commits. The walk
+    stops at the committer date of the center (--since) so the older
+    history is not visited, a descendant that is dated before the
+    center because of clock skew is cut off.
+
+    Stub records are created where the graph is cut: for the parents
+    that were not read and for the children that are beyond the
+    radius.
+    '''
+    if len(opts.input) > 0:
+        err('--around cannot be used with -i')
+    if opts.gitcmd.replace('%%', '%') != DEFAULT_GITCMD:
+        err('--around cannot be used with -g')
+    if opts.since != '' or opts.until != '' or opts.range != DEFAULT_RANGE:
+        warn('--since, --until and --range are ignored when --around is specified')
+    if opts.radius < 0:
+        err('--radius must not be negative')
+    if len(opts.path) > 0:
+        err('--around cannot be used with --path')
+    if opts.keep:
+        err('-k cannot be used with --around')
+
+    # Use the full commit ids for the git lookups.
+    import tempfile
+    cmd = gitcmd(opts)
+    x = cmd.index('"')
+    y = cmd.index('"', x + 1)
+    fmt = cmd[x + 1:y].replace('%h', '%H', 1).replace('%p', '%P', 1)
+    base = 'git log --no-walk=unsorted --format="{}" --stdin'.format(fmt)
+
+    def fetch(shas):
+        with tempfile.NamedTemporaryFile('w', suffix='.revs', delete=False) as ofp:
+            ofp.write('\n'.join(shas) + '\n')
+        try:
+            return list(records(opts, read_git(opts, '{} < "{}"'.format(base, ofp.name))))
+        finally:
+            os.remove(ofp.name)
+
+    centers = []
+    for ref in opts.around:
+        st, out = runcmd_short('git rev-parse --verify --quiet "{}^{{commit}}"'.format(ref), show_output=False)
+        if st:
+            err('--around commit not found: "{}"'.format(ref))
+        centers.append(out.decode('utf-8', 'ignore').strip())
+    st, out = runcmd_short('git rev-parse --short {}'.format(centers[0]), show_output=False)
+    abbrev = len(out.decode('utf-8', 'ignore').strip())
+
+    # The ancestors, one level at a time.
+    recs = {}  # key=full commit id, val=record
+    frontier = centers
+    for depth in range(opts.radius + 1):
+        todo = sorted(set(sha for sha in frontier if sha not in recs))
+        if len(todo) == 0:
+            break
+        frontier = []
+        for rec in fetch(todo):
+            recs[rec.m_cid] = rec
+            if depth < opts.radius:
+                frontier.extend(rec.m_parents)
+    infov(opts, 'found {:,} ancestors'.format(len(recs)))
+
+    # The descendants.
+    cuts = []  # (child, parent) pairs for the child stubs
+    todo = set()
+    for center in centers:
+        children = {}
+        since = calendar.timegm(recs[center].m_dts.utctimetuple())
+        for line in read_cmd(opts, 'git rev-list --parents --since=@{} --all ^{}'.format(since, center)):
+            flds = line.split()
+            for pid in flds[1:]:
+                children.setdefault(pid, []).append(flds[0])
+        frontier = [center]
+        seen = set(frontier)
+        for depth in range(opts.radius):
+            nxt = []
+            for sha in frontier:
+                for cid in children.get(sha, []):
+                    if cid not in seen:
+                        seen.add(cid)
+                        nxt.append(cid)
+            frontier = nxt
+        for sha in frontier:
+            for cid in children.get(sha, []):
+                if cid not in seen:
+                    cuts.append((cid, sha))
+        todo.update(sha for sha in seen if sha not in recs)
+    if len(todo) > 0:
+        for rec in fetch(sorted(todo)):
+            recs[rec.m_cid] = rec
+    infov(opts, 'found {:,} commits within {} edges'.format(len(recs), opts.radius))
+
+    # Stubs for the cuts.
+    def stub(sha, pids, dts):
+        rec = Record(sha, pids, [], [], dts)
+        rec.m_extra = ['...']
+        rec.m_stub = True
+        return rec
+
+    stubs = {}
+    for rec in list(recs.values()):
+        for pid in rec.m_parents:
+            if pid not in recs and pid not in stubs:
+                stubs[pid] = stub(pid, [], rec.m_dts)
+    for cid, pid in cuts:
+        if cid not in recs and cid not in stubs:
+            stubs[cid] = stub(cid, [pid], recs[pid].m_dts)
+        elif cid in stubs and pid not in stubs[cid].m_parents:
+            stubs[cid].m_parents.append(pid)
+    infov(opts, 'created {:,} stubs'.format(len(stubs)))
+    recs.update(stubs)
+
+    # Abbreviate the commit ids.
+    ordered = {}
+    for rec in recs.values():
+        rec.m_cid = rec.m_cid[:abbrev]
+        rec.m_parents = [pid[:abbrev] for pid in rec.m_parents]
+        ordered[rec.m_cid] = rec
+    return topo_order(ordered)
+
+
+def read_records(opts):
+    '''
+    Read the input and return the commit records.
+    '''
+    if len(opts.around) > 0:
+        return read_around(opts)
+    if opts.commit_graph:
+        recs = read_commit_graph(opts)
+        if recs is not None:
+            return recs
+    if opts.shards > 1:
+        return read_shards(opts)
+    if len(opts.input) > 1:
+        return read_inputs(opts)
+    return records(opts, read(opts))
+
+
+# The commit date formats: git %ci (2017-02-14 09:33:12 -0500) and the
+# ISO format used by the store (2017-02-14 09:33:12-05:00).
+DATE_RE = re.compile(r'^\s*(\d{4})-(\d\d)-(\d\d)[ T](\d\d):(\d\d):(\d\d) ?([+-])(\d\d):?(\d\d)\s*$')
+TIMEZONES = {}  # key=offset in minutes, val=tzinfo
+
+
+def timezone(minutes):
+    '''
+    Get the fixed offset time zone for an offset in minutes from UTC.
+    '''
+    if minutes not in TIMEZONES:
+        if hasattr(datetime, 'timezone'):
+            TIMEZONES[minutes] = datetime.timezone(datetime.timedelta(minutes=minutes))
+        else:
+            import dateutil.tz
+            TIMEZONES[minutes] = dateutil.tz.tzoffset(None, minutes * 60)
+    return TIMEZONES[minutes]
+
+
+def parse_date(text):
+    '''
+    Parse a commit date.
+    The git %ci format is parsed directly because dateutil is slow to
+    import and to run, it is only used for the other formats.
+    '''
+    m = DATE_RE.match(text)
+    if m is None:
+        import dateutil.parser
+        return dateutil.parser.parse(text)
+    year, month, day, hour, minute, second, sign, tzh, tzm = m.groups()
+    offset = int(tzh) * 60 + int(tzm)
+    if sign == '-':
+        offset = -offset
+    return datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                             tzinfo=timezone(offset))
+
+
+def parse_refs(refs):
+    '''
+    Parse the git decoration (%d) into the branch and tag lists.
+    '''
+    tags = []
+    branches = []
+    refs = refs.strip()
+    if len(refs):
+        # branches and tags
+        if refs[0] == '(' and refs[-1] == ')':
+            refs = refs[1:-1]
+        for fld in refs.split(','):
+            fld = fld.strip()
+            if 'tag: ' in fld:
+                tags.append(fld)
+            else:
+                ref = fld
+                if ' -> ' in fld:
+                    ref = fld.split(' -> ')[1]
+                branches.append(ref)
+    return branches, tags
+
+
+def parse_record(line):
+    '''
+    Parse a |Record:| line into a Record.
+    '''
+    flds = line.split('|')
+    assert flds[1] == 'Record:'
+    cid = flds[2]  # Commit id.
+    pids = flds[3].split()  # parent ids
+    try:
+        dts = parse_date(flds[5])
+    except:
+        err('unrecognized date format: {}\n\tline: {}'.format(flds[5], line))
+    branches, tags = parse_refs(flds[4])
+    return Record(cid, pids, branches, tags, dts)
+
+
+def scan_vars(opts, rec, line):
+    '''
+    Scan a line for the variables (-D) and set their values on the
+    record.
+    '''
+    for p in opts.define_var:
+        var = p[0]
+        reg = p[1]
+        m = re.search(reg, line)
+        if m:
+            # A variable was found.
+            val = m.group(1)
+
+            # Set the value on the record.
+            if var not in rec.m_vars:
+                rec.m_vars[var] = []
+            rec.m_vars[var].append(val)
+
+
+def set_labels(opts, rec, flds):
+    '''
+    Set the commit node label (-l) fields on a record.
+    '''
+    th = opts.cnode_label_maxwidth
+
+    def setval(rec, th, val):
+        if th > 0:
+            val = val[:th]
+        val = val.replace('"', '\\"')
+        rec.m_extra.append(val)
+
+    # Update the field values.
+    for fld in flds:
+        # We have the list of fields but these are not, necessarily
+        # the same as the variables.
+        # Example: @CHID@
+        # Example: FOO@CHID@BAR
+        # Example: @CHID@ + %s | next field |
+        # Get the values for each variable and substitute them.
+        found = False
+        if opts.define_var is not None:
+            for p in opts.define_var:
+                var = p[0]
+                if var in fld:
+                    found = True
+                    # The value is defined on this record.
+                    # If it isn't we just ignore it.
+                    if var in rec.m_vars:
+                        vals = rec.m_vars[var]
+                        if len(vals) == 1:
+                            fld = fld.replace(var, vals[0])
+                            setval(rec, th, fld)
+                        else:
+                            # This is hard because there may be
+                            # multiple variables that are vectors
+                            # of different sizes, punt for now.
+                            fld = fld.replace(var, '{}'.format(vals))
+                            setval(rec, th, fld)
+        if not found:
+            setval(rec, th, fld)
+
+
+def records_nul(opts, lines):
+    '''
+    Parse NUL framed input lines (-z) into commit records.
+
+    Each record starts with a NUL and the fields are separated by
+    0x1e (record separator) characters. The label fields are
+    separated by 0x1f (unit separator) characters. A record is split
+    with a couple of bulk split() calls and the body is only scanned
+    when variables are defined (-D).
+
+       0x00 cid 0x1e pids 0x1e refs 0x1e date 0x1e labels [0x1e body]
+    '''
+    def parse(parts):
+        text = ''.join(parts)
+        flds = text.rstrip('\n').split('\x1e', 5)
+        if len(flds) < 5:
+            err('invalid -z record: {}'.format(repr(text)))
+        try:
+            dts = parse_date(flds[3])
+        except:
+            err('unrecognized date format: {}\n\trecord: {}'.format(flds[3], repr(text)))
+        branches, tags = parse_refs(flds[2])
+        rec = Record(flds[0], flds[1].split(), branches, tags, dts)
+        if opts.define_var is not None and len(flds) > 5:
+            for line in flds[5].split('\n'):
+                scan_vars(opts, rec, line.strip())
+        if flds[4] != '':
+            set_labels(opts, rec, flds[4].split('\x1f'))
+        return rec
+
+    parts = None
+    for line in lines:
+        if line.startswith('\x00'):
+            if parts is not None:
+                yield parse(parts)
+            parts = [line[1:]]
+        elif parts is not None:
+            parts.append(line)
+    if parts is not None:
+        yield parse(parts)
+
+
+def records(opts, lines):
+    '''
+    Parse the input lines into commit records.
+    Records are generated as soon as they are complete so the
+    caller never has to hold the raw input in memory.
+    '''
+    # NUL framed input is detected from the first line so that
+    # it does not matter where it came from (-z, -g or -i).
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return
+    lines = itertools.chain([first], lines)
+    if first.startswith('\x00'):
+        for rec in records_nul(opts, lines):
+            yield rec
+        return
+
+    rec = None
+    for line in lines:
+        line = line.strip()
+        if line.find(u'|Record:|') >= 0:
+            if rec is not None:
+                yield rec
+            rec = parse_record(line)
+
+        if rec is None:
+            continue  # no record yet, ignore the leading noise
+
+        if opts.define_var is not None:
+            scan_vars(opts, rec, line)
+
+        if opts.cnode_label_recid in line:
+            # Add the additional commit node label data into the record.
+            set_labels(opts, rec, line.split('|')[1:])  # skip the record field
+
+    if rec is not None:
+        yield rec
+
+
+def prune_by_date(opts):
+    '''
+    Prune by date is --since, --until or --range were specified.
+    '''
+    if opts.since != '' or opts.until != '' or opts.range != '':
+        infov(opts, 'pruning parents')
+        nump = 0
+        numt = 0
+        for i, nd in enumerate(Node.m_list):
+            np = []
+            for cid in nd.m_parents:
+                numt += 1
+                if cid in Node.m_map:
+                    np.append(cid)
+                else:
+                    nump += 1
+            if len(np) < len(nd.m_parents):  # pruned
+                Node.m_list[i].m_parents = np
+                Node.m_map[nd.m_cid].m_parents = np
+        infov(opts, 'pruned {:,} parent node references out of {:,}'.format(nump, numt))
+
+
+def prune_unchosen(opts):
+    '''
+    Delete the nodes that are not marked as chosen (m_choose=False).
+    The parent references to deleted nodes are removed from the nodes
+    that remain and the m_idx settings are updated.
+    '''
+    keep = []
+    for nd in Node.m_list:
+        if nd.m_choose == True:
+            keep.append(nd)
+        else:
+            # Update the child parent lists.
+            # The child list is composed of nodes.
+            # Note that the parent lists store cids.
+            for cnd in nd.m_children:
+                if cnd.m_choose == True:  # ignore pruned nodes (e.g. False)
+                    cnd.rm_parent(nd.m_cid)
+            del Node.m_map[nd.m_cid]
+
+    Node.m_list = keep
+    for i, nd in enumerate(Node.m_list):
+        nd.m_idx = i
+        nd.m_parents = [pcid for pcid in nd.m_parents if pcid in Node.m_map]
+        nd.m_children = [cnd for cnd in nd.m_children if cnd.m_choose == True]
+
+    infov(opts, 'remaining {:,}'.format(len(Node.m_list)))
+
+
+def find_ref(ref):
+    '''
+    Find the node for a branch or tag in the ref index. Tags match
+    with or without the "tag: " prefix.
+    Returns None if it was not found.
+    '''
+    for name in [ref, 'tag: ' + ref]:
+        cid = Node.m_refs.get(name)
+        if cid is not None and cid in Node.m_map:
+            return Node.m_map[cid]
+    return None
+
+
+def compile_ref_patterns(patterns):
+    '''
+    Compile the --choose-ref and --exclude-ref patterns.
+    A pattern is a glob unless it starts with "re:".
+    '''
+    regexes = []
+    for pat in patterns:
+        if pat.startswith('re:'):
+            try:
+                regexes.append(re.compile('(?:' + pat[3:] + r')\Z'))
+            except re.error as e:
+                err('invalid ref pattern "{}": {}'.format(pat, e))
+        else:
+            regexes.append(re.compile(fnmatch.translate(pat)))
+    return regexes
+
+
+def choose_refs(opts, names):
+    '''
+    Add the refs that match --choose-ref and do not match --exclude-ref
+    to the --choose-branch and --choose-tag lists.
+    The patterns are matched against the names of the refs (tags
+    without the "tag: " prefix) so the cost does not depend on the
+    size of the graph.
+    '''
+    if len(opts.choose_ref) == 0 and len(opts.exclude_ref) == 0:
+        return
+
+    includes = compile_ref_patterns(opts.choose_ref)
+    excludes = compile_ref_patterns(opts.exclude_ref)
+    used = set()
+    num = 0
+    for name in sorted(names):
+        bare = name[5:] if name.startswith('tag: ') else name
+        if len(includes) > 0:
+            matched = [i for i, rx in enumerate(includes) if rx.match(bare)]
+            if len(matched) == 0:
+                continue
+            used.update(matched)
+        if any(rx.match(bare) for rx in excludes):
+            continue
+        if name.startswith('tag: '):
+            opts.choose_tag.append(name)
+        else:
+            opts.choose_branch.append(name)
+        num += 1
+
+    for i, pat in enumerate(opts.choose_ref):
+        if i not in used:
+            warn('--choose-ref did not match any refs: "{}"'.format(pat))
+    infov(opts, 'chose {:,} refs'.format(num))
+    if num == 0:
+        err('no refs were chosen')
+
+
+def parse_contains_spec(spec, bits):
+    '''
+    Parse a containment spec into (required, forbidden, exact) bit
+    masks. A spec is a list of refs separated by "+", a "!" in front
+    of a ref means that it must not contain the commit and a "=" in
+    front of the spec means that no other tracked ref may contain it.
+
+    Examples:
+       main+release    on main and release
+       =release        only on release
+       main+!release   on main but not release
+    '''
+    exact = spec.startswith('=')
+    required = 0
+    forbidden = 0
+    for ref in spec.lstrip('=').split('+'):
+        if ref.startswith('!'):
+            forbidden |= bits[ref[1:]]
+        else:
+            required |= bits[ref]
+    return required, forbidden, exact
+
+
+def contains_spec_refs(spec):
+    '''
+    Get the ref names in a containment spec.
+    '''
+    return [ref.lstrip('!') for ref in spec.lstrip('=').split('+')]
+
+
+def match_contains(nd, spec):
+    '''
+    Does the node containment bitset match a parsed spec?
+    '''
+    required, forbidden, exact = spec
+    if exact:
+        return nd.m_contains == required
+    return (nd.m_contains & required) == required and (nd.m_contains & forbidden) == 0
+
+
+def containment(opts):
+    '''
+    Compute the containment bitset for each node.
+
+    Each tracked branch or tag (--choose-branch, --choose-tag,
+    --contains and the refs in the --contains-* specs) gets a bit. The
+    nodes are visited once in topological order, children before
+    parents, and each node passes its bits on to its parents so bit i
+    of m_contains is set if the commit is reachable from ref i.
+    '''
+    refs = []
+    for ref in opts.choose_branch + opts.choose_tag + opts.contains:
+        if ref not in refs:
+            refs.append(ref)
+    for spec, _ in opts.contains_node:
+        refs += [ref for ref in contains_spec_refs(spec) if ref not in refs]
+    for spec in opts.contains_filter:
+        refs += [ref for ref in contains_spec_refs(spec) if ref not in refs]
+    Node.m_contains_refs = refs
+    if len(refs) == 0:
+        return
+
+    infov(opts, 'computing containment for {:,} refs'.format(len(refs)))
+    bits = dict((ref, 1 << i) for i, ref in enumerate(refs))
+    for nd in Node.m_list:
+        nd.m_contains = 0
+    for ref in refs:
+        nd = find_ref(ref)
+        if nd is not None:
+            nd.m_contains |= bits[ref]
+        else:
+            if ref in opts.choose_branch:
+                warn('--choose-branch not found: "{}"'.format(ref))
+            elif ref in opts.choose_tag:
+                warn('--choose-tag not found: "{}"'.format(ref))
+            else:
+                warn('--contains ref not found: "{}"'.format(ref))
+
+    for nd in topo_order(Node.m_map):
+        if nd.m_contains != 0:
+            for pcid in nd.m_parents:
+                if pcid in Node.m_map:
+                    Node.m_map[pcid].m_contains |= nd.m_contains
+
+    opts.contains_node = [(parse_contains_spec(spec, bits), attrs) for spec, attrs in opts.contains_node]
+    opts.contains_filter = [parse_contains_spec(spec, bits) for spec in opts.contains_filter]
+
+
+def prune_by_choice(opts):
+    '''
+    Prune by --choose-branch and --choose-tag if they were specified.
+    '''
+    if len(opts.choose_branch) > 0 or len(opts.choose_tag) > 0:
+        # The algorithm is as follows:
+        #     1. the containment bitsets have a bit for each branch
+        #        and tag (see containment()).
+        #
+        #     2. mark all nodes that are contained by any of the
+        #        chosen branches and tags as keepers (m_choose=True).
+        #
+        #     3. delete all nodes marked for deletion.
+        infov(opts, 'pruning graph based on choices')
+        mask = 0
+        for i, ref in enumerate(Node.m_contains_refs):
+            if ref in opts.choose_branch or ref in opts.choose_tag:
+                mask |= 1 << i
+
+        keeping = 0
+        for nd in Node.m_list:
+            nd.m_choose = (nd.m_contains & mask) != 0
+            if nd.m_choose:
+                keeping += 1
+
+        pruning = len(Node.m_list) - keeping
+        infov(opts, 'keeping {:,}'.format(keeping))
+        infov(opts, 'pruning {:,}'.format(pruning))
+        if pruning == 0:
+            warn('nothing to prune')
+            return
+
+        # We now have all of the nodes that we want to keep.
+        # We need to delete the others.
+        prune_unchosen(opts)
+
+
+def prune_by_contains(opts):
+    '''
+    Prune by --contains-filter if it was specified.
+    The nodes that match any of the specs are kept.
+    '''
+    if len(opts.contains_filter) == 0:
+        return
+
+    infov(opts, 'pruning graph based on containment')
+    keeping = 0
+    for nd in Node.m_list:
+        nd.m_choose = any(match_contains(nd, spec) for spec in opts.contains_filter)
+        if nd.m_choose:
+            keeping += 1
+
+    infov(opts, 'keeping {:,}'.format(keeping))
+    infov(opts, 'pruning {:,}'.format(len(Node.m_list) - keeping))
+    if keeping == len(Node.m_list):
+        warn('nothing to prune')
+        return
+    prune_unchosen(opts)
+
+
+def lookup_ref(ref):
+    '''
+    Find the node for a commit id (or a unique prefix), a branch or a
+    tag.
+    '''
+    if ref in Node.m_map:
+        return Node.m_map[ref]
+    nd = find_ref(ref)
+    if nd is not None:
+        return nd
+    found = [nd for nd in Node.m_list if nd.m_cid.startswith(ref) or ref.startswith(nd.m_cid)]
+    if len(found) > 1:
+        err('ambiguous commit reference: "{}"'.format(ref))
+    if len(found) == 0:
+        err('commit reference not found: "{}"'.format(ref))
+    return found[0]
+
+
+def prune_by_reach(opts):
+    '''
+    Prune by --ancestors-of, --descendants-of and --between if they
+    were specified. The chosen nodes are the union of all of the
+    selections.
+    '''
+    if len(opts.ancestors_of) == 0 and len(opts.descendants_of) == 0 and len(opts.between) == 0:
+        return
+
+    infov(opts, 'building the reachability index')
+    index = ReachIndex(Node.m_list)
+    infov(opts, 'pruning graph based on ancestry')
+    for nd in Node.m_list:
+        nd.m_choose = False
+
+    for ref in opts.ancestors_of:
+        x = lookup_ref(ref).m_idx
+        for nd in Node.m_list:
+            if index.reaches(x, nd.m_idx):
+                nd.m_choose = True
+
+    for ref in opts.descendants_of:
+        x = lookup_ref(ref).m_idx
+        for nd in Node.m_list:
+            if index.reaches(nd.m_idx, x):
+                nd.m_choose = True
+
+    for a, b in opts.between:
+        x = lookup_ref(a).m_idx
+        y = lookup_ref(b).m_idx
+        for nd in Node.m_list:
+            if index.reaches(y, nd.m_idx) and not index.reaches(x, nd.m_idx):
+                nd.m_choose = True
+
+    keeping = sum(1 for nd in Node.m_list if nd.m_choose)
+    infov(opts, 'keeping {:,}'.format(keeping))
+    infov(opts, 'pruning {:,}'.format(len(Node.m_list) - keeping))
+    if keeping == len(Node.m_list):
+        warn('nothing to prune')
+        return
+    prune_unchosen(opts)
+
+
+def diff_key(rec):
+    '''
+    Get the key that matches a rewritten commit to the original
+    commit (--diff). It is the label fields (-l) without the fields
+    that are commit ids because those change when a commit is
+    rewritten.
+    '''
+    return tuple(fld for fld in rec.m_extra
+                 if not fld.startswith(rec.m_cid) and not rec.m_cid.startswith(fld))
+
+
+def load_diff(opts):
+    '''
+    Compare the parsed commits with the old snapshot (--diff).
+
+    The commits that are only in the new snapshot are added unless
+    they have the same key (see diff_key()) as a commit that is only
+    in the old snapshot in which case they are rewritten. The other
+    commits that are only in the old snapshot are removed, they are
+    added to the graph so that they can be shown.
+
+    Everything is done with hash maps so it is linear in the size of
+    the snapshots.
+    '''
+    if opts.diff is None:
+        return
+
+    infov(opts, 'reading the old snapshot {}'.format(opts.diff))
+    if not os.path.exists(opts.diff):
+        err('--diff file does not exist: {}'.format(opts.diff))
+    old = collections.OrderedDict()
+    for rec in records(opts, read_file(opts, opts.diff)):
+        old[rec.m_cid] = rec
+    if len(old) == 0:
+        err('no records found in {}'.format(opts.diff))
+    if opts.cnode_label == '':
+        warn('rewritten commits cannot be matched without label fields (-l)')
+
+    # The old commits that might have been rewritten.
+    candidates = {}  # key=diff key, val=list of old cids
+    for cid, rec in old.items():
+        if cid not in Node.m_map:
+            key = diff_key(rec)
+            if len(key) > 0:
+                candidates.setdefault(key, []).append(cid)
+
+    matched = set()
+    summary = {'added': 0, 'removed': 0, 'rewritten': 0}
+    for nd in Node.m_list:
+        if nd.m_cid not in old:
+            key = diff_key(nd)
+            if len(candidates.get(key, [])) > 0:
+                matched.add(candidates[key].pop(0))
+                nd.m_diff = 'rewritten'
+            else:
+                nd.m_diff = 'added'
+            summary[nd.m_diff] += 1
+
+    for cid, rec in old.items():
+        if cid not in Node.m_map and cid not in matched:
+            # The old refs are not shown, they would duplicate the
+            # current ones.
+            rec.m_branches = []
+            rec.m_tags = []
+            nd = Node.load(rec)
+            nd.m_diff = 'removed'
+            summary['removed'] += 1
+
+    for key in ['added', 'removed', 'rewritten']:
+        infov(opts, '{} {:,} commits'.format(key, summary[key]))
+
+
+def prune_by_diff(opts):
+    '''
+    Only keep the changed commits (--diff) and the commits that are
+    within --diff-context edges of them.
+    '''
+    if opts.diff is None:
+        return
+
+    changed = [nd for nd in Node.m_list if nd.m_diff is not None]
+    if len(changed) == 0:
+        warn('no differences found')
+        return
+
+    infov(opts, 'pruning graph based on the differences')
+    children = {}
+    for nd in Node.m_list:
+        nd.m_choose = False
+        for pcid in nd.m_parents:
+            children.setdefault(pcid, []).append(nd.m_cid)
+
+    # Breadth first expansion from the changed commits.
+    frontier = changed
+    for nd in frontier:
+        nd.m_choose = True
+    for _ in range(opts.diff_context):
+        nxt = []
+        for nd in frontier:
+            for cid in nd.m_parents + children.get(nd.m_cid, []):
+                if cid in Node.m_map and Node.m_map[cid].m_choose == False:
+                    Node.m_map[cid].m_choose = True
+                    nxt.append(Node.m_map[cid])
+        frontier = nxt
+
+    keeping = sum(1 for nd in Node.m_list if nd.m_choose)
+    infov(opts, 'keeping {:,}'.format(keeping))
+    infov(opts, 'pruning {:,}'.format(len(Node.m_list) - keeping))
+    if keeping < len(Node.m_list):
+        prune_unchosen(opts)
+
+
+def rollup_bucket(opts, dts):
+    '''
+    Get the time bucket number and name of a commit date for --rollup.
+    The bucket numbers are consecutive so the recent window can be
+    found by subtraction.
+    '''
+    if opts.rollup == 'day':
+        return dts.toordinal(), dts.strftime('%Y-%m-%d')
+    if opts.rollup == 'week':
+        year, week, _ = dts.isocalendar()
+        return (dts.toordinal() - dts.weekday()) // 7, '{}-W{:02}'.format(year, week)
+    return dts.year * 12 + dts.month - 1, dts.strftime('%Y-%m')
+
+
+def rollup(opts):
+    '''
+    Replace the commits in each time bucket of each first-parent lane
+    by a single rollup node (--rollup). The commits in the most recent
+    --rollup-recent buckets are not rolled up.
+
+    The lanes are found by walking the first parents from the newest
+    commits so each lane starts at a branch tip or at a merged commit.
+    A commit that is the first parent of several commits continues
+    the lane that was started first, that is usually the main line.
+    The rollup node is the newest commit in the bucket, it gets the
+    refs and the parents of all of the commits in it. A bucket is split
+    where rolling it up whole would create a cycle.
+    '''
+    if opts.rollup is None:
+        return
+
+    infov(opts, 'rolling up commits by {}'.format(opts.rollup))
+    lanes = {}
+    for nd in Node.m_list:  # children before parents
+        if nd.m_cid not in lanes:
+            lanes[nd.m_cid] = len(lanes)
+        if len(nd.m_parents) > 0:
+            pcid = nd.m_parents[0]
+            if pcid not in lanes or lanes[nd.m_cid] < lanes[pcid]:
+                lanes[pcid] = lanes[nd.m_cid]
+
+    newest = max(rollup_bucket(opts, nd.m_dts)[0] for nd in Node.m_list)
+    keys = {}  # key=cid, val=(lane, bucket number)
+    names = {}  # key=(lane, bucket number), val=bucket name
+    for nd in Node.m_list:
+        num, name = rollup_bucket(opts, nd.m_dts)
+        if newest - num < opts.rollup_recent:
+            continue
+        keys[nd.m_cid] = (lanes[nd.m_cid], num)
+        names[keys[nd.m_cid]] = name
+
+    # Rolling up a whole bucket can create a cycle, for example when a
+    # branch is forked and merged back in the same bucket. To avoid
+    # that the commits are ordered parents first, continuing with the
+    # current bucket for as long as it has commits that are ready, and
+    # each bucket is split into the runs that are contiguous in that
+    # order. Rolling up contiguous runs of a topological order always
+    # leaves a DAG.
+    waiting = {}  # key=cid, val=number of parents not ordered yet
+    children = {}  # key=cid, val=child nodes
+    for nd in Node.m_list:
+        pids = set(pcid for pcid in nd.m_parents if pcid in Node.m_map)
+        waiting[nd.m_cid] = len(pids)
+        for pcid in pids:
+            children.setdefault(pcid, []).append(nd)
+
+    heap = []  # the ready commits, oldest first
+    ready = {}  # key=(lane, bucket number), val=the ready commits
+    done = set()
+
+    def push(nd):
+        heapq.heappush(heap, (calendar.timegm(nd.m_dts.utctimetuple()), -nd.m_idx, nd.m_cid))
+        if nd.m_cid in keys:
+            ready.setdefault(keys[nd.m_cid], []).append(nd)
+
+    for nd in Node.m_list:
+        if waiting[nd.m_cid] == 0:
+            push(nd)
+
+    runs = []
+    current = None
+    while len(done) < len(Node.m_list):
+        nd = None
+        stack = ready.get(current, [])
+        while len(stack) > 0 and nd is None:
+            nd = stack.pop()
+            if nd.m_cid in done:
+                nd = None
+        if nd is None:
+            cid = heapq.heappop(heap)[2]
+            if cid in done:
+                continue
+            nd = Node.m_map[cid]
+        done.add(nd.m_cid)
+        key = keys.get(nd.m_cid)
+        if key is not None and key != current:
+            runs.append((names[key], []))
+        if key is not None:
+            runs[-1][1].append(nd)
+        current = key
+        for cnd in children.get(nd.m_cid, []):
+            waiting[cnd.m_cid] -= 1
+            if waiting[cnd.m_cid] == 0:
+                push(cnd)
+
+    groups = collections.OrderedDict()
+    for name, members in runs:
+        members.reverse()  # newest first
+        groups[members[0].m_cid] = (name, members)
+
+    target = {}
+    for name, members in groups.values():
+        for nd in members:
+            target[nd.m_cid] = members[0]
+
+    for name, members in groups.values():
+        head = members[0]
+        parents = []
+        for nd in members:
+            for pcid in nd.m_parents:
+                pnd = target.get(pcid, Node.m_map.get(pcid))
+                if pnd is not None and pnd is not head and pnd.m_cid not in parents:
+                    parents.append(pnd.m_cid)
+        head.m_parents = parents
+        head.m_branches = [ref for nd in members for ref in nd.m_branches]
+        head.m_tags = [ref for nd in members for ref in nd.m_tags]
+        for nd in members[1:]:
+            head.m_contains |= nd.m_contains
+        head.m_stub = any(nd.m_stub for nd in members)
+        diffs = set(nd.m_diff for nd in members)
+        head.m_diff = diffs.pop() if len(diffs) == 1 else None
+        head.m_rollup = len(members)
+        head.m_extra = [name, '{:,} commit{}'.format(len(members), '' if len(members) == 1 else 's')]
+        for ref in head.m_branches + head.m_tags:
+            Node.m_refs[ref] = head.m_cid
+
+    # Re-point the parents of the commits that were not rolled up.
+    for nd in Node.m_list:
+        if nd.m_cid not in target:
+            parents = []
+            for pcid in nd.m_parents:
+                pcid = target[pcid].m_cid if pcid in target else pcid
+                if pcid not in parents:
+                    parents.append(pcid)
+            nd.m_parents = parents
+
+    num = len(Node.m_list)
+    Node.m_list = [nd for nd in Node.m_list if target.get(nd.m_cid, nd) is nd]
+    Node.m_map = {}
+    for i, nd in enumerate(Node.m_list):
+        nd.m_idx = i
+        Node.m_map[nd.m_cid] = nd
+    infov(opts, 'rolled up {:,} commits into {:,} nodes'.format(len(target), len(groups)))
+    infov(opts, 'remaining {:,} out of {:,}'.format(len(Node.m_list), num))
+
+
+def parse(opts):
+    '''
+    Parse the node data.
+    '''
+    infov(opts, 'loading nodes (commit data)')
+    for rec in read_records(opts):
+        Node.load(rec)
+
+    if len(Node.m_list) == 0:
+        err('no records found')
+
+    load_diff(opts)
+    prune_by_date(opts)
+    choose_refs(opts, Node.m_refs.keys())
+    containment(opts)
+    prune_by_choice(opts)
+    prune_by_reach(opts)
+    prune_by_contains(opts)
+    prune_by_diff(opts)
+    rollup(opts)
 
     # Update the child list for each node by looking at the parents.
     # This helps us identify merge nodes.
@@ -682,17 +3123,215 @@ def parse(opts):
     Node.m_list_bydate.sort(key=lambda x: Node.m_map[x].m_dts)
 
 
-def gendot(opts):
+def parse_store(opts):
+    '''
+    Parse the node data into the on disk store (--store).
+    A store that was completely loaded by an earlier run is re-used
+    without reading the input as long as the input has not changed:
+    the same git command, -l and -D options and the same refs or -i
+    files. Otherwise it is re-loaded.
+    '''
+    if len(opts.ancestors_of) > 0 or len(opts.descendants_of) > 0 or len(opts.between) > 0:
+        err('--store cannot be used with --ancestors-of, --descendants-of or --between')
+    if len(opts.contains) > 0 or len(opts.contains_node) > 0 or len(opts.contains_filter) > 0:
+        err('--store cannot be used with --contains, --contains-node or --contains-filter')
+    if opts.diff is not None:
+        err('--store cannot be used with --diff')
+    if opts.rollup is not None:
+        err('--store cannot be used with --rollup')
+    if opts.stats:
+        err('--store cannot be used with --stats')
+    import sqlite3
+    infov(opts, 'opening store {}'.format(opts.store))
+    try:
+        store = GraphStore(opts.store)
+        identity = input_identity(opts)
+        if store.is_complete() and store.get_meta('identity') == identity:
+            infov(opts, 're-using the commit data in {}'.format(opts.store))
+        else:
+            if store.is_complete():
+                infov(opts, 'the input changed, re-loading {}'.format(opts.store))
+            infov(opts, 'loading nodes (commit data) into {}'.format(opts.store))
+            store.ingest(opts, read_records(opts), identity)
+
+        # Undo the pruning of the last run before counting.
+        store.prepare()
+        if store.num_commits() == 0:
+            err('no records found')
+
+        store.prune_by_date(opts)
+        choose_refs(opts, store.ref_names())
+        store.prune_by_choice(opts)
+
+        infov(opts, 'updating children')
+        num_edges = store.update_children()
+        infov(opts, 'found {:,} commit nodes'.format(store.num_commits()))
+        infov(opts, 'found {:,} commit edges'.format(num_edges))
+
+        if opts.squash:
+            infov(opts, 'squashing chains')
+            store.squash()
+    except sqlite3.Error as e:
+        err('store {} failed: {}'.format(opts.store, e))
+    return store
+
+
+def write_header(opts, ofp):
+    '''
+    Write the start of the graph and the top level dot options.
+    '''
+    ofp.write('digraph G {\n')
+    for v in opts.dot_option:
+        if len(opts.font_size) and 'fontsize=' in v:
+            v = re.sub(r'(fontsize=)[^,]+,', r'\1"' + opts.font_size + r'",' , v)
+        if len(opts.font_name) and 'fontsize=' in v:
+            v = re.sub(r'(fontsize=[^,]+),', r'\1, fontname="' + opts.font_name + r'",', v)
+        ofp.write('   {}'.format(v))
+        if v[-1] != ';':
+            ofp.write(';')
+        ofp.write('\n')
+
+
+def annotate(opts, ofp, idx, nd):
+    '''
+    Write the tag and branch nodes for a commit and put them in the
+    same rank.
+    '''
+    torank = [nd.m_cid]
+    if len(nd.m_tags) > 0:
+        if opts.crunch:
+            # Create the node name.
+            tid = 'tid-{:>08}'.format(idx)
+            label = '\\n'.join(nd.m_tags)
+            attrs = opts.tnode.format(label=label)
+            ofp.write('   "{}" {};\n'.format(tid, attrs))
+            torank += [tid]
+
+            # Write the connecting edge.
+            ofp.write('   "{}" -> "{}"'.format(tid, nd.m_cid))
+        else:
+            torank += nd.m_tags
+            for t in nd.m_tags:
+                # Tag node definitions.
+                attrs = opts.tnode.format(label=t)
+                ofp.write('   "{}+{}" {};\n'.format(nd.m_cid, t, attrs))
+
+            tl = nd.m_tags
+            ofp.write('   "{}+{}"'.format(nd.m_cid, tl[0]))
+            for t in tl[1:]:
+                ofp.write(' -> "{}+{}"'.format(nd.m_cid, t))
+            ofp.write(' -> "{}"'.format(nd.m_cid))
+
+        attrs = opts.tedge.format(label=nd.m_cid)
+        ofp.write(' {};\n'.format(attrs))
+
+    if len(nd.m_branches) > 0:
+        if opts.crunch:
+            # Create the node name.
+            bid = 'bid-{:>08}'.format(idx)
+            label = '\\n'.join(nd.m_branches)
+            attrs = opts.bnode.format(label=label)
+            ofp.write('   "{}" {};\n'.format(bid, attrs))
+            torank += [bid]
+
+            # Write the connecting edge.
+            ofp.write('   "{}" -> "{}"'.format(nd.m_cid, bid))
+        else:
+            torank += nd.m_branches
+            for b in nd.m_branches:
+                # Branch node definitions.
+                attrs = opts.bnode.format(label=b)
+                ofp.write('   "{}+{}" {};\n'.format(nd.m_cid, b, attrs))
+
+            ofp.write('   "{}"'.format(nd.m_cid))
+            for b in nd.m_branches[::-1]:
+                ofp.write(' -> "{}+{}"'.format(nd.m_cid, b))
+
+        attrs = opts.bedge.format(label=nd.m_cid)
+        ofp.write(' {};\n'.format(attrs))
+
+    # Make sure that they line up by putting them in the same rank.
+    ofp.write('   {{rank=same; "{}"'.format(torank[0]))
+    for cid in torank[1:]:
+        if opts.crunch:
+            ofp.write('; "{}"'.format(cid))
+        else:
+            ofp.write('; "{}+{}"'.format(nd.m_cid, cid))
+    ofp.write('};\n')
+
+
+def write_trailer(opts, ofp, summary):
+    '''
+    Write the graph label, the end of the graph and the summary data.
+    '''
+    # Output the graph label.
+    if opts.graph_label is not None:
+        infov(opts, 'generate graph label')
+        ofp.write('\n')
+        ofp.write('   // graph label\n')
+        ofp.write('   {}'.format(opts.graph_label))
+
+        if opts.graph_label[-1] != ';':
+            ofp.write(';')
+        ofp.write('\n')
+
+    ofp.write('}\n')
+
+    # Output the summary data.
+    for k in sorted(summary, key=str.lower):
+        v = summary[k]
+        ofp.write('// summary:{} {}\n'.format(k, v))
+
+
+def contains(nd):
+    '''
+    Get the tracked refs that contain a node for the {contains}
+    variable.
+    '''
+    return ', '.join(ref for i, ref in enumerate(Node.m_contains_refs) if nd.m_contains & (1 << i))
+
+
+def node_attrs(opts, nd, attrs):
+    '''
+    Get the node attributes. The --around stub and the --diff styles
+    override the first --contains-node spec that matches which
+    overrides the default.
+    '''
+    if nd.m_stub:
+        return opts.around_stub
+    if nd.m_diff == 'added':
+        return opts.diff_added
+    if nd.m_diff == 'removed':
+        return opts.diff_removed
+    if nd.m_diff == 'rewritten':
+        return opts.diff_rewritten
+    for spec, spec_attrs in opts.contains_node:
+        if match_contains(nd, spec):
+            return spec_attrs
+    return attrs
+
+
+def gendot(opts, store=None, ofp=None):
     '''
     Generate a test graph.
+    The nodes come from the Node lists or from the store (--store).
+    It is written to the DOT file unless another file object is
+    specified.
     '''
     # Write out the graph stuff.
     infov(opts, 'gendot')
+    if store is None:
+        nodes = lambda: Node.m_list
+        nodes_bydate = lambda: (Node.m_map[cid] for cid in Node.m_list_bydate)
+    else:
+        nodes = store.nodes
+        nodes_bydate = store.nodes_bydate
 
-    try:
-        ofp = open(opts.DOT_FILE[0], 'w')
-    except IOError as e:
-        err('file open failed: {}'.format(e))
+    if ofp is None:
+        try:
+            ofp = open(opts.DOT_FILE[0], 'w')
+        except IOError as e:
+            err('file open failed: {}'.format(e))
 
     # Keep track of the node information so
     # that it can be reported at the end.
@@ -702,38 +3341,36 @@ def gendot(opts):
                'total_graph_commit_nodes': 0,  # sum of commit, merge and squash nodes
                'total_commits': 0}   # total nodes with no squashing
 
-    ofp.write('digraph G {\n')
-    for v in opts.dot_option:
-        if len(opts.font_size) and 'fontsize=' in v:
-            v = re.sub(r'(fontsize=)[^,]+,', r'\1"' + opts.font_size + r'",' , v)
-        if len(opts.font_name) and 'fontsize=' in v:
-            v = re.sub(r'(fontsize=[^,]+),', r'\1, fontname="' + opts.font_name + r'",', v)
-        ofp.write('   {}'.format(v))
-        if v[-1] != ';':
-            ofp.write(';')
-        ofp.write('\n')
+    write_header(opts, ofp)
 
     ofp.write('\n')
     ofp.write('   // label cnode, mnode and snodes\n')
-    for nd in Node.m_list:
+    for nd in nodes():
         if opts.squash and nd.is_squashed():
             continue
-        if nd.is_merge_node():
+        if nd.m_rollup > 0:
             label = '\\n'.join(nd.m_extra)
-            attrs = opts.mnode.format(label=label)
+            attrs = node_attrs(opts, nd, opts.rnode).format(label=label, contains=contains(nd))
+            ofp.write('   "{}" {};\n'.format(nd.m_cid, attrs))
+            summary['num_graph_rollup_nodes'] = summary.get('num_graph_rollup_nodes', 0) + 1
+            summary['total_graph_commit_nodes'] += 1
+            summary['total_commits'] += nd.m_rollup
+        elif nd.is_merge_node():
+            label = '\\n'.join(nd.m_extra)
+            attrs = node_attrs(opts, nd, opts.mnode).format(label=label, contains=contains(nd))
             ofp.write('   "{}" {};\n'.format(nd.m_cid, attrs))
             summary['num_graph_merge_nodes'] += 1
             summary['total_graph_commit_nodes'] += 1
             summary['total_commits'] += 1
         elif nd.is_squashed_head() or nd.is_squashed_tail():
             label = '\\n'.join(nd.m_extra)
-            attrs = opts.snode.format(label=label)
+            attrs = node_attrs(opts, nd, opts.snode).format(label=label, contains=contains(nd))
             ofp.write('   "{}" {};\n'.format(nd.m_cid, attrs))
             summary['num_graph_squash_nodes'] += 1
             summary['total_graph_commit_nodes'] += 1
         else:
             label = '\\n'.join(nd.m_extra)
-            attrs = opts.cnode.format(label=label)
+            attrs = node_attrs(opts, nd, opts.cnode).format(label=label, contains=contains(nd))
             ofp.write('   "{}" {};\n'.format(nd.m_cid, attrs))
             summary['num_graph_commit_nodes'] += 1
             summary['total_graph_commit_nodes'] += 1
@@ -742,7 +3379,7 @@ def gendot(opts):
     infov(opts, 'defining edges')
     ofp.write('\n')
     ofp.write('   // edges\n')
-    for nd in Node.m_list:
+    for nd in nodes():
         if nd.is_squashed():
             continue
         elif nd.is_squashed_tail():
@@ -757,7 +3394,6 @@ def gendot(opts):
 
         # Create the edges to the parents.
         for pid in nd.m_parents:
-            pnd = Node.m_map[pid]
             attrs = ''
             if nd.is_merge_node():
                 if len(opts.mnode_pedge) > 0:
@@ -775,89 +3411,29 @@ def gendot(opts):
     ofp.write('\n')
     ofp.write('   // annotate branches and tags\n')
     first = True
-    for idx, nd in enumerate(Node.m_list):
+    for idx, nd in enumerate(nodes()):
         # technically this is redundant because squashed nodes, by
         # definition, do not have branches or tag refs.
         if nd.is_squashed():
             continue
         if len(nd.m_branches) > 0 or len(nd.m_tags) > 0:
-            torank = [nd.m_cid]
             if first:
                 first = False
             else:
                 ofp.write('\n')
-
-            if len(nd.m_tags) > 0:
-                if opts.crunch:
-                    # Create the node name.
-                    tid = 'tid-{:>08}'.format(idx)
-                    label = '\\n'.join(nd.m_tags)
-                    attrs = opts.tnode.format(label=label)
-                    ofp.write('   "{}" {};\n'.format(tid, attrs))
-                    torank += [tid]
-
-                    # Write the connecting edge.
-                    ofp.write('   "{}" -> "{}"'.format(tid, nd.m_cid))
-                else:
-                    torank += nd.m_tags
-                    for t in nd.m_tags:
-                        # Tag node definitions.
-                        attrs = opts.tnode.format(label=t)
-                        ofp.write('   "{}+{}" {};\n'.format(nd.m_cid, t, attrs))
-
-                    tl = nd.m_tags
-                    ofp.write('   "{}+{}"'.format(nd.m_cid, tl[0]))
-                    for t in tl[1:]:
-                        ofp.write(' -> "{}+{}"'.format(nd.m_cid, t))
-                    ofp.write(' -> "{}"'.format(nd.m_cid))
-
-                attrs = opts.tedge.format(label=nd.m_cid)
-                ofp.write(' {};\n'.format(attrs))
-
-            if len(nd.m_branches) > 0:
-                if opts.crunch:
-                    # Create the node name.
-                    bid = 'bid-{:>08}'.format(idx)
-                    label = '\\n'.join(nd.m_branches)
-                    attrs = opts.bnode.format(label=label)
-                    ofp.write('   "{}" {};\n'.format(bid, attrs))
-                    torank += [bid]
-
-                    # Write the connecting edge.
-                    ofp.write('   "{}" -> "{}"'.format(nd.m_cid, bid))
-                else:
-                    torank += nd.m_branches
-                    for b in nd.m_branches:
-                        # Branch node definitions.
-                        attrs = opts.bnode.format(label=b)
-                        ofp.write('   "{}+{}" {};\n'.format(nd.m_cid, b, attrs))
-
-                    ofp.write('   "{}"'.format(nd.m_cid))
-                    for b in nd.m_branches[::-1]:
-                        ofp.write(' -> "{}+{}"'.format(nd.m_cid, b))
-
-                attrs = opts.bedge.format(label=nd.m_cid)
-                ofp.write(' {};\n'.format(attrs))
-
-            # Make sure that they line up by putting them in the same rank.
-            ofp.write('   {{rank=same; "{}"'.format(torank[0]))
-            for cid in torank[1:]:
-                if opts.crunch:
-                    ofp.write('; "{}"'.format(cid))
-                else:
-                    ofp.write('; "{}+{}"'.format(nd.m_cid, cid))
-            ofp.write('};\n')
+            annotate(opts, ofp, idx, nd)
 
     # Align nodes by commit date.
     if opts.align_by_date != 'none':
         infov(opts, 'align by {}'.format(opts.align_by_date))
         ofp.write('\n')
         ofp.write('   // rank by date using invisible constraints between groups\n')
-        lnd = Node.m_map[Node.m_list_bydate[0]]
+        lnd = None
 
         attrs = ['year', 'month', 'day', 'hour', 'minute', 'second']
-        for cid in Node.m_list_bydate:
-            nd = Node.m_map[cid]
+        for nd in nodes_bydate():
+            if lnd is None:
+                lnd = nd
             if nd.is_squashed():
                 continue
 
@@ -878,26 +3454,327 @@ def gendot(opts):
             if lnd.m_dts < nd.m_dts:
                 lnd = nd
 
-    # Output the graph label.
-    if opts.graph_label is not None:
-        infov(opts, 'generate graph label')
-        ofp.write('\n')
-        ofp.write('   // graph label\n')
-        ofp.write('   {}'.format(opts.graph_label))
+    write_trailer(opts, ofp, summary)
+    ofp.close()
 
-        if opts.graph_label[-1] != ';':
-            ofp.write(';')
-        ofp.write('\n')
 
-    ofp.write('}\n')
+def genstream(opts):
+    '''
+    Generate the dot file while the git output is read (--stream).
 
-    # Output the summary data.
-    for k in sorted(summary, key=str.lower):
-        v = summary[k]
-        ofp.write('// summary:{} {}\n'.format(k, v))
+    This only works when no whole graph pass is needed. It relies on
+    the --topo-order guarantee that all of the children of a commit
+    appear before it so that the number of children (and, therefore,
+    whether it is a merge node) is known when the commit arrives.
+
+    The parent edges are held until the parent arrives. Edges whose
+    parents never arrive are dropped which is the same as the
+    pruning done by prune_by_date(). That means that only the commit
+    frontier is held in memory.
+    '''
+    if opts.squash:
+        err('--stream cannot be used with --squash')
+    if len(opts.choose_branch) > 0 or len(opts.choose_tag) > 0 or len(opts.choose_ref) > 0 or len(opts.exclude_ref) > 0:
+        err('--stream cannot be used with --choose-branch, --choose-tag, --choose-ref or --exclude-ref')
+    if opts.align_by_date != 'none':
+        err('--stream cannot be used with --align-by-date')
+    if opts.jsonl or opts.graphml:
+        err('--stream cannot be used with --jsonl or --graphml')
+    if opts.diff is not None:
+        err('--stream cannot be used with --diff')
+    if opts.rollup is not None:
+        err('--stream cannot be used with --rollup')
+    if opts.stats:
+        err('--stream cannot be used with --stats')
+    if len(opts.around) > 0:
+        err('--stream cannot be used with --around')
+    if len(opts.ancestors_of) > 0 or len(opts.descendants_of) > 0 or len(opts.between) > 0:
+        err('--stream cannot be used with --ancestors-of, --descendants-of or --between')
+    if len(opts.contains) > 0 or len(opts.contains_node) > 0 or len(opts.contains_filter) > 0:
+        err('--stream cannot be used with --contains, --contains-node or --contains-filter')
+    if opts.store:
+        err('--stream cannot be used with --store')
+    if opts.shards > 1:
+        err('--stream cannot be used with --shards')
+    if opts.commit_graph:
+        err('--stream cannot be used with --commit-graph')
+    if len(opts.input) > 1:
+        err('--stream cannot be used with more than one -i file')
+    if len(opts.input) == 0 and '--topo-order' not in opts.gitcmd + ' ' + opts.range:
+        warn('--stream needs --topo-order git output, merge nodes may not be identified')
+
+    infov(opts, 'genstream')
+    try:
+        ofp = open(opts.DOT_FILE[0], 'w')
+    except IOError as e:
+        err('file open failed: {}'.format(e))
+
+    summary = {'num_graph_commit_nodes': 0,
+               'num_graph_merge_nodes': 0,
+               'num_graph_squash_nodes': 0,
+               'total_graph_commit_nodes': 0,
+               'total_commits': 0}
+
+    write_header(opts, ofp)
+    ofp.write('\n')
+    ofp.write('   // cnodes and mnodes with their edges, branches and tags\n')
+
+    num_children = {}  # key=cid, val=number of children seen so far
+    pending = {}  # key=parent cid, val=edges waiting for the parent
+    for idx, rec in enumerate(records(opts, read(opts))):
+        label = '\\n'.join(rec.m_extra)
+        merge = num_children.pop(rec.m_cid, 0) > 1
+        if merge:
+            attrs = opts.mnode.format(label=label)
+            summary['num_graph_merge_nodes'] += 1
+        else:
+            attrs = opts.cnode.format(label=label)
+            summary['num_graph_commit_nodes'] += 1
+        summary['total_graph_commit_nodes'] += 1
+        summary['total_commits'] += 1
+        ofp.write('   "{}" {};\n'.format(rec.m_cid, attrs))
+
+        # The edges from the children.
+        for edge in pending.pop(rec.m_cid, []):
+            ofp.write(edge)
+
+        # The edges to the parents.
+        for pid in rec.m_parents:
+            num_children[pid] = num_children.get(pid, 0) + 1
+            attrs = ''
+            pedge = opts.mnode_pedge if merge else opts.cnode_pedge
+            if len(pedge) > 0:
+                attrs = pedge.format(label='{} to {}'.format(rec.m_cid, pid))
+            if pid not in pending:
+                pending[pid] = []
+            pending[pid].append('   "{}" -> "{}" {};\n'.format(pid, rec.m_cid, attrs))
+
+        if len(rec.m_branches) > 0 or len(rec.m_tags) > 0:
+            annotate(opts, ofp, idx, rec)
+
+    if summary['total_commits'] == 0:
+        err('no records found')
+
+    infov(opts, 'pruned {:,} parent node references'.format(sum(len(x) for x in pending.values())))
+    write_trailer(opts, ofp, summary)
     ofp.close()
 
 
+def node_class(nd):
+    '''
+    Classify a node the way that gendot() does: rnode, mnode, snode or
+    cnode.
+    '''
+    if nd.m_rollup > 0:
+        return 'rnode'
+    if nd.is_merge_node():
+        return 'mnode'
+    if nd.is_squashed_head() or nd.is_squashed_tail():
+        return 'snode'
+    return 'cnode'
+
+
+def export_nodes(nodes):
+    '''
+    Generate the graph that gendot() writes as (node, edges) pairs
+    for the exporters (--jsonl, --graphml).
+    The hidden nodes in squashed chains are skipped. Each edge is a
+    (source, target, class, size) tuple.
+    '''
+    for nd in nodes():
+        if nd.is_squashed():
+            continue
+        edges = []
+        if not nd.is_squashed_tail():
+            if nd.is_squashed_head():
+                edges.append((nd.m_cid, nd.m_chain_tail.m_cid, 'sedge', nd.m_chain_size))
+            for pid in nd.m_parents:
+                edges.append((pid, nd.m_cid, 'pedge', 1))
+        yield nd, edges
+
+
+def export_label(nd):
+    '''
+    Get the label fields without the DOT escapes.
+    '''
+    return [fld.replace('\\"', '"') for fld in nd.m_extra]
+
+
+def genjsonl(opts, nodes):
+    '''
+    Write the graph as JSON Lines (--jsonl).
+    There is one object per line. The node objects are written first
+    followed by the edge objects. Nothing is accumulated so the
+    memory use does not depend on the size of the graph.
+    '''
+    infov(opts, 'writing {}'.format(opts.jsonl))
+    try:
+        with open_output(opts.jsonl) as ofp:
+            for nd, _ in export_nodes(nodes):
+                obj = collections.OrderedDict()
+                obj['type'] = 'node'
+                obj['id'] = nd.m_cid
+                obj['class'] = node_class(nd)
+                obj['chain_size'] = nd.m_chain_size if nd.is_squashed_head() else None
+                obj['date'] = nd.m_dts.isoformat()
+                obj['branches'] = nd.m_branches
+                obj['tags'] = nd.m_tags
+                obj['vars'] = nd.m_vars
+                obj['label'] = export_label(nd)
+                ofp.write(json.dumps(obj) + '\n')
+            for _, edges in export_nodes(nodes):
+                for source, target, cls, size in edges:
+                    obj = collections.OrderedDict()
+                    obj['type'] = 'edge'
+                    obj['source'] = source
+                    obj['target'] = target
+                    obj['class'] = cls
+                    obj['size'] = size
+                    ofp.write(json.dumps(obj) + '\n')
+    except IOError as e:
+        err('unable to write to {}: {}'.format(opts.jsonl, e))
+
+
+def gengraphml(opts, nodes):
+    '''
+    Write the graph as GraphML (--graphml).
+    The document is written as the nodes are generated so the memory
+    use does not depend on the size of the graph. The branches, tags
+    and label fields are written as new line separated lists and the
+    variables as a JSON object.
+    '''
+    keys = [('class', 'node', 'string'),
+            ('chain_size', 'node', 'int'),
+            ('date', 'node', 'string'),
+            ('branches', 'node', 'string'),
+            ('tags', 'node', 'string'),
+            ('vars', 'node', 'string'),
+            ('label', 'node', 'string'),
+            ('eclass', 'edge', 'string'),
+            ('size', 'edge', 'int')]
+    import xml.sax.saxutils
+
+    def data(key, val):
+        return '      <data key="{}">{}</data>\n'.format(key, xml.sax.saxutils.escape('{}'.format(val)))
+
+    infov(opts, 'writing {}'.format(opts.graphml))
+    try:
+        with open_output(opts.graphml) as ofp:
+            ofp.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            ofp.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+            for key, domain, typ in keys:
+                name = 'class' if key == 'eclass' else key
+                ofp.write('  <key id="{}" for="{}" attr.name="{}" attr.type="{}"/>\n'.format(key, domain, name, typ))
+            ofp.write('  <graph id="G" edgedefault="directed">\n')
+            for nd, _ in export_nodes(nodes):
+                ofp.write('    <node id={}>\n'.format(xml.sax.saxutils.quoteattr(nd.m_cid)))
+                ofp.write(data('class', node_class(nd)))
+                if nd.is_squashed_head():
+                    ofp.write(data('chain_size', nd.m_chain_size))
+                ofp.write(data('date', nd.m_dts.isoformat()))
+                if len(nd.m_branches) > 0:
+                    ofp.write(data('branches', '\n'.join(nd.m_branches)))
+                if len(nd.m_tags) > 0:
+                    ofp.write(data('tags', '\n'.join(nd.m_tags)))
+                if len(nd.m_vars) > 0:
+                    ofp.write(data('vars', json.dumps(nd.m_vars)))
+                if len(nd.m_extra) > 0:
+                    ofp.write(data('label', '\n'.join(export_label(nd))))
+                ofp.write('    </node>\n')
+            for _, edges in export_nodes(nodes):
+                for source, target, cls, size in edges:
+                    ofp.write('    <edge source={} target={}>\n'.format(xml.sax.saxutils.quoteattr(source),
+                                                                        xml.sax.saxutils.quoteattr(target)))
+                    ofp.write(data('eclass', cls))
+                    ofp.write(data('size', size))
+                    ofp.write('    </edge>\n')
+            ofp.write('  </graph>\n')
+            ofp.write('</graphml>\n')
+    except IOError as e:
+        err('unable to write to {}: {}'.format(opts.graphml, e))
+
+
+def export(opts, store=None):
+    '''
+    Export the graph that gendot() wrote (--jsonl, --graphml).
+    '''
+    if store is None:
+        nodes = lambda: Node.m_list
+    else:
+        nodes = store.nodes
+    if opts.jsonl:
+        genjsonl(opts, nodes)
+    if opts.graphml:
+        gengraphml(opts, nodes)
+
+
+def html_lazy(opts, html, svg):
+    '''
+    Generate an HTML file that fetches the SVG asynchronously
+    (--html-lazy).
+    The page is shown right away with a progress indicator and the
+    SVG is attached to the page when it arrives.
+    '''
+    with open(html, 'w') as ofp:
+        ofp.write('''<!DOCTYPE html>
+<html>
+  <head>
+    <meta charset="UTF-8">
+    <title>{3}</title>
+    {2}
+  </head>
+  <body>
+    <h3>{3}</h3>
+    <div id="digraph" style="border-width:3px; border-style:solid; border-color:lightgrey; width:100%; min-height:{1};">
+      <p id="progress">Loading {0} ...</p>
+    </div>
+    <script>
+      var spz = null;
+      var xhr = new XMLHttpRequest();
+      xhr.open("GET", "{0}");
+      xhr.onprogress = function(e) {{
+        var mb = (e.loaded / 1048576).toFixed(1) + " MB";
+        if (e.lengthComputable) {{
+          mb += " (" + Math.round(100 * e.loaded / e.total) + "%)";
+        }}
+        document.getElementById("progress").textContent = "Loading {0} ... " + mb;
+      }};
+      xhr.onerror = function() {{
+        document.getElementById("progress").textContent = "Unable to load {0}, it must be served over HTTP.";
+      }};
+      xhr.onload = function() {{
+        if (xhr.status != 200 && xhr.status != 0) {{
+          xhr.onerror();
+          return;
+        }}
+        var div = document.getElementById("digraph");
+        div.innerHTML = xhr.responseText;
+        var svg = div.querySelector("svg");
+        svg.style.width = "100%";
+        svg.style.minHeight = "{1}";
+        spz = svgPanZoom(svg, {{
+          zoomEnabled: true,
+          controlIconsEnabled: true,
+          fit: true,
+          center: true,
+          maxZoom: 1000,
+          zoomScaleSensitivity: 0.5
+        }});
+      }};
+      xhr.send();
+      window.addEventListener("resize", function() {{
+        if (spz != null) {{
+          spz.resize();
+          spz.fit();
+          spz.center();
+        }}
+      }});
+    </script>
+  </body>
+</html>
+'''.format(svg, opts.html_min_height, '    \n'.join([x for x in opts.html_head]), opts.html_title))
+
+
 def html(opts):
     '''
     Generate an HTML file that allows pan and zoom.
@@ -910,6 +3787,9 @@ def html(opts):
             html = opts.html
             svg = opts.DOT_FILE[0] + '.svg'
             js = 'svg-pan-zoom.min.js'
+            if opts.html_lazy:
+                html_lazy(opts, html, svg)
+                return
             with open(html, 'w') as ofp:
                 ofp.write('''<!DOCTYPE html>
 <html>
@@ -951,19 +3831,797 @@ def html(opts):
             err('HTML write failed: {}'.format(e))
 
 
-def gengraph(opts, fmt):
+def read_plain(opts, policy):
+    '''
+    Lay out the graph with dot, using the render policy, and read the
+    positions from the plain output format (dot -Tplain).
+    Returns the graph as a dictionary that is compact when it is
+    serialized as JSON:
+
+       w, h    - the graph size in points
+       colors  - the colors, the nodes and edges refer to them by index
+       nodes   - [x, y, width, height, label, fill color, shape] in points
+       edges   - [color, x1, y1, x2, y2, ...] the B-spline control points
+
+    The render strategy that was used and the elapsed time are also
+    returned.
+    '''
+    import tempfile
+    fd, plain = tempfile.mkstemp(suffix='.plain')
+    os.close(fd)
+    colors = []
+    cidx = {}
+
+    def color(name):
+        if name not in cidx:
+            cidx[name] = len(colors)
+            colors.append(name)
+        return cidx[name]
+
+    def pt(val):
+        return round(float(val) * 72.0, 1)
+
+    graph = {'w': 0, 'h': 0, 'colors': colors, 'nodes': [], 'edges': []}
+    try:
+        render = rundot(opts, 'plain', ['-Tplain', '-o', '"{}"'.format(plain), '"{}"'.format(opts.DOT_FILE[0])], policy)
+        with open(plain, 'r') as ifp:
+            lines = ifp.readlines()
+    finally:
+        os.remove(plain)
+    for line in lines:
+        flds = shlex.split(line)
+        if len(flds) == 0:
+            continue
+        if flds[0] == 'graph':
+            graph['w'] = pt(flds[2])
+            graph['h'] = pt(flds[3])
+        elif flds[0] == 'node':
+            # node name x y width height label style shape color fillcolor
+            fill = flds[10] if flds[10] != 'none' else flds[9]
+            graph['nodes'].append([pt(flds[2]), graph['h'] - pt(flds[3]), pt(flds[4]), pt(flds[5]),
+                                   flds[6], color(fill), 1 if flds[8] == 'box' else 0])
+        elif flds[0] == 'edge':
+            # edge tail head n x1 y1 .. xn yn [label xl yl] style color
+            num = int(flds[3])
+            edge = [color(flds[-1])]
+            for i in range(num):
+                edge.append(pt(flds[4 + 2 * i]))
+                edge.append(graph['h'] - pt(flds[5 + 2 * i]))
+            graph['edges'].append(edge)
+    infov(opts, 'read {:,} node and {:,} edge positions'.format(len(graph['nodes']), len(graph['edges'])))
+    return graph, render
+
+
+def html_canvas(opts, policy):
+    '''
+    Generate an HTML file that draws the laid out graph on a canvas
+    (--html-canvas).
+
+    Only the node and edge positions are sent to the browser, as JSON,
+    and the renderer only draws what is in the view. A grid spatial
+    index is used to find the visible nodes and edges so panning and
+    zooming stay fast for very large graphs.
+
+    Returns the render strategy that was used and the elapsed time.
+    '''
+    graph, render = read_plain(opts, policy)
+    infov(opts, 'generating HTML canvas to {}'.format(opts.html_canvas))
+    # The labels are user data, "</script>" in one of them must not
+    # end the script element.
+    data = json.dumps(graph, separators=(',', ':')).replace('</', '<\\/')
+    try:
+        with open(opts.html_canvas, 'w') as ofp:
+            ofp.write('''<!DOCTYPE html>
+<html>
+  <head>
+    <meta charset="UTF-8">
+    <title>{2}</title>
+  </head>
+  <body style="margin:0">
+    <h3 style="margin:8px">{2}</h3>
+    <canvas id="digraph" style="display:block; width:100%; height:{1}; border-top:3px solid lightgrey; cursor:grab;"></canvas>
+    <script>
+      var G = {0};
+      (function() {{
+        var canvas = document.getElementById("digraph");
+        var ctx = canvas.getContext("2d");
+        var CELL = 256, LONG = 64;
+        var cols = Math.max(1, Math.ceil(G.w / CELL)), rows = Math.max(1, Math.ceil(G.h / CELL));
+        var grid = new Array(cols * rows), longEdges = [];
+        var nodeSeen = new Int32Array(G.nodes.length), edgeSeen = new Int32Array(G.edges.length), frame = 0;
+        function add(kind, id, x0, y0, x1, y1) {{
+          var c0 = Math.max(0, Math.floor(x0 / CELL)), c1 = Math.min(cols - 1, Math.floor(x1 / CELL));
+          var r0 = Math.max(0, Math.floor(y0 / CELL)), r1 = Math.min(rows - 1, Math.floor(y1 / CELL));
+          if (kind == 1 && (c1 - c0 + 1) * (r1 - r0 + 1) > LONG) {{ longEdges.push(id); return; }}
+          for (var r = r0; r <= r1; r++) for (var c = c0; c <= c1; c++) {{
+            var k = r * cols + c;
+            if (!grid[k]) grid[k] = [[], []];
+            grid[k][kind].push(id);
+          }}
+        }}
+        G.nodes.forEach(function(n, i) {{ add(0, i, n[0] - n[2] / 2, n[1] - n[3] / 2, n[0] + n[2] / 2, n[1] + n[3] / 2); }});
+        G.edges.forEach(function(e, i) {{
+          var x0 = Infinity, y0 = Infinity, x1 = -Infinity, y1 = -Infinity;
+          for (var j = 1; j < e.length; j += 2) {{
+            x0 = Math.min(x0, e[j]); x1 = Math.max(x1, e[j]); y0 = Math.min(y0, e[j + 1]); y1 = Math.max(y1, e[j + 1]);
+          }}
+          add(1, i, x0, y0, x1, y1);
+        }});
+
+        var scale = 1, ox = 0, oy = 0, pending = false;
+        function fit() {{
+          scale = Math.min(canvas.width / Math.max(G.w, 1), canvas.height / Math.max(G.h, 1));
+          ox = (canvas.width - G.w * scale) / 2;
+          oy = (canvas.height - G.h * scale) / 2;
+        }}
+        function drawEdge(e) {{
+          ctx.strokeStyle = G.colors[e[0]];
+          ctx.beginPath();
+          ctx.moveTo(e[1], e[2]);
+          for (var j = 3; j + 5 < e.length; j += 6) ctx.bezierCurveTo(e[j], e[j + 1], e[j + 2], e[j + 3], e[j + 4], e[j + 5]);
+          ctx.stroke();
+        }}
+        function drawNode(n, labels) {{
+          ctx.fillStyle = G.colors[n[5]];
+          ctx.beginPath();
+          if (n[6]) ctx.rect(n[0] - n[2] / 2, n[1] - n[3] / 2, n[2], n[3]);
+          else ctx.ellipse(n[0], n[1], n[2] / 2, n[3] / 2, 0, 0, 2 * Math.PI);
+          ctx.fill();
+          if (labels) {{
+            ctx.fillStyle = "black";
+            var lines = n[4].split("\\\\n");
+            for (var j = 0; j < lines.length; j++) ctx.fillText(lines[j], n[0], n[1] + (j - (lines.length - 1) / 2) * 12);
+          }}
+        }}
+        function draw() {{
+          pending = false;
+          frame++;
+          ctx.setTransform(1, 0, 0, 1, 0, 0);
+          ctx.fillStyle = "white";
+          ctx.fillRect(0, 0, canvas.width, canvas.height);
+          ctx.setTransform(scale, 0, 0, scale, ox, oy);
+          ctx.lineWidth = 1 / Math.max(scale, 0.25);
+          ctx.font = "10px sans-serif";
+          ctx.textAlign = "center";
+          ctx.textBaseline = "middle";
+          var x0 = -ox / scale, y0 = -oy / scale, x1 = x0 + canvas.width / scale, y1 = y0 + canvas.height / scale;
+          var c0 = Math.max(0, Math.floor(x0 / CELL)), c1 = Math.min(cols - 1, Math.floor(x1 / CELL));
+          var r0 = Math.max(0, Math.floor(y0 / CELL)), r1 = Math.min(rows - 1, Math.floor(y1 / CELL));
+          var nodes = [], i, j;
+          for (i = 0; i < longEdges.length; i++) drawEdge(G.edges[longEdges[i]]);
+          for (var r = r0; r <= r1; r++) for (var c = c0; c <= c1; c++) {{
+            var cell = grid[r * cols + c];
+            if (!cell) continue;
+            for (i = 0; i < cell[1].length; i++) {{
+              j = cell[1][i];
+              if (edgeSeen[j] != frame) {{ edgeSeen[j] = frame; drawEdge(G.edges[j]); }}
+            }}
+            for (i = 0; i < cell[0].length; i++) {{
+              j = cell[0][i];
+              if (nodeSeen[j] != frame) {{ nodeSeen[j] = frame; nodes.push(j); }}
+            }}
+          }}
+          var labels = scale > 0.5;
+          for (i = 0; i < nodes.length; i++) drawNode(G.nodes[nodes[i]], labels);
+        }}
+        function redraw() {{
+          if (!pending) {{ pending = true; window.requestAnimationFrame(draw); }}
+        }}
+        function resize() {{
+          canvas.width = canvas.clientWidth;
+          canvas.height = canvas.clientHeight;
+          redraw();
+        }}
+        var drag = null;
+        canvas.addEventListener("mousedown", function(e) {{ drag = [e.clientX, e.clientY]; canvas.style.cursor = "grabbing"; }});
+        window.addEventListener("mouseup", function() {{ drag = null; canvas.style.cursor = "grab"; }});
+        window.addEventListener("mousemove", function(e) {{
+          if (drag == null) return;
+          ox += e.clientX - drag[0];
+          oy += e.clientY - drag[1];
+          drag = [e.clientX, e.clientY];
+          redraw();
+        }});
+        canvas.addEventListener("wheel", function(e) {{
+          e.preventDefault();
+          var rect = canvas.getBoundingClientRect();
+          var mx = e.clientX - rect.left, my = e.clientY - rect.top;
+          var f = Math.exp(-e.deltaY * 0.002);
+          ox = mx - (mx - ox) * f;
+          oy = my - (my - oy) * f;
+          scale *= f;
+          redraw();
+        }}, {{passive: false}});
+        canvas.addEventListener("dblclick", function() {{ fit(); redraw(); }});
+        window.addEventListener("resize", resize);
+        canvas.width = canvas.clientWidth;
+        canvas.height = canvas.clientHeight;
+        fit();
+        redraw();
+      }})();
+    </script>
+  </body>
+</html>
+'''.format(data, opts.html_min_height, opts.html_title))
+    except IOError as e:
+        err('HTML write failed: {}'.format(e))
+    return render
+
+
+# The render strategies (--render-policy) from the best layout to the
+# cheapest, these are the extra dot arguments. A render that times out
+# (--render-timeout) is retried with the next one.
+RENDER_STRATEGIES = collections.OrderedDict([
+    ('dot', []),
+    ('tuned', ['-Gnslimit=4', '-Gnslimit1=4', '-Gmclimit=0.5', '-Gsearchsize=20']),
+    ('fast', ['-Gnslimit=1', '-Gnslimit1=1', '-Gmclimit=0.1', '-Gsearchsize=10',
+              '-Gremincross=false', '-Gsplines=false']),
+    ('sfdp', ['-Ksfdp', '-Gsplines=false']),
+])
+
+
+def render_size(path):
+    '''
+    Count the node and edge statements in a DOT file.
+    '''
+    sizer = DotSizer()
+    with open(path, 'r') as ifp:
+        for line in ifp:
+            sizer.write(line)
+    return sizer.m_nodes, sizer.m_edges
+
+
+class DotSizer:
+    r'''
+    A file like object that counts the bytes and the node, edge and
+    invisible edge statements written to it instead of storing them.
+    It is used to measure the DOT file without writing it (--stats).
+    '''
+
+    def __init__(self):
+        self.m_bytes = 0
+        self.m_nodes = 0
+        self.m_edges = 0
+        self.m_invis = 0
+        self.m_line = ''
+
+    def write(self, text):
+        self.m_bytes += len(text.encode('utf-8'))
+        lines = (self.m_line + text).split('\n')
+        self.m_line = lines.pop()
+        for line in lines:
+            m = DOT_EDGE_RE.match(line)
+            if m:
+                num = len(dot_edges(m))
+                self.m_edges += num
+                if 'style=invis' in line:
+                    self.m_invis += num
+            elif DOT_NODE_RE.match(line):
+                self.m_nodes += 1
+
+    def close(self):
+        if self.m_line != '':
+            self.write('\n')
+
+
+def render_policy(opts, nodes, edges):
+    '''
+    Choose the render strategies to try, in order, for a graph
+    (--render-policy).
+    The auto policy skips the strategies that are too expensive for
+    the number of nodes and edges (--render-sizes).
+    '''
+    names = list(RENDER_STRATEGIES)
+    if opts.render_policy == 'auto':
+        start = len([x for x in opts.render_sizes if nodes + edges > x])
+    else:
+        start = names.index(opts.render_policy)
+    return names[start:]
+
+
+def rundot(opts, what, args, policy):
+    '''
+    Run dot with the render strategies in the policy until one of them
+    finishes within the time limit (--render-timeout).
+    Returns the name of the strategy that was used and the elapsed
+    time in seconds.
+    '''
+    timeout = opts.render_timeout if opts.render_timeout > 0 else None
+    for i, name in enumerate(policy):
+        cmd = ' '.join(['dot'] + RENDER_STRATEGIES[name] + args)
+        if opts.verbose:
+            cmd += ' -v'
+        infov(opts, 'running command: {}'.format(cmd))
+        start = time.time()
+        st, _, expired = runcmd_timeout(cmd, timeout, show_output=opts.verbose > 1)
+        elapsed = time.time() - start
+        if not expired:
+            if st:
+                err('command failed with status {}: {}'.format(st, cmd))
+            infov(opts, '{} rendered by the {} strategy in {:.1f} seconds'.format(what, name, elapsed))
+            return name, elapsed
+        if i + 1 < len(policy):
+            warn('{} render timed out after {} seconds, trying the {} strategy'.format(what, timeout, policy[i + 1]))
+    err('{} render timed out for all strategies: {}'.format(what, ', '.join(policy)))
+
+
+def write_render_summary(opts, nodes, edges, rendered):
+    '''
+    Append the render strategies and times to the summary data at the
+    end of the DOT file and to the render log (--render-log).
+    '''
+    if len(rendered) == 0:
+        return
+    summary = {'render_nodes': nodes, 'render_edges': edges}
+    for key, (name, elapsed) in rendered.items():
+        summary['render_{}_strategy'.format(key)] = name
+        summary['render_{}_seconds'.format(key)] = '{:.3f}'.format(elapsed)
+    with open(opts.DOT_FILE[0], 'a') as ofp:
+        for k in sorted(summary, key=str.lower):
+            ofp.write('// summary:{} {}\n'.format(k, summary[k]))
+
+    if opts.render_log is not None:
+        try:
+            with open(opts.render_log, 'a') as ofp:
+                for key in sorted(rendered):
+                    name, elapsed = rendered[key]
+                    obj = {'output': key, 'strategy': name, 'seconds': round(elapsed, 3),
+                           'nodes': nodes, 'edges': edges}
+                    ofp.write(json.dumps(obj, sort_keys=True) + '\n')
+        except IOError as e:
+            warn('cannot write the render log: {}'.format(e))
+
+
+def render_estimate(opts, nodes, edges, strategy):
+    '''
+    Estimate the render time for a graph from the earlier renders in
+    the render log (--render-log) that used the same strategy.
+    The times are fitted to seconds = a * size^b, where size is the
+    number of nodes plus edges, by least squares on the logarithms.
+    Returns the estimate (None if there is no data) and the number of
+    renders that it is based on.
+    '''
+    if opts.render_log is None or not os.path.exists(opts.render_log):
+        return None, 0
+    xs = []
+    ys = []
+    with open(opts.render_log, 'r') as ifp:
+        for line in ifp:
+            try:
+                obj = json.loads(line)
+                size = obj['nodes'] + obj['edges']
+                secs = obj['seconds']
+            except (ValueError, KeyError, TypeError):
+                continue
+            if obj.get('strategy') == strategy and size > 0 and secs > 0:
+                xs.append(math.log(size))
+                ys.append(math.log(secs))
+    if len(xs) == 0 or nodes + edges == 0:
+        return None, len(xs)
+
+    mx = sum(xs) / len(xs)
+    my = sum(ys) / len(ys)
+    var = sum((x - mx) ** 2 for x in xs)
+    if var > 0:
+        b = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var
+    else:
+        b = 1.0  # one graph size, assume linear
+    a = my - b * mx
+    return math.exp(a + b * math.log(nodes + edges)), len(xs)
+
+
+# The node, edge and rank statements in the generated DOT files, they
+# are written one per line.
+# An edge statement can be a chain of edges: "a" -> "b" -> "c".
+DOT_NODE_RE = re.compile(r'^\s*"((?:[^"\\]|\\.)*)"\s*(\[.*\])?\s*;\s*$')
+DOT_EDGE_RE = re.compile(r'^\s*("(?:[^"\\]|\\.)*"(?:\s*->\s*"(?:[^"\\]|\\.)*")+)\s*(\[.*\])?\s*;\s*$')
+DOT_RANK_RE = re.compile(r'^\s*\{rank=same;.*\}\s*;?\s*$')
+DOT_NAME_RE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+DOT_ATTR_RE = re.compile(r'(\w+)\s*=\s*("(?:[^"\\]|\\.)*"|<.*>|[^,;\]\s]+)')
+
+# The graph, node and edge attributes that change the layout, the
+# others (colors, styles, labels and font names) do not.
+LAYOUT_ATTRS = frozenset(['compound', 'concentrate', 'constraint', 'fixedsize', 'fontsize',
+                          'group', 'height', 'margin', 'minlen', 'mclimit', 'newrank',
+                          'nodesep', 'nslimit', 'ordering', 'pad', 'peripheries', 'rank',
+                          'rankdir', 'ranksep', 'ratio', 'remincross', 'searchsize', 'shape',
+                          'size', 'splines', 'weight', 'width'])
+
+
+def dot_edges(m):
+    '''
+    Get the (tail, head) pairs of a DOT_EDGE_RE match.
+    '''
+    names = DOT_NAME_RE.findall(m.group(1))
+    return list(zip(names[:-1], names[1:]))
+
+
+def layout_key(path):
+    '''
+    Get the layout cache key (--layout-cache) for a DOT file.
+    It is a hash of the topology: the nodes, the edges, the rank
+    constraints and the attributes that change the layout
+    (LAYOUT_ATTRS) in the graph, node and edge statements, in the
+    order that they appear in the file. The colors, styles, labels
+    and font names are not part of it.
+    '''
+    import hashlib
+
+    def attrs(text):
+        return ' '.join('{}={}'.format(k, v.strip('"')) for k, v in DOT_ATTR_RE.findall(text or '') if k in LAYOUT_ATTRS)
+
+    sha = hashlib.sha1()
+    with open(path, 'r') as ifp:
+        for line in ifp:
+            if line.lstrip().startswith('//'):
+                continue
+            m = DOT_EDGE_RE.match(line)
+            if m:
+                for tail, head in dot_edges(m):
+                    sha.update('e {} {} {}\n'.format(tail, head, attrs(m.group(2))).encode('utf-8'))
+                continue
+            m = DOT_NODE_RE.match(line)
+            if m:
+                sha.update('n {} {}\n'.format(m.group(1), attrs(m.group(2))).encode('utf-8'))
+                continue
+            if DOT_RANK_RE.match(line):
+                sha.update(line.strip().encode('utf-8') + b'\n')
+                continue
+            # The graph, node and edge defaults and the top level
+            # graph attributes (-d).
+            found = attrs(line)
+            if found != '':
+                kind = re.match(r'\s*(\w*)', line).group(1)
+                sha.update('a {} {}\n'.format(kind, found).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def read_positions(path):
+    '''
+    Read the node and edge positions from a DOT file that was laid out
+    by dot (dot -Tdot).
+    Returns the node positions by name and the edge positions by
+    (tail, head) in the order that they appear.
+    '''
+    with open(path, 'r') as ifp:
+        text = ifp.read()
+    name = r'("(?:[^"\\]|\\.)*"|[\w.]+)'
+    nodes = {}
+    edges = {}
+    for m in re.finditer(r'(?m)^\s*' + name + r'(?:\s*->\s*' + name + r')?\s*\[(.*?)\];', text, re.DOTALL):
+        pos = re.search(r'\bpos="([^"]*)"', m.group(3))
+        if pos is None:
+            continue
+        tail = m.group(1).strip('"')
+        if m.group(2) is None:
+            nodes[tail] = pos.group(1)
+        else:
+            edges.setdefault((tail, m.group(2).strip('"')), []).append(pos.group(1))
+    return nodes, edges
+
+
+def inject_positions(src, dst, nodes, edges):
+    '''
+    Copy a DOT file and add the cached positions to the node and edge
+    statements so that it can be rendered with neato -n2.
+    Returns the number of statements that did not have a position.
+    '''
+    missing = 0
+    used = {}
+    with open(src, 'r') as ifp, open(dst, 'w') as ofp:
+        for line in ifp:
+            m = DOT_EDGE_RE.match(line)
+            if m:
+                # A chain is written as one statement for each edge
+                # because each edge has its own position.
+                stmts = []
+                for key in dot_edges(m):
+                    i = used.get(key, 0)
+                    used[key] = i + 1
+                    pos = edges[key][i] if i < len(edges.get(key, [])) else None
+                    stmts.append(('"{}" -> "{}"'.format(*key), pos))
+                attrs = m.group(2)
+            else:
+                m = DOT_NODE_RE.match(line)
+                if m is None:
+                    ofp.write(line)
+                    continue
+                stmts = [('"{}"'.format(m.group(1)), nodes.get(m.group(1)))]
+                attrs = m.group(2)
+
+            if any(pos is None for _, pos in stmts):
+                missing += 1
+                ofp.write(line)
+                continue
+            attrs = [] if attrs is None or attrs[1:-1].strip() == '' else [attrs[1:-1]]
+            for stmt, pos in stmts:
+                ofp.write('   {} [{}];\n'.format(stmt, ', '.join(['pos="{}"'.format(pos)] + attrs)))
+    return missing
+
+
+def cache_layout(opts, policy):
+    '''
+    Get the layout for the graph topology from the cache directory
+    (--layout-cache). It is created by dot, using the render policy,
+    the first time. It is called once before the renders start so
+    that they all share it.
+
+    Returns the path of the layout and the strategy used to create it
+    ("cached" if it was re-used).
+    '''
+    path = opts.DOT_FILE[0]
+    key = layout_key(path)
+    cached = os.path.join(opts.layout_cache, key + '.dot')
+    if not os.path.exists(cached):
+        infov(opts, 'creating the layout for {}'.format(key))
+        if not os.path.isdir(opts.layout_cache):
+            os.makedirs(opts.layout_cache)
+        tmp = '{}.tmp'.format(cached)
+        name, _ = rundot(opts, 'layout', ['-Tdot', '-o', '"{}"'.format(tmp), '"{}"'.format(path)], policy)
+        os.rename(tmp, cached)
+    else:
+        infov(opts, 're-using the layout for {}'.format(key))
+        name = 'cached'
+    return cached, name
+
+
+def gengraph_cached(opts, fmt, layout):
+    '''
+    Render the graph from a cached layout (see cache_layout()).
+
+    The positions are added to the DOT file and it is rendered by
+    neato -n2 which does not do any layout so changing the colors,
+    styles, labels or font names is cheap.
+
+    Returns the strategy used to create the layout or None if the
+    cache could not be used.
+    '''
+    path = opts.DOT_FILE[0]
+    cached, name = layout
+    nodes, edges = read_positions(cached)
+    positioned = '{}.{}.pos'.format(path, fmt)
+    missing = inject_positions(path, positioned, nodes, edges)
+    if missing > 0:
+        warn('{:,} nodes or edges are not in the cached layout, not using it'.format(missing))
+        os.remove(positioned)
+        return None
+    try:
+        cmd = 'neato -n2 -T{0} -o "{1}.{0}" "{2}"'.format(fmt, path, positioned)
+        infov(opts, 'running command: {}'.format(cmd))
+        st, _ = runcmd(cmd, show_output=opts.verbose > 1)
+    finally:
+        os.remove(positioned)
+    if st:
+        warn('rendering from the cached layout failed: {}'.format(cmd))
+        return None
+    return 'layout-cache-' + name
+
+
+def gengraph(opts, fmt, policy, layout=None):
+    '''
+    Generate the graph file using dot with -O option or from the
+    cached layout (--layout-cache) if there is one.
+    Returns the render strategy that was used and the elapsed time.
+    '''
+    infov(opts, 'generating {}'.format(fmt))
+    if layout is not None:
+        start = time.time()
+        name = gengraph_cached(opts, fmt, layout)
+        if name is not None:
+            return name, time.time() - start
+    return rundot(opts, fmt, ['-T{}'.format(fmt), '-O', '"{}"'.format(opts.DOT_FILE[0])], policy)
+
+
+# The attributes that Graphviz writes with the SVG default values.
+SVG_DEFAULT_RE = re.compile(r' (?:fill="black"|stroke="(?:none|transparent)"|text-anchor="start")(?=[\s/>])')
+
+# The attributes that only contain numbers.
+SVG_NUMBERS_RE = re.compile(r'\b(x|y|cx|cy|rx|ry|width|height|points|d|font-size|stroke-width|viewBox|transform)="([^"]*)"')
+
+
+def strip_svg(text):
+    '''
+    Remove the parts of the Graphviz SVG output that are not needed
+    to display it: the comments, the DOCTYPE, the white space between
+    the elements, the attributes with default values and the trailing
+    zeros of the numbers.
+    '''
+    def numbers(m):
+        val = re.sub(r'(\d)\.0+(?!\d)', r'\1', m.group(2))
+        val = re.sub(r'(\.\d*[1-9])0+(?!\d)', r'\1', val)
+        return '{}="{}"'.format(m.group(1), val)
+
+    text = re.sub(r'<!--.*?-->', '', text, flags=re.DOTALL)
+    text = re.sub(r'<!DOCTYPE[^>]*>', '', text)
+    text = re.sub(r'>\s+<', '><', text)
+    text = SVG_DEFAULT_RE.sub('', text)
+    text = SVG_NUMBERS_RE.sub(numbers, text)
+    return text.strip() + '\n'
+
+
+def postsvg(opts):
     '''
-    Generate the graph file using dot with -O option.
+    Strip (--svg-strip) and compress (--svg-compress) the SVG file.
     '''
-    if fmt:
-        infov(opts, 'generating {}'.format(fmt))
-        cmd = 'dot -T{} -O {}'.format(fmt, opts.DOT_FILE[0])
-        if opts.verbose:
-            cmd += ' -v'
-        infov(opts, 'running command: {}'.format(cmd))
-        st, _ = runcmd(cmd, show_output=opts.verbose > 1)
-        if st:
-            err('command failed with status {}: :"'.format(st, cmd))
+    if not opts.svg_strip and opts.svg_compress == '':
+        return
+    svg = opts.DOT_FILE[0] + '.svg'
+    try:
+        with open(svg, 'r') as ifp:
+            text = ifp.read()
+        if opts.svg_strip:
+            size = len(text)
+            text = strip_svg(text)
+            infov(opts, 'stripped {} from {:,} to {:,} bytes'.format(svg, size, len(text)))
+            with open(svg, 'w') as ofp:
+                ofp.write(text)
+        if opts.svg_compress != '':
+            if opts.svg_compress == 'svgz':
+                ofn = opts.DOT_FILE[0] + '.svgz'
+            else:
+                ofn = svg + '.gz'
+            # The .gz suffix selects the compression in open_output().
+            with open_output(ofn + '.tmp.gz') as ofp:
+                ofp.write(text)
+            os.rename(ofn + '.tmp.gz', ofn)
+            infov(opts, 'compressed {} to {:,} bytes'.format(ofn, os.path.getsize(ofn)))
+    except (IOError, OSError) as e:
+        err('SVG post processing failed: {}'.format(e))
+
+
+def stats(opts):
+    '''
+    Report the size of the graph without writing the DOT file or
+    rendering it (--stats).
+    Everything is computed in linear time. The DOT file statistics
+    come from running gendot() with a DotSizer, the render estimate
+    comes from the render log (--render-log).
+    '''
+    infov(opts, 'collecting statistics')
+    report = {}
+    for key in ['cnode', 'mnode', 'snode', 'rnode', 'bnode', 'tnode']:
+        report['num_{}s'.format(key)] = 0
+    for key in ['cnode_pedge', 'mnode_pedge', 'sedge', 'bedge', 'tedge']:
+        report['num_{}s'.format(key)] = 0
+    fan_in = 0
+    fan_out = 0
+    for nd in Node.m_list:
+        fan_in = max(fan_in, len(nd.m_parents))
+        fan_out = max(fan_out, len(nd.m_children))
+        if nd.is_squashed():
+            continue
+        report['num_{}s'.format(node_class(nd))] += 1
+        if not nd.is_squashed_tail():
+            if nd.is_squashed_head():
+                report['num_sedges'] += 1
+            if nd.is_merge_node():
+                report['num_mnode_pedges'] += len(nd.m_parents)
+            else:
+                report['num_cnode_pedges'] += len(nd.m_parents)
+        for refs, key in [(nd.m_branches, 'b'), (nd.m_tags, 't')]:
+            if len(refs) > 0:
+                num = 1 if opts.crunch else len(refs)
+                report['num_{}nodes'.format(key)] += num
+                report['num_{}edges'.format(key)] += num
+
+    # The longest chain of commits with one parent and one child and
+    # the longest path, parents first.
+    chain = {}
+    depth = {}
+    longest_chain = 0
+    longest_path = 0
+    for nd in reversed(topo_order(Node.m_map)):
+        parents = [Node.m_map[p] for p in nd.m_parents if p in Node.m_map]
+        depth[nd.m_cid] = 1 + max([depth[p.m_cid] for p in parents] + [0])
+        chain[nd.m_cid] = 0
+        if nd.is_squashable():
+            chain[nd.m_cid] = 1
+            if len(parents) > 0 and parents[0].is_squashable():
+                chain[nd.m_cid] += chain[parents[0].m_cid]
+        longest_chain = max(longest_chain, chain[nd.m_cid])
+        longest_path = max(longest_path, depth[nd.m_cid])
+
+    sizer = DotSizer()
+    gendot(opts, ofp=sizer)
+    policy = render_policy(opts, sizer.m_nodes, sizer.m_edges)
+    estimate, samples = render_estimate(opts, sizer.m_nodes, sizer.m_edges, policy[0])
+
+    report.update({'num_commits': len(Node.m_list),
+                   'num_ref_nodes': report['num_bnodes'] + report['num_tnodes'],
+                   'num_invis_edges': sizer.m_invis,
+                   'longest_chain': longest_chain,
+                   'longest_path': longest_path,
+                   'max_fan_in': fan_in,
+                   'max_fan_out': fan_out,
+                   'dot_bytes': sizer.m_bytes,
+                   'dot_nodes': sizer.m_nodes,
+                   'dot_edges': sizer.m_edges,
+                   'render_strategy': policy[0],
+                   'render_estimate_samples': samples,
+                   'render_estimate_seconds': 'unknown' if estimate is None else '{:.3f}'.format(estimate)})
+    for k in sorted(report, key=str.lower):
+        print('// stats:{} {}'.format(k, report[k]))
+
+
+def render(opts, extra=[]):
+    '''
+    Generate the HTML and graph files from the DOT file.
+
+    The renders are independent so they are run concurrently on a
+    thread pool, with at most --jobs of them running at once. The HTML
+    page is written while dot is running. The extra (name, function)
+    pairs (like the exporters) are run the same way.
+    '''
+    if opts.svg_strip or opts.svg_compress != '':
+        if not opts.svg:
+            warn('--svg-strip and --svg-compress are ignored unless --svg is specified')
+
+    # The render policy is chosen once for all of the renders, the
+    # strategies and times are added to the DOT file when they are
+    # done.
+    rendered = {}
+    nodes, edges = 0, 0
+    policy = []
+    if opts.png or opts.svg or opts.html_canvas is not None:
+        nodes, edges = render_size(opts.DOT_FILE[0])
+        policy = render_policy(opts, nodes, edges)
+        infov(opts, 'render policy for {:,} nodes and {:,} edges: {}'.format(nodes, edges, ', '.join(policy)))
+
+    # The cached layout is created before the renders start so that
+    # they do not each create it.
+    layout = None
+    if opts.layout_cache is not None and (opts.png or opts.svg):
+        layout = cache_layout(opts, policy)
+
+    def png():
+        rendered['png'] = gengraph(opts, 'png', policy, layout)
+
+    def svg():
+        rendered['svg'] = gengraph(opts, 'svg', policy, layout)
+        postsvg(opts)
+
+    def canvas():
+        rendered['canvas'] = html_canvas(opts, policy)
+
+    tasks = list(extra)
+    if opts.html is not None:
+        tasks.append(('html', lambda: html(opts)))
+    if opts.png:
+        tasks.append(('png', png))
+    if opts.svg:
+        tasks.append(('svg', svg))
+    if opts.html_canvas is not None:
+        tasks.append(('canvas', canvas))
+
+    jobs = opts.jobs
+    if jobs <= 0 and len(tasks) > 1:
+        import multiprocessing
+        jobs = multiprocessing.cpu_count() or 1
+    if jobs == 1 or len(tasks) <= 1:
+        for _, task in tasks:
+            task()
+        write_render_summary(opts, nodes, edges, rendered)
+        return
+
+    import concurrent.futures
+    infov(opts, 'running {} render tasks, {} at a time'.format(len(tasks), jobs))
+    failed = []
+
+    # All of the tasks are waited for, a failure is reported when the
+    # task finishes and the exit happens at the end.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = dict((pool.submit(task), name) for name, task in tasks)
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except SystemExit:
+                failed.append(futures[future])  # err() has already reported it
+            except Exception as e:
+                warn('{} render failed: {}: {}'.format(futures[future], type(e).__name__, e))
+                failed.append(futures[future])
+    if len(failed) > 0:
+        err('{} of the {} render tasks failed: {}'.format(len(failed), len(tasks), ', '.join(sorted(failed))))
+    write_render_summary(opts, nodes, edges, rendered)
 
 
 def getopts():
@@ -985,8 +4643,21 @@ def getopts():
     base = os.path.basename(sys.argv[0])
     name = os.path.splitext(base)[0]
     usage = '\n  {0} [OPTIONS] <DOT_FILE>'.format(base)
-    desc = 'DESCRIPTION:{0}'.format('\n  '.join(__doc__.split('\n')))
-    epilog = r'''EXAMPLES:
+
+    class Help(argparse.Action):
+        r'''
+        Show the help. The description and the examples are only
+        built when they are needed, argparse decides when that is for
+        all of the ways -h and --help can be spelled.
+        '''
+        def __call__(self, parser, namespace, values, option_string=None):
+            parser.description = 'DESCRIPTION:{0}'.format('\n  '.join(__doc__.split('\n')))[:-2]
+            parser.epilog = epilog()
+            parser.print_help()
+            parser.exit()
+
+    def epilog():
+        return r'''EXAMPLES:
    # Example 1: help
    $ {0} -h
 
@@ -1060,11 +4731,16 @@ LICENSE:
 PROJECT:
    https://github.com/jlinoff/git2dot
  '''.format(base)
+
     afc = argparse.RawTextHelpFormatter
     parser = argparse.ArgumentParser(formatter_class=afc,
-                                     description=desc[:-2],
                                      usage=usage,
-                                     epilog=epilog)
+                                     add_help=False)
+
+    parser.add_argument('-h', '--help',
+                        action=Help,
+                        nargs=0,
+                        help=gettext('show this help message and exit'))
 
     parser.add_argument('--align-by-date',
                         action='store',
@@ -1092,6 +4768,46 @@ it. This is done by creating invisible edges.
 Be careful when using this option. The invisible edge can cause
 nodes to not aligh horizontally which can be a bit jarring.
 
+Default: %(default)s
+ ''')
+
+    parser.add_argument('--ancestors-of',
+                        action='append',
+                        metavar=('REF'),
+                        default=[],
+                        help='''Only include the commit and its ancestors.
+REF is a commit id (or a unique prefix), a branch or a tag. This
+option can be specified multiple times. The result is the union
+of all of the --ancestors-of, --descendants-of and --between
+selections.
+
+The selections are answered by a reachability index that is built
+once for the parsed graph so they are fast even for very large
+graphs.
+ ''')
+
+    parser.add_argument('--around',
+                        action='append',
+                        metavar=('REF'),
+                        default=[],
+                        help='''Only read the commits within --radius edges of REF.
+REF is anything that git accepts as a commit. The ancestors and the
+descendants are found incrementally so the time depends on the radius
+rather than on the size of the repository. Stub nodes (see
+--around-stub) show where the graph was cut.
+
+This option can be specified multiple times. It cannot be used with
+-i, -g, -k or --path.
+
+Example:
+   --around 1a2b3c4 --radius 20
+ ''')
+
+    parser.add_argument('--around-stub',
+                        action='store',
+                        metavar=('DOT_ATTR_LIST'),
+                        default='[label="{label}", shape=plaintext, style=""]',
+                        help='''Define the attributes of the --around stub nodes.
 Default: %(default)s
  ''')
 
@@ -1106,6 +4822,18 @@ Unlike edges that connect cnodes, mnodes and snodes, this is a simple
 connection. The parent reference is obvious because of the rank.
 
 Default: %(default)s
+ ''')
+
+    parser.add_argument('--between',
+                        action='append',
+                        nargs=2,
+                        metavar=('REF1', 'REF2'),
+                        default=[],
+                        help='''Only include the commits between REF1 and REF2.
+These are the commits that are ancestors of REF2 (including REF2)
+but not ancestors of REF1 (including REF1), the same as git log
+REF1..REF2. The side branches that were forked before REF1 and
+merged after it are included. See --ancestors-of for details.
  ''')
 
     parser.add_argument('--bnode',
@@ -1141,6 +4869,23 @@ tells the tool to prune all other branches as endpoints.
 This is very useful for comparing commits between related branches.
  ''')
 
+    parser.add_argument('--choose-ref',
+                        action='append',
+                        metavar=('PATTERN'),
+                        default=[],
+                        help='''Choose the branches and tags that match PATTERN.
+This is the same as specifying --choose-branch or --choose-tag for
+each matching ref. PATTERN is a glob unless it starts with "re:" in
+which case it is a regular expression that must match the whole
+name. Tags are matched without the "tag: " prefix.
+
+This option can be specified multiple times. See --exclude-ref.
+
+Examples:
+   --choose-ref 'release/*'
+   --choose-ref 're:v[0-9]+\\.[0-9]+' --exclude-ref '*-rc*'
+ ''')
+
     parser.add_argument('--choose-tag',
                         action='append',
                         metavar=('TAG'),
@@ -1223,6 +4968,87 @@ Default:
    -d '{}'
  '''.format('\'\n   -d \''.join(x)))
 
+    parser.add_argument('--commit-graph',
+                        action='store_true',
+                        help='''Read the commits from the git commit-graph files.
+Git keeps the parents, the commit dates and the generation numbers
+of the commits in objects/info/commit-graph (or a chain of them) in
+a compact binary format. This option memory maps those files and
+builds the graph directly from them. The branches and tags are read
+from the refs (see --read-refs). Commits made since the commit-graph
+was written are read using git log.
+
+Only topology renders can be done this way. If -i, -g, -D, --since,
+--until or --range is specified, or the -l label needs anything other
+than %h, %H or %ct, the normal git log command is used. The commit
+dates are in UTC because the time zones are not stored.
+
+Run "git commit-graph write --reachable" to create or update the
+commit-graph.
+ '''.replace('%', '%%'))
+
+    parser.add_argument('--contains',
+                        action='append',
+                        metavar=('REF'),
+                        default=[],
+                        help='''Track which commits are contained by a branch or tag.
+The names of the tracked refs that contain a commit are available in
+the {contains} variable of the --cnode, --mnode and --snode
+attributes. The --choose-branch, --choose-tag, --contains-node and
+--contains-filter refs are always tracked.
+
+This option can be specified multiple times.
+
+The containment is computed in a single pass over the graph so it is
+fast even with hundreds of refs.
+
+For example, to show the containing refs as a tooltip:
+
+   --contains main --contains release \\
+   --cnode '[label="{label}", tooltip="{contains}"]'
+ ''')
+
+    parser.add_argument('--contains-filter',
+                        action='append',
+                        metavar=('SPEC'),
+                        default=[],
+                        help='''Only include the commits that match the containment SPEC.
+SPEC is a list of branches or tags separated by "+". A "!" in front
+of a ref means that the ref must not contain the commit. A "=" in
+front of SPEC means that no other tracked ref may contain it.
+
+This option can be specified multiple times. The commits that match
+any of the specs are kept.
+
+Examples:
+   main+release    on main and release
+   =release        only on release (of the tracked refs)
+   main+!release   on main but not release
+ ''')
+
+    parser.add_argument('--contains-node',
+                        action='append',
+                        nargs=2,
+                        metavar=('SPEC', 'DOT_ATTR_LIST'),
+                        default=[],
+                        help='''Define the node attributes for commits that match SPEC.
+See --contains-filter for the SPEC syntax. The first match overrides
+the --cnode, --mnode and --snode attributes.
+
+This option can be specified multiple times.
+
+Example:
+   --contains-node '=release' '[label="{label}", color="red"]'
+ ''')
+
+    parser.add_argument('--descendants-of',
+                        action='append',
+                        metavar=('REF'),
+                        default=[],
+                        help='''Only include the commit and its descendants.
+See --ancestors-of for details.
+ ''')
+
     parser.add_argument('-D', '--define-var',
                         action='append',
                         nargs=2,
@@ -1253,6 +5079,66 @@ surround them with a delimiter like @FOO@.  If you simply specify
 contains @FOO which is probably not what you want.
  '''.replace('%', '%%'))
 
+    parser.add_argument('--diff',
+                        action='store',
+                        metavar=('FILE'),
+                        help='''Show the differences from an old snapshot.
+FILE is the kept output (-k) from an earlier run, for example from
+before a merge or a rebase. Only the commits that were added, removed
+or rewritten and the commits within --diff-context edges of them are
+shown so the graph size depends on the size of the change rather than
+the size of the history.
+
+Rewritten commits are matched by the label fields (-l) that are not
+commit ids so make sure that you specify fields that do not change
+when a commit is rewritten, for example: -l '%h|%s|%an|%ad'. The old
+snapshot must have been generated with the same -l fields.
+
+See --diff-added, --diff-removed and --diff-rewritten for the styles.
+ '''.replace('%', '%%'))
+
+    parser.add_argument('--diff-added',
+                        action='store',
+                        metavar=('DOT_ATTR_LIST'),
+                        default='[label="{label}", color="palegreen"]',
+                        help='''Define the attributes of the added commits (--diff).
+Default: %(default)s
+ ''')
+
+    parser.add_argument('--diff-context',
+                        action='store',
+                        type=int,
+                        metavar=('NUM'),
+                        default=1,
+                        help='''The number of edges of context around the changed commits (--diff).
+Default: %(default)s
+ ''')
+
+    parser.add_argument('--diff-removed',
+                        action='store',
+                        metavar=('DOT_ATTR_LIST'),
+                        default='[label="{label}", color="lightgray", style="filled,dashed"]',
+                        help='''Define the attributes of the removed commits (--diff).
+Default: %(default)s
+ ''')
+
+    parser.add_argument('--diff-rewritten',
+                        action='store',
+                        metavar=('DOT_ATTR_LIST'),
+                        default='[label="{label}", color="gold"]',
+                        help='''Define the attributes of the rewritten commits (--diff).
+Default: %(default)s
+ ''')
+
+    parser.add_argument('--exclude-ref',
+                        action='append',
+                        metavar=('PATTERN'),
+                        default=[],
+                        help='''Do not choose the branches and tags that match PATTERN.
+If --choose-ref is not specified, all of the other refs are chosen.
+See --choose-ref for the PATTERN syntax.
+ ''')
+
     parser.add_argument('--font-name',
                         action='store',
                         type=str,
@@ -1287,9 +5173,29 @@ correct fields for parsing for everything, including cnode labels.
 
 This option disables the --range, --since and --until options.
 
+When the default command is used, the commit body (%b) is only
+requested when variables are defined (-D) or the output is kept (-k).
+The body is the only optional field: the decoration (%d) is needed for
+the branch and tag nodes and the date (%ci) for the date ordering and
+pruning of every graph.
+
 Default: %(default)s
  '''.replace('%', '%%'))
 
+    parser.add_argument('--graphml',
+                        action='store',
+                        metavar=('FILE'),
+                        help='''Export the graph to a GraphML file.
+The graph is the one written to the DOT file, after pruning and
+squashing. Each node has the node class (cnode, mnode or snode), the
+chain size for squashed chains, the date, the branches, the tags,
+the variables and the label fields. Each edge has the edge class
+(pedge or sedge) and the number of commits that it represents.
+
+The file is written incrementally so it works for very large graphs.
+It is compressed if the name ends in .gz, .bz2 or .xz.
+ ''')
+
     parser.add_argument('--html',
                         action='store',
                         metavar=('FILE'),
@@ -1309,6 +5215,19 @@ You will almost certainly want to update the HTML page title.
  ''')
 
     x = ['<script src="svg-pan-zoom.min.js"></script>']
+    parser.add_argument('--html-canvas',
+                        action='store',
+                        metavar=('FILE'),
+                        help='''Generate an HTML file that draws the graph on a canvas.
+The graph is laid out once by dot and only the node and edge
+positions are written to the file as JSON. The page only draws what
+is in view so panning (drag) and zooming (mouse wheel) stay smooth
+for graphs that are much too large for the SVG based --html page.
+Double click to fit the graph in the view.
+
+The --html-min-height and --html-title options apply to it.
+ ''')
+
     parser.add_argument('--html-head',
                         action='append',
                         metavar=('HTML'),
@@ -1320,6 +5239,18 @@ Default:
    '{}'
  '''.format('\'\n   -d \''.join(x)))
 
+    parser.add_argument('--html-lazy',
+                        action='store_true',
+                        help='''Load the SVG asynchronously in the --html page.
+The page is shown right away with a progress indicator and the SVG is
+attached when it has been loaded. This makes a big difference for
+large graphs. The page must be served over HTTP because browsers do
+not allow it to fetch local files.
+
+Use it with --svg-compress and a server that sends the compressed copy
+(see --svg-compress) to reduce the transfer size.
+ ''')
+
     parser.add_argument('--html-min-height',
                         action='store',
                         default='700px',
@@ -1340,12 +5271,45 @@ Default: %(default)s
  ''')
 
     parser.add_argument('-i', '--input',
-                        action='store',
+                        action='append',
                         metavar=('FILE'),
-                        default='',
+                        default=[],
                         help='''Input data.
 You can use this to avoid running git commands.
 It is useful for testing.
+
+The input can be compressed by gzip, bzip2 or xz. It is
+decompressed as it is read.
+
+This option can be specified multiple times and FILE can be a glob
+pattern (quote it). The files, for example the keep files (-k) from
+several mirrors or date ranges, are read one after the other and the
+commits are merged. When the files disagree about a branch or tag the file
+with the newest commit wins.
+ ''')
+
+    parser.add_argument('-j', '--jobs',
+                        action='store',
+                        type=int,
+                        metavar=('NUM'),
+                        default=0,
+                        help='''The maximum number of renders to run at once.
+The --png, --svg, --html and --html-canvas outputs are independent
+so they are generated concurrently. Zero means the number of CPUs
+and one runs them one after the other.
+
+Default: %(default)s
+ ''')
+
+    parser.add_argument('--jsonl',
+                        action='store',
+                        metavar=('FILE'),
+                        help='''Export the graph to a JSON Lines file.
+Each line is a JSON object with a "type" of "node" or "edge". The
+nodes are written first. See --graphml for the node and edge data.
+
+The file is written incrementally so it works for very large graphs.
+It is compressed if the name ends in .gz, .bz2 or .xz.
  ''')
 
     parser.add_argument('-k', '--keep',
@@ -1354,7 +5318,41 @@ It is useful for testing.
 This is great for trying out different display options or for
 sharing.
 
-The kept output file name is DOT_FILE.keep.
+The kept output file name is DOT_FILE.keep (see --keep-compress).
+
+The kept output always includes the commit bodies so that it can be
+re-used with -D even though they are not requested from git otherwise.
+ ''')
+
+    parser.add_argument('--keep-compress',
+                        action='store',
+                        choices=['', 'gz', 'bz2', 'xz'],
+                        default='',
+                        help='''Compress the kept git command output (-k).
+The kept output file name is DOT_FILE.keep.gz, DOT_FILE.keep.bz2 or
+DOT_FILE.keep.xz. A parallel compressor (pigz, lbzip2, pbzip2 or
+xz -T0) is used if one is installed.
+
+Compressed input files (-i) are detected automatically.
+
+Default: none
+ ''')
+
+    parser.add_argument('--layout-cache',
+                        action='store',
+                        metavar=('DIR'),
+                        help='''Cache the graph layouts in DIR.
+The layout that dot creates for --png and --svg is saved in DIR,
+keyed by the graph topology (the nodes, the edges and the rank
+constraints) and by the attributes that change the layout, like
+rankdir, ranksep, nodesep, splines, shape and fontsize. When the same
+graph is rendered again with different colors, styles, labels or font
+names the cached positions are used and the graph is rendered by
+"neato -n2" which skips the layout. That is much
+faster for large graphs.
+
+Node sizes are not recomputed from the cached layout so labels that
+are much larger than before may overlap.
  ''')
 
     parser.add_argument('-l', '--cnode-label',
@@ -1422,6 +5420,23 @@ child. It can only be created by a git merge operation.
 See the documentation for --cnode for more attribute details.
 
 Default: %(default)s
+ ''')
+
+    parser.add_argument('--path',
+                        action='append',
+                        metavar=('PATH'),
+                        default=[],
+                        help='''Only read the commits that change PATH.
+The parents are rewritten to the nearest ancestors that change PATH
+(git log --parents) so the graph stays connected and only the matching
+commits are read and become nodes. PATH is a git pathspec.
+
+This option can be specified multiple times.
+
+Example:
+   --path services/payments/
+
+This option is ignored if -g is specified.
  ''')
 
     parser.add_argument('--png',
@@ -1429,6 +5444,15 @@ Default: %(default)s
                         help='''Use dot to generate a PNG file.
 This option is only valid if -o is specified.
 It is the same as running "dot -Tpng -O DOT_FILE".
+ ''')
+
+    parser.add_argument('--radius',
+                        action='store',
+                        type=int,
+                        metavar=('NUM'),
+                        default=5,
+                        help='''The number of edges to follow from the --around commits.
+Default: %(default)s
  ''')
 
     parser.add_argument('--range',
@@ -1451,6 +5475,118 @@ instead of
 
 This option is ignored if -g is specified.
 
+Default: %(default)s
+ ''')
+
+    parser.add_argument('--read-refs',
+                        action='store_true',
+                        help='''Read the branches and tags directly from the repository.
+By default git is asked to decorate every commit (%d) which is slow
+for repositories with tens of thousands of tags and remote branches.
+This option reads the refs and packed-refs files once instead, peels
+the annotated tags and uses the result to find the branches and tags
+for each commit.
+
+The keep file (-k) contains the same decorations as it does without
+this option.
+
+This option is ignored if -g is specified.
+ '''.replace('%', '%%'))
+
+    parser.add_argument('--render-log',
+                        action='store',
+                        metavar=('FILE'),
+                        default=None,
+                        help='''Append the size, strategy and time of each render to FILE
+as JSON lines. The --stats option uses them to estimate the render
+time of a graph.
+ ''')
+
+    parser.add_argument('--render-policy',
+                        action='store',
+                        choices=['auto'] + list(RENDER_STRATEGIES),
+                        default='auto',
+                        help='''The first strategy used to render the graph.
+The strategies, from the best layout to the cheapest, are:
+
+   dot     plain dot
+   tuned   dot with fewer network simplex and mincross iterations
+   fast    dot with minimal iterations and straight edges
+   sfdp    the sfdp force directed layout with straight edges
+
+If a render runs for longer than --render-timeout it is stopped and
+retried with the next strategy. The auto policy chooses the first
+strategy from the number of nodes and edges in the graph, see
+--render-sizes.
+
+The strategies and render times are added to the summary data at the
+end of the DOT file.
+
+Default: %(default)s
+ ''')
+
+    parser.add_argument('--render-sizes',
+                        action='store',
+                        type=int,
+                        nargs=3,
+                        metavar=('TUNED', 'FAST', 'SFDP'),
+                        default=[5000, 20000, 100000],
+                        help='''The graph sizes, the number of nodes plus edges, above
+which the auto render policy starts with the tuned, fast and sfdp
+strategies.
+
+Default: %(default)s
+ ''')
+
+    parser.add_argument('--render-timeout',
+                        action='store',
+                        type=int,
+                        metavar=('SECONDS'),
+                        default=900,
+                        help='''The maximum time for a render before it is retried
+with the next render strategy. Zero means no limit.
+
+Default: %(default)s
+ ''')
+
+    parser.add_argument('--rnode',
+                        action='store',
+                        metavar=('DOT_ATTR_LIST'),
+                        default='[label="{label}", color="wheat", shape="folder"]',
+                        help='''Define the rnode attributes.
+The rnode is a rollup node that replaces the commits of a lane in a
+time bucket, see --rollup.
+
+See the documentation for --cnode for more attribute details.
+
+Default: %(default)s
+ ''')
+
+    parser.add_argument('--rollup',
+                        action='store',
+                        choices=['day', 'week', 'month'],
+                        default=None,
+                        help='''Roll up the commits into one node per time bucket for
+each first-parent lane. The rollup node shows the bucket and the
+number of commits and it has the branches and tags of all of its
+commits. A lane starts at a branch tip or at a merged commit and
+follows the first parents. A bucket is split into several nodes when
+a branch is forked from it and merged back into it, otherwise the
+graph would have a cycle.
+
+This is useful for an overview of a long history, see --rollup-recent
+to keep the recent commits.
+ ''')
+
+    parser.add_argument('--rollup-recent',
+                        action='store',
+                        type=int,
+                        metavar=('NUM'),
+                        default=0,
+                        help='''Do not roll up the commits in the NUM most recent
+time buckets (--rollup). The buckets are counted back from the newest
+commit.
+
 Default: %(default)s
  ''')
 
@@ -1458,6 +5594,41 @@ Default: %(default)s
                         action='store_true',
                         help='''Squash sequences of simple commits into a single commit.
 The default is not to squash.
+ ''')
+
+    parser.add_argument('--shards',
+                        action='store',
+                        type=int,
+                        metavar=('NUM'),
+                        default=0,
+                        help='''Read the git data using NUM concurrent git commands.
+A single git log over a huge repository is one long running process.
+This option splits the work across NUM git log commands that run at
+the same time. The output of each one is parsed as it arrives and
+the results are merged by commit id and put back in topological
+order.
+
+See --shard-by for how the work is split.
+
+It cannot be used with -i or -g.
+ ''')
+
+    parser.add_argument('--shard-by',
+                        action='store',
+                        choices=['date', 'refs'],
+                        default='date',
+                        help='''Choose how the work is split for --shards.
+
+   date    Split the time between the oldest and the newest commit
+           into windows of the same length. Each git command still
+           walks the whole history but only formats the commits in
+           its window, the formatting and parsing are concurrent
+           but the walk is not. This requires git 2.37 or later.
+   refs    Split the refs into groups. Each group excludes the
+           history of the earlier groups. This requires --all in
+           --range.
+
+Default: %(default)s
  ''')
 
     parser.add_argument('--since',
@@ -1482,6 +5653,19 @@ Typically this is a dotted line with a count of the number of nodes
 that were squashed.
 
 Default: %(default)s
+ ''')
+
+    parser.add_argument('--skip-unchanged',
+                        action='store_true',
+                        help='''Do nothing if the inputs did not change since the last run.
+A fingerprint of the options and of HEAD and all of the refs (or of
+the -i file) is stored in the summary data of the DOT file when all
+of the outputs were created. The next run with this option compares
+it before it does anything else and stops if it is the same and all
+of the output files exist.
+
+This is useful for runs from cron where most of the time nothing has
+changed. The refs are read directly so git is not run.
  ''')
 
     parser.add_argument('--snode',
@@ -1494,6 +5678,56 @@ The snode defines the head and tail nodes of a squashed node sequence.
 See the documentation for --cnode for more attribute details.
 
 See the documentation for -s for squash details.
+ ''')
+
+    parser.add_argument('--stats',
+                        action='store_true',
+                        help='''Report the size of the graph and stop, the DOT file is
+not written and nothing is rendered. The report has the number of
+nodes and edges of each class, the longest chain and path, the
+maximum merge fan in and fan out, the number of ref nodes and
+invisible alignment edges, the size of the DOT file, the render
+strategy that would be used and an estimate of the render time based
+on the earlier renders in the --render-log file.
+
+The report lines have the same form as the summary data at the end of
+the DOT file, for example:
+
+   // stats:dot_bytes 52371
+   // stats:render_estimate_seconds 12.5
+ ''')
+
+    parser.add_argument('--store',
+                        action='store',
+                        metavar=('FILE'),
+                        default='',
+                        help='''Use an on disk SQLite store for the commit graph.
+This is for very large histories that do not fit in memory. The
+commits are loaded into the store as they are read and the pruning,
+squashing and dot generation all work from it with bounded memory.
+
+If the store was completely loaded by an earlier run it is re-used
+and the git command (or -i input) is not read at all. That makes
+it a good way to try different display options on a large
+repository. It is reloaded when the input changes: new commits or
+refs, a different -i file or different -l, -D, --since, --until or
+--range options.
+
+The --since, --until and --range options are applied when the store
+is loaded.
+ ''')
+
+    parser.add_argument('--stream',
+                        action='store_true',
+                        help='''Write the dot file while the git output is read.
+The nodes, edges, branches and tags are written as each commit
+arrives instead of building the whole graph first so the memory used
+stays roughly constant and the output starts right away.
+
+It requires the commits to be in --topo-order, which is the default
+for --range. It cannot be used with --squash, --choose-branch,
+--choose-tag, --align-by-date or --store because they need the
+whole graph.
  ''')
 
     parser.add_argument('--svg',
@@ -1503,6 +5737,34 @@ This option is only valid if -o is specified.
 It is the same as running "dot -Tsvg -O DOT_FILE".
 
 Default: %(default)s
+ ''')
+
+    parser.add_argument('--svg-compress',
+                        action='store',
+                        choices=['', 'svgz', 'gz'],
+                        default='',
+                        help='''Write a compressed copy of the SVG file (--svg).
+The svgz choice writes DOT_FILE.svgz which is a standard compressed
+SVG file.
+The gz choice writes DOT_FILE.svg.gz which web servers can send in
+place of the SVG file (for example nginx gzip_static).
+
+The --html page always refers to the SVG file because browsers only
+accept compressed SVG when the server sends it with
+"Content-Encoding: gzip", simple servers like python -m http.server
+do not. Configure the server to send the compressed copy instead.
+
+Default: none
+ ''')
+
+    parser.add_argument('--svg-strip',
+                        action='store_true',
+                        help='''Strip the SVG file (--svg).
+Remove the comments, the DOCTYPE and the white space between the
+elements that Graphviz writes, the attributes that repeat the SVG
+defaults (fill="black", stroke="none", stroke="transparent" and
+text-anchor="start") and the trailing zeros of the numbers in the
+coordinates and sizes. They are not needed to display it.
  ''')
 
     parser.add_argument('--tedge',
@@ -1583,6 +5845,21 @@ comment so it must be odd.
 Default: %(default)s
 ''')
 
+    parser.add_argument('-z', '--null',
+                        action='store_true',
+                        help='''Use NUL framed records.
+The records from git are framed by NUL characters and the fields are
+separated by control characters that cannot appear in commit data
+instead of by "|" and new lines. That makes parsing faster and it
+allows "|" to appear in the label data, for example in subjects
+(-l '%s').
+
+The -l fields are still separated by "|" on the command line.
+
+Input files (-i) and keep files in this format are detected
+automatically.
+ '''.replace('%', '%%'))
+
     # Positional arguments at the end.
     parser.add_argument('DOT_FILE',
                         nargs=1,
@@ -1592,6 +5869,18 @@ automatically.
 ''')
 
     opts = parser.parse_args()
+
+    # Expand the -i glob patterns, they are not expanded by the shell
+    # when they are quoted.
+    inputs = []
+    for pattern in opts.input:
+        found = [pattern]
+        if re.search(r'[*?[]', pattern):
+            found = sorted(glob.glob(pattern))
+            if len(found) == 0:
+                parser.error('no input files match {}'.format(pattern))
+        inputs += [fn for fn in found if fn not in inputs]
+    opts.input = inputs
     return opts
 
 
@@ -1627,13 +5916,29 @@ def main():
 
     opts = getopts()
     cmdline(opts)
-    parse(opts)
-    gendot(opts)
-    html(opts)
-    if opts.png:
-        gengraph(opts, 'png')
-    if opts.svg:
-        gengraph(opts, 'svg')
+    if opts.skip_unchanged:
+        opts.fingerprint = fingerprint(opts)
+        if not opts.stats and is_unchanged(opts):
+            infov(opts, 'nothing changed, {} is up to date'.format(opts.DOT_FILE[0]))
+            return
+    if opts.stream:
+        genstream(opts)
+        render(opts)
+    elif opts.store:
+        store = parse_store(opts)
+        gendot(opts, store)
+        export(opts, store)  # the store cannot be shared by threads
+        store.close()
+        render(opts)
+    else:
+        parse(opts)
+        if opts.stats:
+            stats(opts)
+        else:
+            gendot(opts)
+            render(opts, [('export', lambda: export(opts))] if opts.jsonl or opts.graphml else [])
+    if opts.skip_unchanged and not opts.stats:
+        write_fingerprint(opts)
     infov(opts, 'done')
 
 
@@ -0,0 +1,78 @@
+#!/bin/bash
+#
+# Guard the startup time of git2dot.
+#
+# It replays a small keep file (-i), which is dominated by the startup
+# cost, and fails if a module that should only be imported on demand
+# was imported or if the median run time is over the budget.
+#
+# Usage:
+#    $ ./bench-startup.sh
+#    $ BENCH_RUNS=20 BENCH_BUDGET_MS=150 ./bench-startup.sh
+#
+
+# ================================================================
+# Setup
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+Python=${PYTHON:-python3}
+Runs=${BENCH_RUNS:-10}
+BudgetMs=${BENCH_BUDGET_MS:-250}
+Keep=$Location/test01.dot.keep
+Tmp=$(mktemp -d)
+trap "rm -rf $Tmp" EXIT
+
+# The modules that are only imported by the options that need them.
+Lazy='asyncio dateutil hashlib inspect multiprocessing sqlite3 tempfile xml'
+
+# ================================================================
+# Imports
+# ================================================================
+$Python -X importtime $Location/../git2dot.py -i $Keep $Tmp/bench.dot 2> $Tmp/imports.log
+st=$?
+if (( st )) ; then
+    echo "ERROR:${LINENO}: git2dot failed with status $st"
+    exit 1
+fi
+
+Failed=0
+for Module in $Lazy ; do
+    if grep -E -q "\| +$Module(\.|$)" $Tmp/imports.log ; then
+        echo "ERROR:${LINENO}: $Module was imported at startup"
+        Failed=1
+    fi
+done
+if (( Failed )) ; then
+    exit 1
+fi
+
+# ================================================================
+# Time
+# ================================================================
+Median=$($Python - "$Runs" "$Location/../git2dot.py" "$Keep" "$Tmp/bench.dot" <<'EOF'
+import subprocess
+import sys
+import time
+
+runs, prog, keep, dot = int(sys.argv[1]), sys.argv[2], sys.argv[3], sys.argv[4]
+times = []
+for _ in range(runs):
+    start = time.time()
+    subprocess.check_call([sys.executable, prog, '-i', keep, dot])
+    times.append((time.time() - start) * 1000)
+times.sort()
+print(int(times[len(times) // 2]))
+EOF
+)
+st=$?
+if (( st )) ; then
+    echo "ERROR:${LINENO}: timing failed with status $st"
+    exit 1
+fi
+
+echo "INFO:${LINENO}: median startup ${Median}ms for $Runs runs, budget ${BudgetMs}ms"
+if (( Median > BudgetMs )) ; then
+    echo "ERROR:${LINENO}: startup is over budget"
+    exit 1
+fi
+echo "INFO:${LINENO}: passed"
@@ -73,6 +73,48 @@ function displayPNG() {
     esac
 }
 
+# Create a scratch repo in $Name.repo for the tests that need a live
+# repo, the commits are made by DateCommit.
+function MakeRepo() {
+    Repo=$Location/$Name.repo
+    rm -rf $Repo
+    mkdir $Repo
+    cd $Repo
+    runcmd git init -q
+    runcmd git symbolic-ref HEAD refs/heads/master
+    runcmd git config user.name tester
+    runcmd git config user.email tester@example.com
+}
+
+# Commit with fixed dates so that the commit ids are the same on every
+# run. The committer date defaults to the author date.
+function DateCommit() {
+    local Date="$1"
+    local Msg="$2"
+    local CDate="${3:-$Date}"
+    echo "$Msg" >> $Name.txt
+    git add $Name.txt
+    GIT_AUTHOR_DATE="$Date" GIT_COMMITTER_DATE="$CDate" runcmd git commit -q -m "'$Msg'"
+}
+
+# Compare the commit nodes and the edges between them in a DOT file
+# with the commits that git log reports for the rest of the arguments,
+# for example: CheckGraph $Name.dot v1.0..v2.0
+function CheckGraph() {
+    local Dot="$1"
+    shift
+    grep -o '^ *"[0-9a-f]*" \[' $Dot | tr -d ' "[' | sort > $Dot.nodes
+    grep -o '^ *"[0-9a-f]*" -> "[0-9a-f]*"' $Dot | tr -d ' "' | sort > $Dot.edges
+    git log --format='%h %p' "$@" > $Dot.log
+    cut -d' ' -f1 $Dot.log | sort > $Dot.git.nodes
+    awk 'NR == FNR { keep[$1] = 1; next } { for (i = 2; i <= NF; i++) if ($i in keep) print $i "->" $1 }' \
+        $Dot.git.nodes $Dot.log | sort > $Dot.git.edges
+    runcmd test -s $Dot.git.nodes  # an empty selection proves nothing
+    runcmd diff $Dot.git.nodes $Dot.nodes
+    runcmd diff $Dot.git.edges $Dot.edges
+    rm -f $Dot.nodes $Dot.edges $Dot.log $Dot.git.nodes $Dot.git.edges
+}
+
 function Finish() {
     # Popup the display.
     if (( $Display )) ; then
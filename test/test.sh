@@ -42,10 +42,11 @@ for t in $(ls -1 test[0-9][0-9]*.sh) ; do
         (( n++ ))
     fi
 
-    # Filter out the date info.
+    # Filter out the date info and the render strategies and times
+    # which depend on the machine.
     DiffLog=$Test.difflog
-    grep -v 'graph\[label' $Test.dot > $Test.dot.filter
-    grep -v 'graph\[label' $Test.dot.gold > $Test.dot.gold.filter
+    grep -v 'graph\[label\|^// summary:render_' $Test.dot > $Test.dot.filter
+    grep -v 'graph\[label\|^// summary:render_' $Test.dot.gold > $Test.dot.gold.filter
     diff $Test.dot.filter $Test.dot.gold.filter > $DiffLog 2>&1
     st=$?
     if (( $st )) ; then
@@ -57,7 +58,7 @@ for t in $(ls -1 test[0-9][0-9]*.sh) ; do
 
     if (( n == 2 )) ; then
         # Everything passed - clean up.
-        rm -f $Log $DiffLog $Test.dot $Test.dot.png $Test.dot.svg $Test.txt $Test.html $Test.*.filter
+        rm -f $Log $DiffLog $Test.db $Test.dot $Test.dot.png $Test.dot.svg $Test.txt $Test.html $Test.*.filter
     fi
 done
 
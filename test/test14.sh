@@ -0,0 +1,88 @@
+#!/bin/bash
+#
+# Read a live repo in date and ref shards. One commit has a committer
+# date that is older than its parent, the date shards must not lose
+# its ancestors. The kept output of the ref shards must replay to the
+# same graph as an unsharded read.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+# The shards need git so the repo is always created.
+MakeRepo
+DateCommit '2020-01-01T10:00:00+0000' 'master - first'
+DateCommit '2020-01-02T10:00:00+0000' 'master - second'
+runcmd git tag -a 'v1.0' -m "'Initial version.'"
+runcmd git checkout -q -b branchA
+DateCommit '2020-01-03T10:00:00+0000' 'branchA - first'
+DateCommit '2020-01-04T10:00:00+0000' 'branchA - second'
+runcmd git checkout -q master
+DateCommit '2020-01-05T10:00:00+0000' 'master - third'
+DateCommit '2020-01-06T10:00:00+0000' 'master - skewed' '2019-12-01T10:00:00+0000'
+DateCommit '2020-01-07T10:00:00+0000' 'master - fourth'
+DateCommit '2020-01-08T10:00:00+0000' 'master - fifth'
+runcmd git tag -a 'v2.0' -m "'Second version.'"
+runcmd git checkout -q -b branchB
+DateCommit '2020-01-09T10:00:00+0000' 'branchB - first'
+runcmd git checkout -q master
+DateCommit '2020-01-10T10:00:00+0000' 'master - sixth'
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="date and ref shards with a skewed commit date"
+runcmd $Location/../git2dot.py \
+       -v \
+       -w 19 \
+       --range "'--all --topo-order'" \
+       --shards 3 \
+       --shard-by refs \
+       -k \
+       -l "'%s|%ci'" \
+       $Location/$Name.refs.dot
+
+runcmd $Location/../git2dot.py \
+       -v \
+       -w 19 \
+       -k \
+       --range "'--all --topo-order'" \
+       --shards 3 \
+       -l "'%s|%ci'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Location/$Name.dot
+
+# The two kinds of shards must report the same graph.
+runcmd "grep -v 'graph\[label\|graph label\|^$' $Location/$Name.dot | sort > $Location/$Name.date.sort"
+runcmd "grep -v 'graph\[label\|graph label\|^$' $Location/$Name.refs.dot | sort > $Location/$Name.refs.sort"
+runcmd diff $Location/$Name.date.sort $Location/$Name.refs.sort
+
+# The kept output of the ref shards must be in topological order, the
+# stream mode depends on it. Only the order of the unrelated commits
+# can differ.
+runcmd $Location/../git2dot.py \
+       -i $Location/$Name.refs.dot.keep \
+       --stream \
+       -l "'%s|%ci'" \
+       $Location/$Name.replay.dot
+runcmd $Location/../git2dot.py \
+       --range "'--all --topo-order'" \
+       --stream \
+       -l "'%s|%ci'" \
+       $Location/$Name.plain.dot
+runcmd "sort $Location/$Name.replay.dot > $Location/$Name.replay.sort"
+runcmd "sort $Location/$Name.plain.dot > $Location/$Name.plain.sort"
+runcmd diff $Location/$Name.replay.sort $Location/$Name.plain.sort
+
+Display=0
+Finish
+cd $Location
+rm -rf $Repo $Name.refs.dot* $Name.replay.dot $Name.plain.dot $Name.*.sort
+info 'done'
@@ -0,0 +1,86 @@
+#!/bin/bash
+#
+# Read the refs directly (--read-refs) from packed and loose refs with
+# annotated and lightweight tags. The packed tags are peeled from the
+# packed-refs file or by git when the file does not have the peeled
+# lines. The notes ref is not decorated and the stash is, like git.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+# The refs are read from the repo so it is always created.
+MakeRepo
+DateCommit '2020-02-01T10:00:00+0000' 'master - first'
+runcmd git tag -a 'v1.0' -m "'Initial version.'"
+runcmd git tag 'light1'
+DateCommit '2020-02-02T10:00:00+0000' 'master - second'
+runcmd git tag -a 'v1.1' -m "'Tag of a tag.'"
+runcmd git tag -a 'v1.1-outer' -m "'Outer tag.'" v1.1
+runcmd git checkout -q -b branchA
+DateCommit '2020-02-03T10:00:00+0000' 'branchA - first'
+runcmd git tag 'light2'
+runcmd git checkout -q master
+DateCommit '2020-02-04T10:00:00+0000' 'master - third'
+runcmd env GIT_AUTHOR_DATE=2020-02-05T10:00:00+0000 GIT_COMMITTER_DATE=2020-02-05T10:00:00+0000 \
+       git notes add -m "'A note.'"
+
+# Pack the refs and the objects, then add loose refs.
+runcmd git pack-refs --all
+runcmd git repack -q -a -d
+runcmd git prune-packed
+runcmd git tag -a 'v2.0' -m "'Loose tag.'"
+runcmd git tag 'light3' branchA
+echo 'stashed' >> $Name.txt
+runcmd env GIT_AUTHOR_DATE=2020-02-06T10:00:00+0000 GIT_COMMITTER_DATE=2020-02-06T10:00:00+0000 \
+       git stash -q
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="read the refs directly"
+runcmd $Location/../git2dot.py \
+       -v \
+       -k \
+       --read-refs \
+       --range=--all \
+       -l "'%s|%ci'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Location/$Name.dot
+
+# Drop the peeled lines so that git has to peel the packed tags, the
+# graph must not change.
+runcmd "grep -v '^[#^]' .git/packed-refs > packed-refs.tmp"
+runcmd mv packed-refs.tmp .git/packed-refs
+runcmd $Location/../git2dot.py \
+       -v \
+       --read-refs \
+       --range=--all \
+       -l "'%s|%ci'" \
+       $Location/$Name.peel.dot
+
+# Both must agree with the decorations from git.
+runcmd $Location/../git2dot.py \
+       -v \
+       --range=--all \
+       -l "'%s|%ci'" \
+       $Location/$Name.git.dot
+
+runcmd "grep -v 'graph\[label\|graph label\|^$' $Location/$Name.dot > $Location/$Name.refs.filter"
+runcmd "grep -v 'graph\[label\|graph label\|^$' $Location/$Name.peel.dot > $Location/$Name.peel.filter"
+runcmd "grep -v 'graph\[label\|graph label\|^$' $Location/$Name.git.dot > $Location/$Name.git.filter"
+runcmd diff $Location/$Name.refs.filter $Location/$Name.peel.filter
+runcmd diff $Location/$Name.refs.filter $Location/$Name.git.filter
+
+Display=0
+Finish
+cd $Location
+rm -rf $Repo $Name.peel.dot $Name.git.dot $Name.*.filter
+info 'done'
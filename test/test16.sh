@@ -0,0 +1,71 @@
+#!/bin/bash
+#
+# Select the commits between two tags. The side branch was forked
+# before the first tag and merged before the second one so it must
+# be included, the history before the first tag must not.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+if (( Keep )) ; then
+    runcmd git init
+    runcmd git symbolic-ref HEAD refs/heads/master
+
+    echo 'A' >$Name.txt
+    runcmd git add $Name.txt
+    runcmd git commit -m "'master - first'"
+
+    echo 'B' >>$Name.txt
+    runcmd git add $Name.txt
+    runcmd git commit -m "'master - second'"
+
+    runcmd git checkout -b side
+    echo 'S1' >$Name.side.txt
+    runcmd git add $Name.side.txt
+    runcmd git commit -m "'side - first'"
+
+    echo 'S2' >>$Name.side.txt
+    runcmd git add $Name.side.txt
+    runcmd git commit -m "'side - second'"
+
+    runcmd git checkout master
+    echo 'C' >>$Name.txt
+    runcmd git add $Name.txt
+    runcmd git commit -m "'master - third'"
+    runcmd git tag -a 'v1.0' -m "'First version.'"
+
+    echo 'D' >>$Name.txt
+    runcmd git add $Name.txt
+    runcmd git commit -m "'master - fourth'"
+
+    runcmd git merge --no-ff -m "'merge side'" side
+    runcmd git tag -a 'v2.0' -m "'Second version.'"
+
+    echo 'E' >>$Name.txt
+    runcmd git add $Name.txt
+    runcmd git commit -m "'master - fifth'"
+fi
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="commits between two tags"
+runcmd ../git2dot.py \
+       $KeepOpt \
+       -v \
+       -v \
+       --between v1.0 v2.0 \
+       -l "'%s'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Name.dot
+
+Finish
+info 'done'
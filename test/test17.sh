@@ -0,0 +1,63 @@
+#!/bin/bash
+#
+# Roll up the commits by week. A branch is forked and merged back in
+# the same week so the rollup must split the main lane's bucket to
+# keep the graph acyclic.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+if (( Keep )) ; then
+    runcmd git init
+    runcmd git symbolic-ref HEAD refs/heads/master
+
+    DateCommit '2020-03-02T10:00:00+0000' 'master - first'
+    DateCommit '2020-03-03T10:00:00+0000' 'master - second'
+    runcmd git tag -a 'v1.0' -m "'First version.'"
+
+    DateCommit '2020-03-09T10:00:00+0000' 'master - third'
+    runcmd git checkout -b side
+    DateCommit '2020-03-10T10:00:00+0000' 'side - first'
+    DateCommit '2020-03-11T10:00:00+0000' 'side - second'
+    runcmd git checkout master
+    GIT_AUTHOR_DATE='2020-03-12T10:00:00+0000' GIT_COMMITTER_DATE='2020-03-12T10:00:00+0000' \
+        runcmd git merge --no-ff -m "'merge side'" side
+
+    DateCommit '2020-03-16T10:00:00+0000' 'master - fifth'
+    DateCommit '2020-03-17T10:00:00+0000' 'master - sixth'
+    DateCommit '2020-03-23T10:00:00+0000' 'master - seventh'
+fi
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="weekly rollup with a branch forked and merged in one week"
+runcmd ../git2dot.py \
+       $KeepOpt \
+       -v \
+       -v \
+       --rollup week \
+       --rollup-recent 1 \
+       -l "'%s|%ci'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Name.dot
+
+# The rolled up graph must not have cycles.
+runcmd ../git2dot.py \
+       -i $Name.dot.keep \
+       --rollup week \
+       --rollup-recent 1 \
+       --stats \
+       $Name.stats.dot '|' grep -q "'^// stats:longest_path [1-9]'"
+
+Finish
+rm -f $Name.stats.dot
+info 'done'
@@ -0,0 +1,77 @@
+#!/bin/bash
+#
+# Skip unchanged runs (--skip-unchanged). A run where dot fails must
+# not record the fingerprint so the next run renders again.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+if (( Keep )) ; then
+    runcmd git init
+    runcmd git symbolic-ref HEAD refs/heads/master
+    DateCommit '2020-04-01T10:00:00+0000' 'master - first'
+    DateCommit '2020-04-02T10:00:00+0000' 'master - second'
+    runcmd git tag -a 'v1.0' -m "'First version.'"
+    DateCommit '2020-04-03T10:00:00+0000' 'master - third'
+fi
+
+# A dot that creates the -O output or fails if DOT_FAIL is set.
+Bin=$Location/$Name.bin
+rm -rf $Bin
+mkdir $Bin
+cat > $Bin/dot <<'EOT'
+#!/bin/bash
+if [[ "$DOT_FAIL" == "1" ]] ; then
+    echo "dot failed"
+    exit 1
+fi
+for Arg in "$@" ; do
+    case "$Arg" in
+        -T*) Fmt=${Arg#-T} ;;
+        -*) ;;
+        *) Path="$Arg" ;;
+    esac
+done
+touch "$Path.$Fmt"
+EOT
+chmod a+x $Bin/dot
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="skip unchanged runs"
+runcmd ../git2dot.py \
+       $KeepOpt \
+       -v \
+       -v \
+       -l "'%s|%ci'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Name.dot
+
+# The render fails so the fingerprint must not be written.
+Skip="-i $Name.dot.keep -v --skip-unchanged --png $Name.skip.dot"
+rm -f $Name.skip.dot*
+runcmd touch $Name.skip.dot.png
+runcmdst 1 1 env DOT_FAIL=1 PATH=$Bin:$PATH ../git2dot.py $Skip
+runcmdst 1 1 grep -q "'^// summary:fingerprint'" $Name.skip.dot
+
+# The next run must render again and write the fingerprint.
+runcmd "env PATH=$Bin:$PATH ../git2dot.py $Skip > $Name.skip.log"
+runcmdst 1 1 grep -q "'nothing changed'" $Name.skip.log
+runcmd grep -q "'^// summary:fingerprint'" $Name.skip.dot
+
+# Now nothing changed.
+runcmd "env PATH=$Bin:$PATH ../git2dot.py $Skip > $Name.skip.log"
+runcmd grep -q "'nothing changed'" $Name.skip.log
+
+Finish
+rm -rf $Bin $Name.skip.*
+info 'done'
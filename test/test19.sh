@@ -0,0 +1,58 @@
+#!/bin/bash
+#
+# Merge two snapshots of a repo (-i with a glob). The newer snapshot
+# moved a branch and deleted another one, the deleted branch and its
+# commit are kept from the older snapshot.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+if (( Keep )) ; then
+    runcmd git init
+    runcmd git symbolic-ref HEAD refs/heads/master
+    DateCommit '2020-05-01T10:00:00+0000' 'master - first'
+    DateCommit '2020-05-02T10:00:00+0000' 'master - second'
+    runcmd git tag -a 'v1.0' -m "'First version.'"
+    runcmd git checkout -b gone
+    DateCommit '2020-05-03T10:00:00+0000' 'gone - first'
+    runcmd git checkout master
+    runcmd git checkout -b feature
+    DateCommit '2020-05-04T10:00:00+0000' 'feature - first'
+    runcmd git checkout master
+
+    # The older snapshot.
+    runcmd ../git2dot.py --range=--all -k -l "'%s|%ci'" $Name.old.dot
+
+    runcmd git branch -D gone
+    runcmd git checkout feature
+    DateCommit '2020-05-05T10:00:00+0000' 'feature - second'
+    runcmd git checkout master
+    DateCommit '2020-05-06T10:00:00+0000' 'master - third'
+
+    # The newer snapshot.
+    runcmd ../git2dot.py --range=--all -k -l "'%s|%ci'" $Name.dot
+    rm -f $Name.old.dot
+fi
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="merge two snapshots"
+runcmd ../git2dot.py \
+       -i "'$Name*.keep'" \
+       -v \
+       -v \
+       -l "'%s|%ci'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Name.dot
+
+Finish
+info 'done'
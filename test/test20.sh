@@ -0,0 +1,43 @@
+#!/bin/bash
+#
+# Choose a tag without the "tag: " prefix with the sqlite store
+# (--store) and in memory, both must produce the same graph. The
+# commits are read from the test11 keep file.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+Keep=0  # the commits are always read from test11
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="choose refs with and without the sqlite store"
+runcmd ../git2dot.py \
+       -i test11.dot.keep \
+       -v \
+       --choose-tag v1.0a \
+       -l "'%s|%ci'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Name.dot
+
+runcmd ../git2dot.py \
+       -i test11.dot.keep \
+       -v \
+       --choose-tag v1.0a \
+       -l "'%s|%ci'" \
+       --store $Name.db \
+       $Name.store.dot
+
+runcmd "grep -v 'graph\[label\|graph label\|^$' $Name.dot > $Name.mem.filter"
+runcmd "grep -v 'graph\[label\|graph label\|^$' $Name.store.dot > $Name.store.filter"
+runcmd diff $Name.mem.filter $Name.store.filter
+
+Display=0
+Finish
+rm -f $Name.store.dot $Name.*.filter
+info 'done'
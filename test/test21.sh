@@ -0,0 +1,66 @@
+#!/bin/bash
+#
+# Check the git command that is generated for the default --gitcmd
+# (-v reports it). The commit body is only requested for -D and -k,
+# the decoration is replaced by the commit id for --read-refs.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+set -o pipefail  # fail when git2dot.py fails in front of grep
+
+# ================================================================
+# Create the repo.
+# ================================================================
+# The command is only generated when git is run.
+MakeRepo
+DateCommit '2020-03-01T10:00:00+0000' 'master - first'
+DateCommit '2020-03-02T10:00:00+0000' 'master - second'
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="generated git command"
+runcmd $Location/../git2dot.py \
+       -v \
+       -k \
+       -l "'%s|%ci'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Location/$Name.dot \
+       "| grep 'running command' > $Location/$Name.cmds"
+runcmd $Location/../git2dot.py \
+       -v \
+       -l "'%s'" \
+       $Location/$Name.plain.dot \
+       "| grep 'running command' >> $Location/$Name.cmds"
+runcmd $Location/../git2dot.py \
+       -v \
+       -D @V@ "'Version: (.+)'" \
+       -l "'%s|@V@'" \
+       $Location/$Name.vars.dot \
+       "| grep 'running command' >> $Location/$Name.cmds"
+runcmd $Location/../git2dot.py \
+       -v \
+       --read-refs \
+       --since 2020-03-02T00:00:00 \
+       $Location/$Name.refs.dot \
+       "| grep 'running command' >> $Location/$Name.cmds"
+
+runcmd "sed -e 's/^.*running command: //' $Location/$Name.cmds > $Location/$Name.cmds.filter"
+cat > $Location/$Name.cmds.expected <<'EOT'
+git log --format="|Record:|%h|%p|%d|%ci%n%b%n@@@git2dot-label@@@:|%s|%ci" --all --topo-order
+git log --format="|Record:|%h|%p|%d|%ci%n@@@git2dot-label@@@:|%s" --all --topo-order
+git log --format="|Record:|%h|%p|%d|%ci%n%b%n@@@git2dot-label@@@:|%s|@V@" --all --topo-order
+git log --format="|Record:|%h|%p|%H|%ci%n@@@git2dot-label@@@:|%h" --since="2020-03-02T00:00:00" --all --topo-order
+EOT
+runcmd diff $Location/$Name.cmds.expected $Location/$Name.cmds.filter
+
+Display=0
+Finish
+cd $Location
+rm -rf $Repo $Name.plain.dot $Name.vars.dot $Name.refs.dot $Name.cmds*
+info 'done'
@@ -0,0 +1,69 @@
+#!/bin/bash
+#
+# Read the commits from a chain of split commit-graph files
+# (--commit-graph) with an octopus merge and with commits that are not
+# in the graph yet. The graph must be the same as the one from git log.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+# The commit-graph files are read from the repo so it is always created.
+MakeRepo
+DateCommit '2020-04-01T10:00:00+0000' 'master - first'
+runcmd git tag -a 'v1.0' -m "'First version.'"
+for Branch in octA octB octC ; do
+    runcmd git checkout -q -b $Branch master
+    echo "$Branch" > $Name.$Branch.txt
+    runcmd git add $Name.$Branch.txt
+    GIT_AUTHOR_DATE='2020-04-02T10:00:00+0000' GIT_COMMITTER_DATE='2020-04-02T10:00:00+0000' \
+                   runcmd git commit -q -m "'$Branch - first'"
+done
+runcmd git checkout -q master
+GIT_AUTHOR_DATE='2020-04-03T10:00:00+0000' GIT_COMMITTER_DATE='2020-04-03T10:00:00+0000' \
+               runcmd git merge -q --no-ff -m "'octopus'" octA octB octC
+runcmd git commit-graph write --reachable --split
+
+DateCommit '2020-04-04T10:00:00+0000' 'master - third'
+runcmd git checkout -q -b side
+DateCommit '2020-04-05T10:00:00+0000' 'side - first'
+runcmd git commit-graph write --reachable --split=no-merge
+runcmd test $(wc -l < .git/objects/info/commit-graphs/commit-graph-chain) -eq 2
+
+# Not in the commit-graph.
+runcmd git checkout -q master
+DateCommit '2020-04-06T10:00:00+0000' 'master - fourth'
+runcmd git tag 'light'
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="read a split commit-graph"
+runcmd $Location/../git2dot.py \
+       -v \
+       --commit-graph \
+       -l "'%h'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Location/$Name.dot
+
+runcmd $Location/../git2dot.py \
+       -v \
+       -l "'%h'" \
+       $Location/$Name.git.dot
+
+runcmd "grep -v 'graph\[label\|graph label\|^$' $Location/$Name.dot > $Location/$Name.graph.filter"
+runcmd "grep -v 'graph\[label\|graph label\|^$' $Location/$Name.git.dot > $Location/$Name.git.filter"
+runcmd diff $Location/$Name.graph.filter $Location/$Name.git.filter
+
+Display=0
+Finish
+cd $Location
+rm -rf $Repo $Name.git.dot $Name.*.filter
+info 'done'
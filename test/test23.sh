@@ -0,0 +1,76 @@
+#!/bin/bash
+#
+# Re-use the cached layout (--layout-cache) when only the colors or the
+# labels change, a change to an attribute that changes the layout
+# (-d ranksep) must create a new one. The commits are read from the
+# test11 keep file.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+Keep=0  # the commits are always read from test11
+
+# A dot that creates the -o or -O output.
+Bin=$Location/$Name.bin
+rm -rf $Bin
+mkdir $Bin
+cat > $Bin/dot <<'EOT'
+#!/bin/bash
+Out=
+while (( $# > 0 )) ; do
+    case "$1" in
+        -o) Out="$2" ; shift ;;
+        -T*) Fmt=${1#-T} ;;
+        -*) ;;
+        *) Path="$1" ;;
+    esac
+    shift
+done
+touch "${Out:-$Path.$Fmt}"
+EOT
+chmod a+x $Bin/dot
+Cache=$Location/$Name.cache
+rm -rf $Cache
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="layout cache keys"
+runcmd env PATH=$Bin:$PATH ../git2dot.py \
+       -i test11.dot.keep \
+       -v \
+       -l "'%s|%ci'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       --layout-cache $Cache \
+       --png \
+       $Name.dot
+runcmd test $(ls $Cache | wc -l) -eq 1
+
+# Other labels and colors re-use the layout.
+runcmd env PATH=$Bin:$PATH ../git2dot.py \
+       -i test11.dot.keep \
+       -l "'%s'" \
+       --cnode "'[label=\"{label}\", color=\"green\"]'" \
+       --layout-cache $Cache \
+       --png \
+       $Name.cache.dot
+runcmd test $(ls $Cache | wc -l) -eq 1
+
+# The rank separation changes the layout.
+runcmd env PATH=$Bin:$PATH ../git2dot.py \
+       -i test11.dot.keep \
+       -l "'%s|%ci'" \
+       -d "'ranksep=\"1.5\"'" \
+       --layout-cache $Cache \
+       --png \
+       $Name.cache.dot
+runcmd test $(ls $Cache | wc -l) -eq 2
+
+Display=0
+Finish
+rm -rf $Bin $Cache $Name.cache.dot* $Name.dot.png
+info 'done'
@@ -0,0 +1,59 @@
+#!/bin/bash
+#
+# Keep the git output compressed (--keep-compress) and read it back
+# (-i), the compression is detected from the magic number. Every
+# round-trip must produce the same graph as the uncompressed keep
+# file. The commits are read from the test11 keep file.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+Keep=0  # the commits are always read from test11
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="compressed keep files"
+runcmd ../git2dot.py \
+       -i test11.dot.keep \
+       -v \
+       -l "'%s|%ci'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Name.dot
+runcmd "grep -v 'graph\[label\|graph label\|^$' $Name.dot > $Name.plain.filter"
+
+for Ext in gz bz2 xz ; do
+    case $Ext in
+        gz) Module=gzip ;;
+        bz2) Module=bz2 ;;
+        xz) Module=lzma ;;
+    esac
+
+    # Write the compressed keep file and check that it is compressed.
+    runcmd ../git2dot.py \
+           -i test11.dot.keep \
+           -k \
+           --keep-compress $Ext \
+           -l "'%s|%ci'" \
+           $Name.$Ext.dot
+    runcmd test -f $Name.$Ext.dot.keep.$Ext
+    runcmdst 1 1 grep -q "'|Record:|'" $Name.$Ext.dot.keep.$Ext
+    runcmd cmp test11.dot.keep "<(python3 -c \"import sys, $Module; sys.stdout.buffer.write($Module.open(sys.argv[1]).read())\" $Name.$Ext.dot.keep.$Ext)"
+
+    # Read it back.
+    runcmd ../git2dot.py \
+           -i $Name.$Ext.dot.keep.$Ext \
+           -l "'%s|%ci'" \
+           $Name.$Ext.read.dot
+    runcmd "grep -v 'graph\[label\|graph label\|^$' $Name.$Ext.read.dot > $Name.$Ext.filter"
+    runcmd diff $Name.plain.filter $Name.$Ext.filter
+done
+
+Display=0
+Finish
+rm -f $Name.gz.* $Name.bz2.* $Name.xz.* $Name.*.filter
+info 'done'
@@ -0,0 +1,66 @@
+#!/bin/bash
+#
+# Export the squashed graph to JSON Lines (--jsonl) and GraphML
+# (--graphml). The exports are compared to the gold files and their
+# nodes and edges must be the commit nodes and edges of the DOT file.
+# The commits are read from the test11 keep file.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+Keep=0  # the commits are always read from test11
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="JSON Lines and GraphML export"
+runcmd ../git2dot.py \
+       -i test11.dot.keep \
+       -v \
+       -s \
+       -D '@CHID@' "'Change-Id: I([a-z0-9]+)'" \
+       -l "'%s|%ci|@CHID@'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       --jsonl $Name.jsonl \
+       --graphml $Name.graphml \
+       $Name.dot
+
+runcmd diff $Name.jsonl.gold $Name.jsonl
+runcmd diff $Name.graphml.gold $Name.graphml
+
+# The same nodes and edges in all three files.
+cat > $Name.check.py <<'EOT'
+import json
+import re
+import sys
+import xml.etree.ElementTree as ET
+
+name = sys.argv[1]
+recs = [json.loads(line) for line in open(name + '.jsonl')]
+jnodes = set(r['id'] for r in recs if r['type'] == 'node')
+jedges = sorted((r['source'], r['target']) for r in recs if r['type'] == 'edge')
+
+ns = '{http://graphml.graphdrawing.org/xmlns}'
+root = ET.parse(name + '.graphml').getroot()
+gnodes = set(n.get('id') for n in root.iter(ns + 'node'))
+gedges = sorted((e.get('source'), e.get('target')) for e in root.iter(ns + 'edge'))
+
+dot = open(name + '.dot').read()
+dnodes = set(re.findall(r'(?m)^\s*"(\w+)" \[label=', dot))
+dedges = sorted(re.findall(r'(?m)^\s*"(\w+)" -> "(\w+)"', dot))
+
+assert jnodes == gnodes == dnodes, (jnodes, gnodes, dnodes)
+assert jedges == gedges == dedges, (jedges, gedges, dedges)
+assert any(r.get('class') == 'snode' and (r['chain_size'] or 0) > 1 for r in recs), 'no squashed node'
+print('{} nodes and {} edges'.format(len(jnodes), len(jedges)))
+EOT
+runcmd python3 $Name.check.py $Name
+
+Display=0
+Finish
+rm -f $Name.jsonl $Name.graphml $Name.check.py
+info 'done'
@@ -0,0 +1,70 @@
+#!/bin/bash
+#
+# Show the differences from an old snapshot (--diff) after a rebase:
+# the rebased commits are rewritten, the commits of a deleted branch
+# are removed and a new commit is added.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+# The snapshots are taken from the repo so it is always created.
+MakeRepo
+DateCommit '2020-05-01T10:00:00+0000' 'master - first'
+DateCommit '2020-05-02T10:00:00+0000' 'master - second'
+runcmd git checkout -q -b feature
+echo 'feature' > $Name.feature.txt
+runcmd git add $Name.feature.txt
+GIT_AUTHOR_DATE='2020-05-03T10:00:00+0000' GIT_COMMITTER_DATE='2020-05-03T10:00:00+0000' \
+               runcmd git commit -q -m "'feature - first'"
+runcmd git checkout -q -b gone master
+echo 'gone' > $Name.gone.txt
+runcmd git add $Name.gone.txt
+GIT_AUTHOR_DATE='2020-05-04T10:00:00+0000' GIT_COMMITTER_DATE='2020-05-04T10:00:00+0000' \
+               runcmd git commit -q -m "'gone - first'"
+runcmd git checkout -q master
+DateCommit '2020-05-05T10:00:00+0000' 'master - third'
+
+# The old snapshot.
+runcmd $Location/../git2dot.py \
+       -k \
+       -l "'%s|%an|%ad'" \
+       $Location/$Name.old.dot
+
+# Rebase the feature, delete the gone branch and add a commit.
+runcmd env GIT_COMMITTER_DATE=2020-05-06T10:00:00+0000 git rebase -q master feature
+runcmd git checkout -q master
+runcmd git branch -q -D gone
+DateCommit '2020-05-07T10:00:00+0000' 'master - fourth'
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="diff after a rebase"
+runcmd $Location/../git2dot.py \
+       -v \
+       -k \
+       --diff $Location/$Name.old.dot.keep \
+       -l "'%s|%an|%ad'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Location/$Name.dot
+
+# One commit of each kind.
+runcmd grep -q "'label=\"feature - first.*color=\"gold\"'" $Location/$Name.dot
+runcmd grep -q "'label=\"gone - first.*color=\"lightgray\"'" $Location/$Name.dot
+runcmd grep -q "'label=\"master - fourth.*color=\"palegreen\"'" $Location/$Name.dot
+Changed=$(grep -c 'color="gold"\|color="lightgray"\|color="palegreen"' $Location/$Name.dot)
+runcmd test $Changed -eq 3
+
+Display=0
+Finish
+cd $Location
+rm -rf $Repo $Name.old.dot*
+info 'done'
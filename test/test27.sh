@@ -0,0 +1,98 @@
+#!/bin/bash
+#
+# Strip and compress the SVG file (--svg-strip, --svg-compress) and
+# load it lazily in the HTML page (--html-lazy). A fake dot writes an
+# SVG file like the ones that Graphviz writes. The commits are read
+# from the test11 keep file.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+Keep=0  # the commits are always read from test11
+
+# A dot that writes a small Graphviz style SVG file.
+Bin=$Location/$Name.bin
+rm -rf $Bin
+mkdir $Bin
+cat > $Bin/dot <<'EOT'
+#!/bin/bash
+for Arg in "$@" ; do
+    case "$Arg" in
+        -T*) Fmt=${Arg#-T} ;;
+        -*) ;;
+        *) Path="$Arg" ;;
+    esac
+done
+if [[ "$Fmt" != "svg" ]] ; then
+    touch "$Path.$Fmt"
+    exit 0
+fi
+cat > "$Path.svg" <<'EOS'
+<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN"
+ "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">
+<!-- Generated by graphviz -->
+<!-- Title: G Pages: 1 -->
+<svg width="62pt" height="116pt" viewBox="0.00 0.00 62.00 116.00" xmlns="http://www.w3.org/2000/svg">
+<g id="graph0" class="graph" transform="scale(1 1) rotate(0) translate(4 112)">
+<title>G</title>
+<polygon fill="white" stroke="transparent" points="-4,4 -4,-112 58,-112 58,4 -4,4"/>
+<!-- a -->
+<g id="node1" class="node">
+<title>a</title>
+<ellipse fill="bisque" stroke="black" cx="27.00" cy="-90.00" rx="27.00" ry="18.00"/>
+<text text-anchor="start" x="23.50" y="-86.30" font-family="Times,serif" font-size="14.00" fill="black">a</text>
+</g>
+</g>
+</svg>
+EOS
+EOT
+chmod a+x $Bin/dot
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="stripped and compressed SVG, lazy HTML"
+runcmd env PATH=$Bin:$PATH ../git2dot.py \
+       -i test11.dot.keep \
+       -v \
+       -l "'%s|%ci'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       --svg \
+       --svg-strip \
+       --svg-compress gz \
+       --html $Name.html \
+       --html-lazy \
+       $Name.dot
+
+# The stripped SVG.
+runcmd grep -q "'<svg '" $Name.dot.svg
+runcmd grep -q "'fill=\"bisque\"'" $Name.dot.svg
+runcmdst 1 1 grep -q "'<!--\|<!DOCTYPE\|fill=\"black\"\|stroke=\"transparent\"\|text-anchor=\"start\"\|\.00\b'" $Name.dot.svg
+runcmd test $(wc -l < $Name.dot.svg) -le 2
+
+# The compressed copy is the same as the stripped SVG.
+runcmd cmp $Name.dot.svg "<(python3 -c \"import gzip, sys; sys.stdout.buffer.write(gzip.open(sys.argv[1]).read())\" $Name.dot.svg.gz)"
+
+# The page fetches the SVG file, not the compressed copy.
+runcmd grep -q "'xhr.open(\"GET\", \"$Name.dot.svg\")'" $Name.html
+runcmdst 1 1 grep -q "'<object\|svg.gz'" $Name.html
+
+# The svgz choice.
+runcmd env PATH=$Bin:$PATH ../git2dot.py \
+       -i test11.dot.keep \
+       -l "'%s|%ci'" \
+       --svg \
+       --svg-compress svgz \
+       $Name.svgz.dot
+runcmd cmp $Name.svgz.dot.svg "<(python3 -c \"import gzip, sys; sys.stdout.buffer.write(gzip.open(sys.argv[1]).read())\" $Name.svgz.dot.svgz)"
+runcmd grep -q "'<!DOCTYPE'" $Name.svgz.dot.svg
+
+Display=0
+Finish
+rm -rf $Bin $Name.svgz.dot* $Name.dot.svg.gz
+info 'done'
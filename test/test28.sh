@@ -0,0 +1,81 @@
+#!/bin/bash
+#
+# Draw the graph on a canvas (--html-canvas). A fake dot writes the
+# plain layout, the graph data in the page must have the positions in
+# points, the colors by index and a label with "</script>" must not
+# end the script element. The commits are read from the test11 keep
+# file.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+Keep=0  # the commits are always read from test11
+
+# A dot that writes a fixed plain layout to the -o file.
+Bin=$Location/$Name.bin
+rm -rf $Bin
+mkdir $Bin
+cat > $Bin/dot <<'EOT'
+#!/bin/bash
+while (( $# > 0 )) ; do
+    case "$1" in
+        -o) Out="$2" ; shift ;;
+    esac
+    shift
+done
+cat > "$Out" <<'EOP'
+graph 1 3.5 2.25
+node "a b" 0.75 1.75 1.2 0.5 "a b\nline 2" filled ellipse black bisque
+node c 2.5 0.5 1 0.5 "</script>" filled box lightblue none
+edge "a b" c 4 0.75 1.5 1.2 1.0 2.0 0.8 2.5 0.75 solid black
+stop
+EOP
+EOT
+chmod a+x $Bin/dot
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="canvas page data"
+runcmd env PATH=$Bin:$PATH ../git2dot.py \
+       -i test11.dot.keep \
+       -v \
+       -l "'%s|%ci'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       --html-canvas $Name.html \
+       $Name.dot
+
+# The script element is only closed once.
+Closed=$(grep -c '</script>' $Name.html)
+runcmd test $Closed -eq 1
+
+cat > $Name.check.py <<'EOT'
+import json
+import sys
+
+for line in open(sys.argv[1]):
+    line = line.strip()
+    if line.startswith('var G = '):
+        graph = json.loads(line[len('var G = '):-1])
+        break
+expected = {
+    'w': 252.0,
+    'h': 162.0,
+    'colors': ['bisque', 'lightblue', 'black'],
+    'nodes': [[54.0, 36.0, 86.4, 36.0, 'a b\\nline 2', 0, 0],
+              [180.0, 126.0, 72.0, 36.0, '</script>', 1, 1]],
+    'edges': [[2, 54.0, 54.0, 86.4, 90.0, 144.0, 104.4, 180.0, 108.0]],
+}
+assert graph == expected, graph
+print('graph data ok')
+EOT
+runcmd python3 $Name.check.py $Name.html
+
+Display=0
+Finish
+rm -rf $Bin $Name.check.py
+info 'done'
@@ -0,0 +1,68 @@
+#!/bin/bash
+#
+# Generate several outputs concurrently (-j). When one render fails
+# the others must still finish and the run must fail. The commits are
+# read from the test11 keep file.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+Keep=0  # the commits are always read from test11
+
+# A dot that creates the -O output after a short delay or fails for
+# the formats in DOT_FAIL.
+Bin=$Location/$Name.bin
+rm -rf $Bin
+mkdir $Bin
+cat > $Bin/dot <<'EOT'
+#!/bin/bash
+for Arg in "$@" ; do
+    case "$Arg" in
+        -T*) Fmt=${Arg#-T} ;;
+        -*) ;;
+        *) Path="$Arg" ;;
+    esac
+done
+if [[ " $DOT_FAIL " == *" $Fmt "* ]] ; then
+    echo "dot failed for $Fmt"
+    exit 1
+fi
+sleep 1
+echo "<svg></svg>" > "$Path.$Fmt"
+EOT
+chmod a+x $Bin/dot
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="concurrent renders"
+Outputs="--png --svg --html $Name.html --jsonl $Name.jsonl --graphml $Name.graphml"
+runcmd env PATH=$Bin:$PATH ../git2dot.py \
+       -i test11.dot.keep \
+       -v \
+       -j 4 \
+       -l "'%s|%ci'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Outputs \
+       $Name.dot
+for Out in $Name.dot.png $Name.dot.svg $Name.html $Name.jsonl $Name.graphml ; do
+    runcmd test -s $Out
+done
+
+# The PNG render fails, the other outputs are still created.
+rm -f $Name.dot.png $Name.dot.svg $Name.html $Name.jsonl $Name.graphml
+runcmdst 1 1 "env DOT_FAIL=png PATH=$Bin:$PATH ../git2dot.py -i test11.dot.keep -j 2 -l '%s|%ci' $Outputs $Name.fail.dot > $Name.fail.log 2>&1"
+runcmd grep -q "'1 of the 4 render tasks failed: png'" $Name.fail.log
+runcmd test ! -e $Name.fail.dot.png
+for Out in $Name.fail.dot.svg $Name.html $Name.jsonl $Name.graphml ; do
+    runcmd test -s $Out
+done
+
+Display=0
+Finish
+rm -rf $Bin $Name.fail.* $Name.jsonl $Name.graphml
+info 'done'
@@ -0,0 +1,73 @@
+#!/bin/bash
+#
+# Choose the render strategy from the graph size (--render-policy auto,
+# --render-sizes) or explicitly, and retry with the next strategy when
+# a render times out (--render-timeout). The strategies are reported in
+# the summary data of the DOT file. The commits are read from the
+# test11 keep file.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+Keep=0  # the commits are always read from test11
+
+# A dot that creates the -O output. It hangs unless one of its
+# arguments is DOT_SLOW_UNLESS, when that is set.
+Bin=$Location/$Name.bin
+rm -rf $Bin
+mkdir $Bin
+cat > $Bin/dot <<'EOT'
+#!/bin/bash
+if [[ -n "$DOT_SLOW_UNLESS" && " $* " != *" $DOT_SLOW_UNLESS "* ]] ; then
+    sleep 30
+fi
+for Arg in "$@" ; do
+    case "$Arg" in
+        -T*) Fmt=${Arg#-T} ;;
+        -*) ;;
+        *) Path="$Arg" ;;
+    esac
+done
+touch "$Path.$Fmt"
+EOT
+chmod a+x $Bin/dot
+Run="env PATH=$Bin:$PATH ../git2dot.py -i test11.dot.keep -l '%s|%ci' --png"
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="render strategy selection"
+runcmd $Run \
+       -v \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Name.dot
+runcmd grep -q "'^// summary:render_png_strategy dot$'" $Name.dot
+
+# The graph has more than 10 and less than 100 nodes plus edges.
+runcmd $Run --render-sizes 10 100 1000 $Name.auto.dot
+runcmd grep -q "'^// summary:render_png_strategy tuned$'" $Name.auto.dot
+runcmd $Run --render-sizes 1 2 3 $Name.auto.dot
+runcmd grep -q "'^// summary:render_png_strategy sfdp$'" $Name.auto.dot
+
+# An explicit policy.
+runcmd $Run --render-policy fast $Name.policy.dot
+runcmd grep -q "'^// summary:render_png_strategy fast$'" $Name.policy.dot
+
+# The dot and tuned renders time out, fast does not.
+runcmd "env DOT_SLOW_UNLESS=-Gremincross=false $Run --render-timeout 1 $Name.timeout.dot > $Name.timeout.log 2>&1"
+runcmd grep -q "'^// summary:render_png_strategy fast$'" $Name.timeout.dot
+runcmd grep -q "'render timed out after 1 seconds, trying the tuned strategy'" $Name.timeout.log
+runcmd grep -q "'render timed out after 1 seconds, trying the fast strategy'" $Name.timeout.log
+
+# All of them time out.
+runcmdst 1 1 "env DOT_SLOW_UNLESS=-Gnone $Run --render-policy fast --render-timeout 1 $Name.timeout.dot > $Name.timeout.log 2>&1"
+runcmd grep -q "'render timed out for all strategies: fast, sfdp'" $Name.timeout.log
+
+Display=0
+Finish
+rm -rf $Bin $Name.auto.dot* $Name.policy.dot* $Name.timeout.*
+info 'done'
@@ -0,0 +1,82 @@
+#!/bin/bash
+#
+# Only graph the commits that change a path (--path). The commits that
+# change other paths are left out and the parents are rewritten, the
+# nodes and edges must be the ones that git log --parents reports for
+# the path.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+# The commits are read from the repo so it is always created.
+MakeRepo
+function PathCommit() {
+    local Path="$1"
+    local Date="$2"
+    local Msg="$3"
+    mkdir -p $(dirname $Path)
+    echo "$Msg" >> $Path
+    git add $Path
+    GIT_AUTHOR_DATE="$Date" GIT_COMMITTER_DATE="$Date" runcmd git commit -q -m "'$Msg'"
+}
+PathCommit a/file '2020-06-01T10:00:00+0000' 'a - first'
+PathCommit b/file '2020-06-02T10:00:00+0000' 'b - first'
+runcmd git checkout -q -b side
+PathCommit b/side '2020-06-03T10:00:00+0000' 'side b - second'
+PathCommit a/other '2020-06-04T10:00:00+0000' 'side a - second'
+PathCommit b/side '2020-06-05T10:00:00+0000' 'side b - third'
+runcmd git checkout -q master
+PathCommit a/file '2020-06-06T10:00:00+0000' 'a - third'
+PathCommit b/file '2020-06-07T10:00:00+0000' 'b - fourth'
+GIT_AUTHOR_DATE='2020-06-08T10:00:00+0000' GIT_COMMITTER_DATE='2020-06-08T10:00:00+0000' \
+               runcmd git merge -q --no-ff -m "'merge side'" side
+PathCommit b/file '2020-06-09T10:00:00+0000' 'b - fifth'
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="commits that change a path"
+runcmd $Location/../git2dot.py \
+       -v \
+       -k \
+       --path a \
+       -l "'%s'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Location/$Name.dot
+
+# The same nodes and edges as git.
+runcmd "git log --all --parents --format='%h %p' -- a > $Location/$Name.git.txt"
+cat > $Location/$Name.check.py <<'EOT'
+import re
+import sys
+
+nodes = set()
+edges = set()
+for line in open(sys.argv[1]):
+    flds = line.split()
+    nodes.add(flds[0])
+    edges.update((p, flds[0]) for p in flds[1:])
+dot = open(sys.argv[2]).read()
+dnodes = set(re.findall(r'(?m)^\s*"(\w+)" \[label=', dot))
+dedges = set(re.findall(r'(?m)^\s*"(\w+)" -> "(\w+)"', dot))
+assert nodes == dnodes, (nodes, dnodes)
+assert edges == dedges, (edges, dedges)
+print('{} nodes and {} edges'.format(len(nodes), len(edges)))
+EOT
+runcmd python3 $Location/$Name.check.py $Location/$Name.git.txt $Location/$Name.dot
+runcmdst 1 1 grep -q "'b - '" $Location/$Name.dot
+runcmd grep -q "'merge side'" $Location/$Name.dot
+
+Display=0
+Finish
+cd $Location
+rm -rf $Repo $Name.git.txt $Name.check.py
+info 'done'
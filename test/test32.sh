@@ -0,0 +1,85 @@
+#!/bin/bash
+#
+# Report the graph statistics without writing the DOT file (--stats).
+# The node, edge and byte counts must match the DOT file that a normal
+# run writes and the render estimate must fit the render log. The
+# commits are read from the test11 keep file.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+Keep=0  # the commits are always read from test11
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="graph statistics"
+Label="graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]"
+runcmd ../git2dot.py \
+       -i test11.dot.keep \
+       -v \
+       -s \
+       -l "'%s|%ci'" \
+       -L "'$Label'" \
+       $Name.dot
+
+# The render log has two dot renders where the time is the size in
+# seconds and a tuned render that must not be used.
+cat > $Name.render.log <<'EOT'
+{"edges": 4, "nodes": 6, "output": "png", "seconds": 10.0, "strategy": "dot"}
+{"edges": 40, "nodes": 60, "output": "png", "seconds": 100.0, "strategy": "dot"}
+{"edges": 40, "nodes": 60, "output": "png", "seconds": 1.0, "strategy": "tuned"}
+EOT
+runcmd ../git2dot.py \
+       -i test11.dot.keep \
+       -s \
+       -l "'%s|%ci'" \
+       -L "'$Label'" \
+       --render-log $Name.render.log \
+       --stats \
+       $Name.stats.dot \
+       "> $Name.stats.txt"
+runcmd test ! -e $Name.stats.dot
+
+cat > $Name.check.py <<'EOT'
+import os
+import re
+import sys
+
+name = sys.argv[1]
+stats = {}
+for line in open(name + '.stats.txt'):
+    m = re.match(r'// stats:(\w+) (.*)', line)
+    if m:
+        stats[m.group(1)] = m.group(2)
+
+text = open(name + '.dot').read()
+nodes = len(re.findall(r'(?m)^\s*"[^"]*" \[', text))
+edges = sum(line.count('->') for line in text.split('\n'))
+summary = dict(re.findall(r'(?m)^// summary:(\w+) (.*)$', text))
+expected = {
+    'dot_bytes': str(os.path.getsize(name + '.dot')),
+    'dot_nodes': str(nodes),
+    'dot_edges': str(edges),
+    'num_commits': summary['total_commits'],
+    'num_cnodes': summary['num_graph_commit_nodes'],
+    'num_mnodes': summary['num_graph_merge_nodes'],
+    'num_snodes': summary['num_graph_squash_nodes'],
+    'render_strategy': 'dot',
+    'render_estimate_samples': '2',
+    'render_estimate_seconds': '{:.3f}'.format(nodes + edges),
+}
+for k, v in sorted(expected.items()):
+    assert stats.get(k) == v, (k, stats.get(k), v)
+print('{} stats ok'.format(len(expected)))
+EOT
+runcmd python3 $Name.check.py $Name
+
+Display=0
+Finish
+rm -f $Name.render.log $Name.stats.* $Name.check.py
+info 'done'
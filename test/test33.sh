@@ -0,0 +1,78 @@
+#!/bin/bash
+#
+# Select the commits by ancestry (--ancestors-of, --descendants-of and
+# --between). Each selection must have the same commits and edges as
+# the equivalent git log range. The side branch is forked before v1.0
+# and merged before v2.0, the feature branch is forked after v1.0 and
+# is not merged.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+# The selections are compared with git so the repo is always created.
+MakeRepo
+DateCommit '2020-07-01T10:00:00+0000' 'master - first'
+DateCommit '2020-07-02T10:00:00+0000' 'master - second'
+runcmd git checkout -q -b side
+echo 'side' > $Name.side.txt
+runcmd git add $Name.side.txt
+GIT_AUTHOR_DATE='2020-07-03T10:00:00+0000' GIT_COMMITTER_DATE='2020-07-03T10:00:00+0000' \
+               runcmd git commit -q -m "'side - first'"
+runcmd git checkout -q master
+DateCommit '2020-07-04T10:00:00+0000' 'master - third'
+runcmd git tag -a 'v1.0' -m "'First version.'"
+runcmd git checkout -q -b feature
+echo 'feature' > $Name.feature.txt
+runcmd git add $Name.feature.txt
+GIT_AUTHOR_DATE='2020-07-05T10:00:00+0000' GIT_COMMITTER_DATE='2020-07-05T10:00:00+0000' \
+               runcmd git commit -q -m "'feature - first'"
+runcmd git checkout -q master
+DateCommit '2020-07-06T10:00:00+0000' 'master - fourth'
+GIT_AUTHOR_DATE='2020-07-07T10:00:00+0000' GIT_COMMITTER_DATE='2020-07-07T10:00:00+0000' \
+               runcmd git merge -q --no-ff -m "'merge side'" side
+runcmd git tag -a 'v2.0' -m "'Second version.'"
+DateCommit '2020-07-08T10:00:00+0000' 'master - fifth'
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="ancestry selections"
+runcmd $Location/../git2dot.py \
+       -v \
+       -k \
+       --between v1.0 v2.0 \
+       -l "'%s'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Location/$Name.dot
+CheckGraph $Location/$Name.dot v1.0..v2.0
+
+Run="$Location/../git2dot.py -i $Location/$Name.dot.keep -l '%s'"
+runcmd $Run --ancestors-of v1.0 $Location/$Name.sel.dot
+CheckGraph $Location/$Name.sel.dot v1.0
+
+runcmd $Run --ancestors-of feature --ancestors-of side $Location/$Name.sel.dot
+CheckGraph $Location/$Name.sel.dot feature side
+
+# The descendants of v1.0 and v1.0 itself.
+runcmd $Run --descendants-of v1.0 $Location/$Name.sel.dot
+CheckGraph $Location/$Name.sel.dot --all --ancestry-path=v1.0 ^v1.0^@
+
+runcmd $Run --between v1.0 feature $Location/$Name.sel.dot
+CheckGraph $Location/$Name.sel.dot v1.0..feature
+
+runcmd $Run --between side v2.0 $Location/$Name.sel.dot
+CheckGraph $Location/$Name.sel.dot side..v2.0
+
+Display=0
+Finish
+cd $Location
+rm -rf $Repo $Name.sel.dot
+info 'done'
@@ -0,0 +1,75 @@
+#!/bin/bash
+#
+# Filter and color the commits by the refs that contain them
+# (--contains, --contains-filter and --contains-node). Each spec must
+# select the same commits as the equivalent git log range.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+# The selections are compared with git so the repo is always created.
+MakeRepo
+DateCommit '2020-08-01T10:00:00+0000' 'master - first'
+DateCommit '2020-08-02T10:00:00+0000' 'master - second'
+runcmd git checkout -q -b release
+echo 'release' > $Name.release.txt
+runcmd git add $Name.release.txt
+GIT_AUTHOR_DATE='2020-08-03T10:00:00+0000' GIT_COMMITTER_DATE='2020-08-03T10:00:00+0000' \
+               runcmd git commit -q -m "'release - first'"
+runcmd git checkout -q master
+DateCommit '2020-08-04T10:00:00+0000' 'master - third'
+GIT_AUTHOR_DATE='2020-08-05T10:00:00+0000' GIT_COMMITTER_DATE='2020-08-05T10:00:00+0000' \
+               runcmd git merge -q --no-ff -m "'merge release'" release
+runcmd git checkout -q release
+echo 'fix' >> $Name.release.txt
+runcmd git add $Name.release.txt
+GIT_AUTHOR_DATE='2020-08-06T10:00:00+0000' GIT_COMMITTER_DATE='2020-08-06T10:00:00+0000' \
+               runcmd git commit -q -m "'release - fix'"
+runcmd git checkout -q master
+DateCommit '2020-08-07T10:00:00+0000' 'master - fourth'
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="containment filters and colors"
+runcmd $Location/../git2dot.py \
+       -v \
+       -k \
+       --contains-filter "'master+!release'" \
+       -l "'%s'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Location/$Name.dot
+CheckGraph $Location/$Name.dot master ^release
+
+Run="$Location/../git2dot.py -i $Location/$Name.dot.keep -l '%s'"
+runcmd $Run --contains master --contains-filter "'=release'" $Location/$Name.sel.dot
+CheckGraph $Location/$Name.sel.dot release ^master
+
+# The commits on both are the ancestors of the merge bases.
+runcmd $Run --contains-filter "'master+release'" $Location/$Name.sel.dot
+CheckGraph $Location/$Name.sel.dot $(git merge-base --all master release)
+
+# Either spec, on one of them but not on both.
+runcmd $Run --contains-filter "'=release'" --contains-filter "'master+!release'" $Location/$Name.sel.dot
+CheckGraph $Location/$Name.sel.dot master...release
+
+# The colored commits.
+runcmd $Run --contains master --contains-node "'=release'" "'[label=\"{label}\", color=\"red\"]'" $Location/$Name.sel.dot
+grep -o '^ *"[0-9a-f]*" \[.*color="red"' $Location/$Name.sel.dot | cut -d'"' -f2 | sort > $Location/$Name.red
+git log --format=%h release ^master | sort > $Location/$Name.git.red
+runcmd test -s $Location/$Name.red
+runcmd diff $Location/$Name.git.red $Location/$Name.red
+
+Display=0
+Finish
+cd $Location
+rm -rf $Repo $Name.sel.dot $Name.red $Name.git.red
+info 'done'
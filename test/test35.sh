@@ -0,0 +1,73 @@
+#!/bin/bash
+#
+# Choose the refs by glob and regular expression patterns (--choose-ref
+# and --exclude-ref). Each choice must have the same commits and edges
+# as git log for the matching refs.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+# The choices are compared with git so the repo is always created.
+MakeRepo
+function BranchCommit() {
+    local Branch="$1"
+    local Date="$2"
+    runcmd git checkout -q -b $Branch master
+    echo "$Branch" > $Name.$(echo $Branch | tr / -).txt
+    git add $Name.$(echo $Branch | tr / -).txt
+    GIT_AUTHOR_DATE="$Date" GIT_COMMITTER_DATE="$Date" runcmd git commit -q -m "'$Branch - first'"
+    runcmd git checkout -q master
+}
+DateCommit '2020-09-01T10:00:00+0000' 'master - first'
+BranchCommit release/1.0 '2020-09-02T10:00:00+0000'
+runcmd git tag -a 'v1.0' -m "'First version.'" release/1.0
+DateCommit '2020-09-03T10:00:00+0000' 'master - second'
+BranchCommit release/2.0 '2020-09-04T10:00:00+0000'
+runcmd git tag 'v2.0-rc1' release/2.0
+BranchCommit wip/idea '2020-09-05T10:00:00+0000'
+DateCommit '2020-09-06T10:00:00+0000' 'master - third'
+runcmd git tag -a 'v2.0' -m "'Second version.'"
+BranchCommit wip/other '2020-09-07T10:00:00+0000'
+DateCommit '2020-09-08T10:00:00+0000' 'master - fourth'
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="choose refs by pattern"
+runcmd $Location/../git2dot.py \
+       -v \
+       -k \
+       --choose-ref "'release/*'" \
+       -l "'%s'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Location/$Name.dot
+CheckGraph $Location/$Name.dot --branches='release/*'
+
+Run="$Location/../git2dot.py -i $Location/$Name.dot.keep -l '%s'"
+
+# The tags without the release candidates.
+runcmd $Run --choose-ref "'re:v[0-9]+\.[0-9]+.*'" --exclude-ref "'*-rc*'" $Location/$Name.sel.dot
+CheckGraph $Location/$Name.sel.dot v1.0 v2.0
+
+# The regular expression must match the whole name.
+runcmd $Run --choose-ref "'re:wip/i'" --choose-ref "'re:wip/o.*'" $Location/$Name.sel.dot "> $Location/$Name.sel.log 2>&1"
+runcmd grep -q "'did not match any refs: \"re:wip/i\"'" $Location/$Name.sel.log
+CheckGraph $Location/$Name.sel.dot wip/other
+
+# Everything except the work in progress.
+runcmd $Run --exclude-ref "'wip/*'" $Location/$Name.sel.dot
+CheckGraph $Location/$Name.sel.dot --exclude='refs/heads/wip/*' --all
+
+Display=0
+Finish
+cd $Location
+rm -rf $Repo $Name.sel.dot $Name.sel.log
+info 'done'
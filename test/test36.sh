@@ -0,0 +1,123 @@
+#!/bin/bash
+#
+# Only graph the commits near a center commit (--around, --radius). The
+# nodes must be the ancestors and the descendants within the radius
+# that git log reports and the stubs must be the neighbours where the
+# graph was cut.
+#
+
+# ================================================================
+# Includes
+# ================================================================
+Location="$(cd $(dirname $0) && pwd)"
+source $Location/test-utils.sh
+
+# ================================================================
+# Create the repo.
+# ================================================================
+# The commits are read from the repo so it is always created.
+MakeRepo
+function SideCommit() {
+    local Date="$1"
+    local Msg="$2"
+    echo "$Msg" >> $Name.side.txt
+    git add $Name.side.txt
+    GIT_AUTHOR_DATE="$Date" GIT_COMMITTER_DATE="$Date" runcmd git commit -q -m "'$Msg'"
+}
+DateCommit '2020-10-01T10:00:00+0000' 'master - first'
+DateCommit '2020-10-02T10:00:00+0000' 'master - second'
+runcmd git checkout -q -b side
+SideCommit '2020-10-03T10:00:00+0000' 'side - first'
+SideCommit '2020-10-04T10:00:00+0000' 'side - second'
+runcmd git checkout -q master
+DateCommit '2020-10-05T10:00:00+0000' 'master - third'
+runcmd git tag center
+DateCommit '2020-10-06T10:00:00+0000' 'master - fourth'
+GIT_AUTHOR_DATE='2020-10-07T10:00:00+0000' GIT_COMMITTER_DATE='2020-10-07T10:00:00+0000' \
+               runcmd git merge -q --no-ff -m "'master - merge side'" side
+DateCommit '2020-10-08T10:00:00+0000' 'master - sixth'
+runcmd git checkout -q -b topic
+SideCommit '2020-10-09T10:00:00+0000' 'topic - first'
+runcmd git checkout -q master
+DateCommit '2020-10-10T10:00:00+0000' 'master - seventh'
+
+# ================================================================
+# Report.
+# ================================================================
+echo ""
+Purpose="commits around a center commit"
+runcmd $Location/../git2dot.py \
+       -v \
+       --around center \
+       --radius 2 \
+       -l "'%s'" \
+       -L "'graph[label=<<table border=\"0\"><tr><td border=\"1\" align=\"left\" balign=\"left\" bgcolor=\"lightyellow\"><font face=\"courier\" point-size=\"9\">Test:    $Name<br/>Purpose: $Purpose<br/>Dir:     $(pwd)<br/>Date:    $(date)</font></td></tr></table>>]'" \
+       $Location/$Name.dot
+
+# Walk the parents and the children that git log reports for the
+# whole repo and compare the nodes, stubs and edges with the DOT file.
+cat > $Location/$Name.check.py <<'EOT'
+import re
+import sys
+
+parents = {}
+children = {}
+for line in open(sys.argv[1]):
+    flds = line.split()
+    parents[flds[0]] = flds[1:]
+    for pid in flds[1:]:
+        children.setdefault(pid, []).append(flds[0])
+center = open(sys.argv[2]).read().strip()
+radius = int(sys.argv[4])
+
+def walk(links):
+    seen = set([center])
+    frontier = [center]
+    for _ in range(radius):
+        frontier = [n for sha in frontier for n in links.get(sha, []) if n not in seen]
+        seen.update(frontier)
+    return seen, frontier
+
+ancestors, _ = walk(parents)
+descendants, last = walk(children)
+nodes = ancestors | descendants
+stubs = set(p for sha in nodes for p in parents[sha] if p not in nodes)
+edges = set((p, sha) for sha in nodes for p in parents[sha])
+for sha in last:
+    for cid in children.get(sha, []):
+        stubs.add(cid)
+        edges.add((sha, cid))
+
+dot = open(sys.argv[3]).read()
+dnodes = set(re.findall(r'(?m)^\s*"(\w+)" \[label=(?!"\.\.\.")', dot))
+dstubs = set(re.findall(r'(?m)^\s*"(\w+)" \[label="\.\.\."', dot))
+dedges = set(re.findall(r'(?m)^\s*"(\w+)" -> "(\w+)"', dot))
+assert nodes == dnodes, (nodes, dnodes)
+assert stubs == dstubs, (stubs, dstubs)
+assert edges == dedges, (edges, dedges)
+print('{} nodes, {} stubs and {} edges'.format(len(nodes), len(stubs), len(edges)))
+EOT
+runcmd "git log --all --format='%h %p' > $Location/$Name.git.txt"
+function CheckAround() {
+    local Center="$1"
+    local Radius="$2"
+    runcmd "git rev-parse --short $Center > $Location/$Name.center.txt"
+    runcmd $Location/../git2dot.py --around $Center --radius $Radius -l "'%s'" $Location/$Name.sel.dot
+    runcmd python3 $Location/$Name.check.py $Location/$Name.git.txt $Location/$Name.center.txt \
+           $Location/$Name.sel.dot $Radius
+}
+CheckAround center 2
+CheckAround center 1
+CheckAround center 0
+CheckAround 'master~2' 1  # a merge with a branch on the far side
+CheckAround side 3
+
+# The main report must match the first check.
+runcmd "git rev-parse --short center > $Location/$Name.center.txt"
+runcmd python3 $Location/$Name.check.py $Location/$Name.git.txt $Location/$Name.center.txt $Location/$Name.dot 2
+
+Display=0
+Finish
+cd $Location
+rm -rf $Repo $Name.check.py $Name.git.txt $Name.center.txt $Name.sel.dot
+info 'done'